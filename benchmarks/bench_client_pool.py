@@ -0,0 +1,48 @@
+"""
+Per-request latency of `Collection.client()` with and without the client pool.
+
+Run it against the local Fauna container from docker-compose (see CONTRIBUTE.md)::
+
+    FAUNA_SECRET=secret FAUNA_SCHEME=http FAUNA_DOMAIN=localhost FAUNA_PORT=8443 \
+        python benchmarks/bench_client_pool.py --iterations 200
+"""
+import argparse
+import statistics
+import time
+
+from envs import env
+
+from pfunk.client import FaunaClient, client_pool, q
+
+
+def unpooled_client(_token=None):
+    return FaunaClient(secret=_token or env('FAUNA_SECRET'))
+
+
+def pooled_client(_token=None):
+    return client_pool.get(_token or env('FAUNA_SECRET'))
+
+
+def run(factory, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        factory().query(q.now())
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f'{label:<10} mean={statistics.mean(timings):8.2f}ms  median={statistics.median(timings):8.2f}ms  '
+          f'p95={p95:8.2f}ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    report('unpooled', run(unpooled_client, args.iterations))
+    report('pooled', run(pooled_client, args.iterations))
@@ -0,0 +1,33 @@
+"""
+Cost of building Collection instances as the number of instantiations grows.
+
+Collection metadata (indexes, roles, functions and views) is compiled once per class, so the time per instance and
+the size of `collection_views` must stay flat from one round to the next. No Fauna server is needed::
+
+    TEMPLATE_ROOT_DIR=/tmp python benchmarks/bench_collection_init.py --rounds 5 --instances 20000
+"""
+import argparse
+import time
+
+from pfunk.contrib.auth.collections import User
+from pfunk.tests import Person
+
+
+def run(collection, instances):
+    start = time.perf_counter()
+    for _ in range(instances):
+        collection(first_name='Mike', last_name='James')
+    return (time.perf_counter() - start) / instances * 1000000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--instances', type=int, default=10000)
+    args = parser.parse_args()
+
+    for collection in (Person, User):
+        for i in range(args.rounds):
+            per_instance = run(collection, args.instances)
+            print(f'{collection.__name__:<8} round={i + 1}  {per_instance:8.2f}us/instance  '
+                  f'collection_views={len(collection.collection_views)}')
@@ -0,0 +1,59 @@
+"""
+Time to turn Fauna documents into Collection instances and read two fields of each.
+
+`full` builds every instance through `process_schema_kwargs`, which converts every field up front. `queryset` is the
+path used for documents that come from Fauna (`Queryset`, `get`), where fields are converted on first access. No
+Fauna server is needed::
+
+    TEMPLATE_ROOT_DIR=/tmp python benchmarks/bench_hydration.py --documents 10000
+"""
+import argparse
+import statistics
+import time
+
+from faunadb.objects import Ref
+
+from pfunk.queryset import Queryset
+from pfunk.tests import Person
+
+
+def get_page(documents):
+    return {'data': [
+        {'ref': Ref(str(i), Ref('Person', Ref('collections'))), 'ts': 1,
+         'data': {'first_name': f'First {i}', 'last_name': f'Last {i}', 'gender_pronoun': 'they',
+                  'sport': Ref('1', Ref('Sport', Ref('collections'))),
+                  'group': Ref('1', Ref('Group', Ref('collections')))}}
+        for i in range(documents)
+    ]}
+
+
+def full(page):
+    return [Person(_ref=doc['ref'], **doc['data']) for doc in page['data']]
+
+
+def queryset(page):
+    return list(Queryset(page, Person))
+
+
+def run(hydrate, page, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for obj in hydrate(page):
+            obj.first_name
+            obj.last_name
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    page = get_page(args.documents)
+    for label, hydrate in (('full', full), ('queryset', queryset)):
+        timings = run(hydrate, page, args.repeat)
+        print(f'{label:<10} {args.documents} documents  median={statistics.median(timings):8.2f}ms  '
+              f'min={min(timings):8.2f}ms')
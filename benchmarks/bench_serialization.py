@@ -0,0 +1,61 @@
+"""
+Time to encode list pages as JSONResponse bodies with each installed JSON codec.
+
+`queryset` is the page ListView returns (a Queryset, encoded as the Fauna response). `instances` is a list of
+Collection instances whose `sport` reference was fetched with `select_related`. No Fauna server is needed::
+
+    TEMPLATE_ROOT_DIR=/tmp python benchmarks/bench_serialization.py --documents 1000
+"""
+import argparse
+import datetime
+import statistics
+import time
+
+from faunadb.objects import Ref
+
+from pfunk.queryset import Queryset
+from pfunk.tests import Person
+from pfunk.utils import json_utils
+from pfunk.web.response import JSONResponse
+
+
+def get_page(documents):
+    sport = {'ref': Ref('1', Ref('Sport', Ref('collections'))), 'ts': 1, 'data': {'name': 'Soccer', 'slug': 'soccer'}}
+    return {'data': [
+        {'ref': Ref(str(i), Ref('Person', Ref('collections'))), 'ts': 1,
+         'data': {'first_name': f'First {i}', 'last_name': f'Last {i}', 'gender_pronoun': 'they',
+                  'sport': sport['ref'], 'group': None,
+                  'joined': datetime.datetime(2021, 1, 1) + datetime.timedelta(minutes=i)},
+         'related': {'sport': sport}}
+        for i in range(documents)
+    ], 'after': [Ref(str(documents), Ref('Person', Ref('collections')))]}
+
+
+def run(codec, payload, repeat):
+    json_utils.set_json_codec(codec)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        JSONResponse(payload).response
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--documents', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    page = get_page(args.documents)
+    payloads = (('queryset', Queryset(page, Person)), ('instances', list(Queryset(page, Person))))
+    for name, codec_class in json_utils.JSON_CODECS.items():
+        try:
+            codec = codec_class()
+        except ImportError:
+            print(f'{name:<8} not installed')
+            continue
+        for label, payload in payloads:
+            timings = run(codec, payload, args.repeat)
+            print(f'{name:<8} {label:<10} {args.documents} documents  median={statistics.median(timings):8.2f}ms  '
+                  f'min={min(timings):8.2f}ms')
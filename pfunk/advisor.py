@@ -0,0 +1,194 @@
+import atexit
+import json
+import os
+from threading import Lock
+
+from envs import env
+
+__all__ = ['IndexAdvisor', 'index_advisor']
+
+
+class IndexAdvisor(object):
+    """
+    Records the index and filter patterns used by `Collection.get_index`, `get_by` and `filter` when the
+    `PFUNK_INDEX_ADVISOR` env variable is True. Each pattern counts its calls, the documents it read and the time it
+    took. The patterns are written to `PFUNK_INDEX_ADVISOR_FILE` when the process exits and `pfunk index-advisor`
+    prints the Index classes that are missing, ranked by the document reads they would save.
+
+    Filter lookups that no index covers are recorded before the filter raises. The savings of such a pattern are
+    estimated from the pages of the collection's "all" index read in the same run, because that is how the lookup is
+    answered without an index.
+    """
+    fields = ('collection', 'source', 'kind', 'index', 'terms', 'ranges', 'covered', 'scan')
+
+    def __init__(self, path: str = None, enabled: bool = None):
+        """
+        Args:
+            path: File the patterns are stored in. Defaults to the `PFUNK_INDEX_ADVISOR_FILE` env variable or
+            `.pfunk-index-advisor.json`.
+            enabled: Optional - defaults to the `PFUNK_INDEX_ADVISOR` env variable.
+        """
+        self.path = path or env('PFUNK_INDEX_ADVISOR_FILE', '.pfunk-index-advisor.json')
+        self.enabled = env('PFUNK_INDEX_ADVISOR', False, 'boolean') if enabled is None else enabled
+        self.patterns = {}
+        self.lock = Lock()
+
+    def record(self, collection: str, source: str, kind: str, index: str = None, terms=None, ranges=None,
+               covered: bool = True, scan: bool = False, reads: int = 0, duration: float = 0.0) -> None:
+        """
+        Counts one use of a pattern.
+        Args:
+            collection: Name of the Collection class
+            source: Name of the Fauna collection
+            kind: `get_index` or `filter`
+            index: Optional - name of the index
+            terms: Optional - names of the fields matched on
+            ranges: Optional - names of the fields with range lookups
+            covered: False if no index covers the lookups
+            scan: True if the "all" index was read
+            reads: Number of documents read
+            duration: Seconds the query took
+
+        Returns: None
+        """
+        key = (collection, source, kind, index, tuple(terms or ()), tuple(ranges or ()), covered, scan)
+        with self.lock:
+            stats = self.patterns.setdefault(key, {'count': 0, 'reads': 0, 'duration': 0.0})
+            stats['count'] += 1
+            stats['reads'] += reads
+            stats['duration'] += duration
+
+    def get_patterns(self) -> list:
+        """
+        Returns the recorded patterns, including the ones stored in the file, as dicts.
+
+        Returns: list
+        """
+        patterns = {}
+        for i in self.load() + self.dump():
+            key = tuple(tuple(i[k]) if isinstance(i[k], list) else i[k] for k in self.fields)
+            stats = patterns.setdefault(key, dict(i, count=0, reads=0, duration=0.0))
+            for k in ('count', 'reads', 'duration'):
+                stats[k] += i[k]
+        return list(patterns.values())
+
+    def dump(self) -> list:
+        with self.lock:
+            return [dict(zip(self.fields, [list(k) if isinstance(k, tuple) else k for k in key]), **stats)
+                    for key, stats in self.patterns.items()]
+
+    def load(self) -> list:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def flush(self) -> None:
+        """
+        Adds the patterns recorded by this process to the file.
+
+        Returns: None
+        """
+        if not self.patterns:
+            return
+        patterns = self.get_patterns()
+        with open(self.path, 'w') as f:
+            json.dump(patterns, f, indent=2)
+        with self.lock:
+            self.patterns.clear()
+
+    def get_suggestions(self) -> list:
+        """
+        Returns the missing indexes of the filter patterns no index covers, ranked by estimated document reads saved.
+        Each suggestion is a dict with the `collection`, `source`, index `name`, `terms`, `values`, `count` and
+        `savings` keys.
+
+        Returns: list
+        """
+        patterns = self.get_patterns()
+        scan_reads = {}
+        for i in patterns:
+            if i['scan'] and i['count']:
+                scan_reads.setdefault(i['collection'], []).append(i['reads'] / i['count'])
+        suggestions = {}
+        for i in patterns:
+            if i['covered']:
+                continue
+            reads = scan_reads.get(i['collection'])
+            savings = i['count'] * max(int(max(reads)) - 1 if reads else 1, 1)
+            for name, terms, values in self.get_indexes(i['source'], i['terms'], i['ranges']):
+                suggestion = suggestions.setdefault(name, {
+                    'collection': i['collection'], 'source': i['source'], 'name': name, 'terms': terms,
+                    'values': values, 'count': 0, 'savings': 0
+                })
+                suggestion['count'] += i['count']
+                suggestion['savings'] += savings
+        return sorted(suggestions.values(), key=lambda i: (-i['savings'], i['name']))
+
+    def get_scans(self) -> list:
+        """
+        Returns the patterns that read the "all" index of a collection, with the most documents read first.
+
+        Returns: list
+        """
+        return sorted([i for i in self.get_patterns() if i['scan']], key=lambda i: -i['reads'])
+
+    @staticmethod
+    def get_indexes(source: str, terms: list, ranges: list) -> list:
+        """
+        Returns the index name, term fields and value fields that cover a pattern. A range lookup needs an index
+        whose first value is the field, so each range field gets its own index.
+
+        Returns: list of tuples (name, terms, values)
+        """
+        base = f"{source.lower()}_by_{'_and_'.join(terms)}" if terms else source.lower()
+        if not ranges:
+            return [(base, list(terms), [])]
+        return [(f'{base}_sorted_by_{i}', list(terms), [i, 'ref']) for i in ranges]
+
+    @staticmethod
+    def render_index(suggestion: dict) -> str:
+        """
+        Returns the source of the `pfunk.resources.Index` class of a suggestion.
+
+        Returns: str
+        """
+        class_name = ''.join(i.capitalize() for i in suggestion['name'].split('_')) + 'Index'
+        lines = [
+            f"# {suggestion['collection']}: {suggestion['count']} calls, about {suggestion['savings']} document "
+            f"reads saved. Add it to {suggestion['collection']}.collection_indexes.",
+            f'class {class_name}(Index):',
+            f"    name = '{suggestion['name']}'",
+            f"    source = '{suggestion['source']}'",
+        ]
+        if suggestion['terms']:
+            lines.append(f"    terms = {[{'field': ['data', i]} for i in suggestion['terms']]}")
+        if suggestion['values']:
+            values = [{'field': ['ref'] if i == 'ref' else ['data', i]} for i in suggestion['values']]
+            lines.append(f'    values = {values}')
+        if len(suggestion['terms']) > 1 and not suggestion['values']:
+            lines.append(f"# Or, if {', '.join(suggestion['terms'])} identify one document, add "
+                         f"{tuple(suggestion['terms'])} to {suggestion['collection']}.Meta.unique_together.")
+        return '\n'.join(lines)
+
+    def render(self, limit: int = None) -> str:
+        """
+        Returns the report printed by `pfunk index-advisor`.
+        Args:
+            limit: Optional - maximum number of suggestions
+
+        Returns: str
+        """
+        suggestions = self.get_suggestions()[:limit]
+        blocks = [self.render_index(i) for i in suggestions]
+        for i in self.get_scans():
+            average = i['duration'] / i['count'] * 1000
+            blocks.append(f"# {i['collection']}: {i['index']} read {i['reads']} documents in {i['count']} calls "
+                          f"({average:.1f} ms per call). Use {i['collection']}.filter instead of filtering its pages.")
+        if not blocks:
+            return 'No missing indexes found.'
+        return '\n\n'.join(['from pfunk.resources import Index'] + blocks)
+
+
+index_advisor = IndexAdvisor()
+atexit.register(index_advisor.flush)
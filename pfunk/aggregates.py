@@ -0,0 +1,257 @@
+from pfunk.client import q
+
+__all__ = ['Aggregates', 'AGGREGATES']
+
+AGGREGATES = {'sum': ('sum',), 'min': ('min',), 'max': ('max',), 'mean': ('sum', 'count')}
+"""Partial results each aggregate is computed from. They are computed per page and combined."""
+
+
+class Aggregates(object):
+    """
+    Counts and numeric aggregates of a collection, computed on the server. They are reached through
+    `Collection.aggregates` so their names don't shadow fields such as `count` or `max`.
+
+    Usage:
+        Order.aggregates.count()
+        Order.aggregates.sum('total', status='PAID')
+    """
+
+    def __init__(self, collection=None):
+        """
+        Args:
+            collection: Collection class the aggregates are computed on. Set when read from the class.
+        """
+        self.collection = collection
+
+    def __get__(self, instance, owner):
+        return self.__class__(owner)
+
+    def count(self, index_name=None, terms=[], _token=None, **lookups) -> int:
+        """
+        Count the documents of an index match, a filter or, by default, the collection on the server.
+
+        Usage:
+            Person.aggregates.count()
+            Person.aggregates.count('people_by_last_name', terms=['James'])
+            Person.aggregates.count(last_name='James')
+
+        Args:
+            index_name: Optional - name of the index. Defaults to the "all" index.
+            terms: Terms of the index. Requires `index_name`.
+            _token: Token (secret) used to make call
+            **lookups: Optional - `filter` lookups used instead of an index
+
+        Returns: int
+
+        """
+        return self.collection().client(_token=_token).query(self.get_count_query(index_name, terms, lookups))
+
+    async def acount(self, index_name=None, terms=[], _token=None, **lookups) -> int:
+        """
+        Async version of `count`.
+
+        Returns: int
+
+        """
+        return await self.collection().aclient(_token=_token).query(self.get_count_query(index_name, terms, lookups))
+
+    def sum(self, field, index_name=None, terms=[], _token=None, **lookups):
+        """
+        Sum a numeric field on the server. See `aggregate`.
+
+        Returns: number
+        """
+        return self.aggregate('sum', field, index_name=index_name, terms=terms, _token=_token, **lookups)
+
+    def min(self, field, index_name=None, terms=[], _token=None, **lookups):
+        """
+        Smallest value of a numeric field, computed on the server. See `aggregate`.
+
+        Returns: number or None
+        """
+        return self.aggregate('min', field, index_name=index_name, terms=terms, _token=_token, **lookups)
+
+    def max(self, field, index_name=None, terms=[], _token=None, **lookups):
+        """
+        Largest value of a numeric field, computed on the server. See `aggregate`.
+
+        Returns: number or None
+        """
+        return self.aggregate('max', field, index_name=index_name, terms=terms, _token=_token, **lookups)
+
+    def mean(self, field, index_name=None, terms=[], _token=None, **lookups):
+        """
+        Mean of a numeric field, computed on the server. See `aggregate`.
+
+        Returns: number or None
+        """
+        return self.aggregate('mean', field, index_name=index_name, terms=terms, _token=_token, **lookups)
+
+    def aggregate(self, function, field, index_name=None, terms=[], _page_size=1000, _token=None, **lookups):
+        """
+        Compute the sum, min, max or mean of the values of a field on the server. The values are read from the index
+        if it returns the field, otherwise every document is fetched, so declare an index that returns the field for
+        large collections. One query is sent per `_page_size` values: each returns the partial results of its page
+        and the `after` cursor of the next one. Values that are not numbers are skipped.
+
+        Usage:
+            Order.aggregates.sum('total')
+            Order.aggregates.mean('total', 'orders_by_status', terms=['PAID'])
+            Order.aggregates.max('total', status='PAID')
+
+        Args:
+            function: `sum`, `min`, `max` or `mean`
+            field: Name of a numeric field
+            index_name: Optional - name of the index. Defaults to a declared index without terms that returns the
+            field, then to the "all" index.
+            terms: Terms of the index. Requires `index_name`.
+            _page_size: Number of values aggregated per query
+            _token: Token (secret) used to make call
+            **lookups: Optional - `filter` lookups used instead of an index
+
+        Returns: number. `min`, `max` and `mean` return None if there are no values.
+
+        """
+        client = self.collection().client(_token=_token)
+        result, after = None, None
+        while True:
+            page = client.query(self.get_aggregate_query(function, field, index_name, terms, lookups,
+                                                         page_size=_page_size, after=after))
+            result = self.combine_aggregate(function, result, page)
+            after = page.get('after')
+            if not after:
+                return self.get_aggregate_result(function, result)
+
+    async def aaggregate(self, function, field, index_name=None, terms=[], _page_size=1000, _token=None, **lookups):
+        """
+        Async version of `aggregate`.
+
+        Returns: number
+        """
+        client = self.collection().aclient(_token=_token)
+        result, after = None, None
+        while True:
+            page = await client.query(self.get_aggregate_query(function, field, index_name, terms, lookups,
+                                                               page_size=_page_size, after=after))
+            result = self.combine_aggregate(function, result, page)
+            after = page.get('after')
+            if not after:
+                return self.get_aggregate_result(function, result)
+
+    def get_count_query(self, index_name=None, terms=[], lookups=None):
+        if lookups:
+            return q.count(self.collection.get_filter_query(lookups))
+        if terms and index_name is None:
+            raise ValueError('terms require an index_name.')
+        return q.count(q.match(q.index(index_name or self.collection().all_index_name()), terms))
+
+    def get_aggregate_query(self, function, field, index_name=None, terms=[], lookups=None, page_size=1000,
+                            after=None):
+        """
+        Builds the query of one page of `aggregate`. It returns the partial results of the page (see `AGGREGATES`)
+        and its `after` cursor.
+        Args:
+            function: `sum`, `min`, `max` or `mean`
+            field: Name of a numeric field
+            index_name: Optional - name of the index
+            terms: Terms of the index
+            lookups: Optional - `filter` lookups used instead of an index
+            page_size: Number of values in the page
+            after: Optional - cursor of the page
+
+        Returns: query
+
+        """
+        if function not in AGGREGATES:
+            raise ValueError(f'{function} is not an aggregate. Use one of {", ".join(AGGREGATES)}.')
+        partials = {
+            'sum': q.sum(q.var('values')),
+            'count': q.count(q.var('values')),
+            'min': q.if_(q.is_empty(q.var('values')), None, q.min(q.var('values'))),
+            'max': q.if_(q.is_empty(q.var('values')), None, q.max(q.var('values'))),
+        }
+        result = {k: partials[k] for k in AGGREGATES[function]}
+        result['after'] = q.select('after', q.var('page'), None)
+        return q.let(
+            {
+                'page': self.get_field_values_query(field, index_name, terms, lookups, page_size=page_size,
+                                                    after=after),
+                'values': q.select('data', q.var('page'))
+            },
+            result
+        )
+
+    @staticmethod
+    def combine_aggregate(function, result, page) -> dict:
+        """
+        Adds the partial results of a page to the results of the previous pages.
+        Args:
+            function: `sum`, `min`, `max` or `mean`
+            result: Combined results of the previous pages or None
+            page: Response of `get_aggregate_query`
+
+        Returns: dict
+        """
+        if result is None:
+            return {k: page[k] for k in AGGREGATES[function]}
+        combined = {}
+        for k in AGGREGATES[function]:
+            if k in ('sum', 'count'):
+                combined[k] = result[k] + page[k]
+            elif result[k] is None or page[k] is None:
+                combined[k] = page[k] if result[k] is None else result[k]
+            else:
+                combined[k] = min(result[k], page[k]) if k == 'min' else max(result[k], page[k])
+        return combined
+
+    @staticmethod
+    def get_aggregate_result(function, result):
+        if function == 'mean':
+            return result['sum'] / result['count'] if result['count'] else None
+        return result[function]
+
+    def get_field_values_query(self, field, index_name=None, terms=[], lookups=None, page_size=1000, after=None):
+        """
+        Builds the query that returns a page of the numeric values of a field.
+        Args:
+            field: Name of the field
+            index_name: Optional - name of the index
+            terms: Terms of the index
+            lookups: Optional - `filter` lookups used instead of an index
+            page_size: Number of rows read
+            after: Optional - cursor of the page
+
+        Returns: query (Fauna page)
+
+        """
+        prop = self.collection._base_properties.get(field)
+        if prop is None or prop.relation_field:
+            raise ValueError(f'{field} is not a field of {self.collection.__name__}')
+        if terms and index_name is None and not lookups:
+            raise ValueError('terms require an index_name.')
+        indexes = {i.get_name(): i for i in [i() for i in self.collection.get_indexes()]}
+        if lookups:
+            set_query, value_fields = self.collection.get_filter_query(lookups), ['ref']
+        else:
+            if index_name is None:
+                index_name = next((k for k, v in indexes.items() if not v.terms and field in v.get_value_fields()),
+                                  self.collection().all_index_name())
+            index = indexes.get(index_name)
+            set_query = q.match(q.index(index_name), terms)
+            value_fields = index.get_value_fields() if index else ['ref']
+
+        def select(name):
+            if value_fields == [name]:
+                return q.var('row')
+            return q.select(value_fields.index(name), q.var('row'))
+
+        if field in value_fields:
+            value = select(field)
+        elif 'ref' in value_fields:
+            value = q.select(['data', field], q.get(select('ref')), None)
+        else:
+            raise ValueError(f'{index_name} returns neither {field} nor refs')
+        values = q.paginate(set_query, size=page_size, after=after)
+        if value_fields != [field]:
+            values = q.map_(q.lambda_('row', value), values)
+        return q.filter_(q.lambda_('value', q.is_number(q.var('value'))), values)
@@ -0,0 +1,148 @@
+from contextvars import ContextVar
+
+from envs import env
+
+from pfunk.client import get_client
+
+__all__ = ['QueryBatch', 'BatchResult', 'BulkResult', 'get_current_batch']
+
+_current_batch = ContextVar('pfunk_batch', default=None)
+
+
+def get_current_batch():
+    """
+    Returns the QueryBatch that is open in the current context or None.
+
+    Returns: QueryBatch
+    """
+    return _current_batch.get()
+
+
+class BatchResult(object):
+    """
+    Placeholder returned by queries that are recorded by a QueryBatch. The `value` is set when the batch is sent.
+    """
+
+    def __init__(self, query, callback=None, _token=None):
+        self.query = query
+        self.callback = callback
+        self.token = _token
+        self.value = None
+        self.done = False
+
+    def resolve(self, resp) -> None:
+        """
+        Stores the response and passes it to the callback.
+        Args:
+            resp: Fauna response for this query
+
+        Returns: None
+        """
+        self.value = resp
+        self.done = True
+        if self.callback:
+            self.callback(resp)
+
+
+class QueryBatch(object):
+    """
+    Records the queries Collection operations would send and sends them as arrays of expressions when the block
+    exits. Fauna evaluates each array in one HTTP round trip and one transaction.
+
+    Usage:
+        with Collection.batch() as b:
+            for name in names:
+                Sport.create(name=name)
+
+    Results are only available after the block exits: refs of created documents, documents fetched with `get` and
+    the `value` of the BatchResult returned by `call_function`.
+    """
+
+    def __init__(self, chunk_size: int = env('PFUNK_BATCH_SIZE', 100, var_type='integer')):
+        """
+        Args:
+            chunk_size: Maximum number of expressions sent in one query.
+        """
+        self.chunk_size = chunk_size
+        self.results = []
+        self._context_token = None
+
+    def add(self, query, callback=None, _token=None) -> BatchResult:
+        """
+        Records a query.
+        Args:
+            query: Fauna expression
+            callback: Called with the response of the query once the batch is sent
+            _token: Token (secret) used to make call
+
+        Returns: BatchResult
+        """
+        result = BatchResult(query, callback=callback, _token=_token)
+        self.results.append(result)
+        return result
+
+    def get_chunks(self, results) -> list:
+        """
+        Groups the pending results by token and splits them in chunks of `chunk_size`.
+        Args:
+            results: list of BatchResult
+
+        Returns: list of (token, list of BatchResult)
+        """
+        by_token = {}
+        for i in results:
+            by_token.setdefault(i.token, []).append(i)
+        return [(token, items[n:n + self.chunk_size]) for token, items in by_token.items()
+                for n in range(0, len(items), self.chunk_size)]
+
+    def send(self) -> None:
+        """
+        Sends every recorded query. Callbacks run outside of the batch so the queries they make are sent right away.
+
+        Returns: None
+        """
+        pending, self.results = self.results, []
+        for token, chunk in self.get_chunks(pending):
+            responses = get_client(token).query([i.query for i in chunk])
+            for result, resp in zip(chunk, responses):
+                result.resolve(resp)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __enter__(self):
+        self._context_token = _current_batch.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_batch.reset(self._context_token)
+        if exc_type is None:
+            self.send()
+
+
+class BulkResult(object):
+    """
+    Result of a `Collection.bulk_create`, `bulk_update` or `bulk_delete` call.
+
+    Attributes:
+        refs (list): Ref of every input item, in input order. Items that failed have None.
+        errors (dict): Maps the position of every failed item to the exception it raised.
+    """
+
+    def __init__(self, size: int):
+        self.refs = [None] * size
+        self.errors = {}
+
+    @property
+    def success(self) -> bool:
+        """True if no item failed."""
+        return not self.errors
+
+    def __iter__(self):
+        return iter(self.refs)
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __getitem__(self, x):
+        return self.refs[x]
@@ -0,0 +1,245 @@
+import hashlib
+from collections import Counter
+from threading import RLock
+from time import time
+
+from cachetools import LRUCache
+from envs import env
+from faunadb._json import parse_json, to_json
+from valley.utils import import_util
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+__all__ = ['BaseCacheBackend', 'LocalCacheBackend', 'RedisCacheBackend', 'DocumentCache', 'document_cache',
+           'invalidate_cached_document']
+
+
+class BaseCacheBackend(object):
+    """
+    Storage used by the DocumentCache. Values are dicts with the Fauna document and the readers of the document.
+    """
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value: dict, ttl: int) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class LocalCacheBackend(BaseCacheBackend):
+    """
+    In-process LRU cache. Each entry expires after the TTL it was stored with.
+    """
+
+    def __init__(self, maxsize: int = None):
+        """
+        Args:
+            maxsize: Number of documents kept. Defaults to the `PFUNK_CACHE_SIZE` env variable or 1024.
+        """
+        self.entries = LRUCache(maxsize=maxsize or env('PFUNK_CACHE_SIZE', 1024, 'integer'))
+        self.lock = RLock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time():
+                self.entries.pop(key, None)
+                return None
+            return value
+
+    def set(self, key: str, value: dict, ttl: int) -> None:
+        with self.lock:
+            self.entries[key] = (time() + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisCacheBackend(BaseCacheBackend):
+    """
+    Redis cache shared between processes. Requires the `redis` package (`pip install pfunk[cache]`).
+    """
+
+    def __init__(self, url: str = None, prefix: str = 'pfunk:'):
+        """
+        Args:
+            url: Redis URL. Defaults to the `PFUNK_CACHE_REDIS_URL` env variable.
+            prefix: Prefix of the keys
+        """
+        if redis is None:
+            raise ImportError('RedisCacheBackend requires redis. Install it with: pip install pfunk[cache]')
+        self.client = redis.Redis.from_url(url or env('PFUNK_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        self.prefix = prefix
+
+    def get(self, key: str):
+        value = self.client.get(f'{self.prefix}{key}')
+        if value is None:
+            return None
+        return parse_json(value.decode())
+
+    def set(self, key: str, value: dict, ttl: int) -> None:
+        self.client.set(f'{self.prefix}{key}', to_json(value), ex=ttl)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(f'{self.prefix}{key}')
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(f'{self.prefix}*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class DocumentCache(object):
+    """
+    Read-through cache used by `Collection.get` for collections that set `Meta.cache_ttl`. Documents are keyed by
+    collection name and ID, and a stored document is only replaced by one with the same or a newer `ts`.
+    Hits and misses are counted per collection.
+
+    Each entry remembers the secrets (as SHA-256 hashes) that read the document. A document is only returned to one
+    of them, so a document read with the server secret is not served to a token Fauna would refuse it to. Another
+    secret misses the cache and, once it read the same version, is added to the readers.
+    """
+
+    def __init__(self, backend: BaseCacheBackend = None):
+        """
+        Args:
+            backend: Optional - defaults to an instance of the class at the `PFUNK_CACHE_BACKEND` env variable
+            (`pfunk.cache.LocalCacheBackend`).
+        """
+        self._backend = backend
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @property
+    def backend(self) -> BaseCacheBackend:
+        if self._backend is None:
+            self._backend = import_util(env('PFUNK_CACHE_BACKEND', 'pfunk.cache.LocalCacheBackend'))()
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend: BaseCacheBackend) -> None:
+        self._backend = backend
+
+    @staticmethod
+    def get_key(collection_name: str, id: str) -> str:
+        return f'{collection_name}:{id}'
+
+    @staticmethod
+    def get_reader(secret: str = None) -> str:
+        """
+        Returns the hash of a secret. Defaults to the `FAUNA_SECRET` env variable, like `Collection.client`.
+        """
+        return hashlib.sha256((secret or env('FAUNA_SECRET') or '').encode()).hexdigest()
+
+    @staticmethod
+    def get_entry(doc: dict, readers: list) -> dict:
+        return {'doc': {k: v for k, v in doc.items() if k != 'related'}, 'readers': readers}
+
+    def get(self, collection_name: str, id: str, secret: str = None):
+        """
+        Returns the cached document or None and counts the hit or miss.
+        Args:
+            collection_name: Name of the collection
+            id: ID of the document
+            secret: Optional - secret the document is read with
+
+        Returns: dict
+        """
+        entry = self.backend.get(self.get_key(collection_name, id))
+        if entry is None or self.get_reader(secret) not in entry['readers']:
+            self.misses[collection_name] += 1
+            return None
+        self.hits[collection_name] += 1
+        return entry['doc']
+
+    def set(self, doc: dict, ttl: int, secret: str = None) -> None:
+        """
+        Stores a document unless a document with a newer `ts` is already cached. If the same version is cached, the
+        secret is added to its readers.
+        Args:
+            doc: Fauna document (dict with `ref`, `ts` and `data`)
+            ttl: Seconds the document is kept
+            secret: Optional - secret the document was read with
+
+        Returns: None
+        """
+        ref = doc['ref']
+        key = self.get_key(ref.collection().id(), ref.id())
+        readers = [self.get_reader(secret)]
+        cached = self.backend.get(key)
+        if cached is not None:
+            if cached['doc'].get('ts', 0) > doc.get('ts', 0):
+                return
+            if cached['doc'].get('ts', 0) == doc.get('ts', 0):
+                readers = sorted(set(cached['readers'] + readers))
+        self.backend.set(key, self.get_entry(doc, readers), ttl)
+
+    def refresh(self, doc: dict, ttl: int, secret: str = None) -> None:
+        """
+        Replaces a cached document if `doc` is newer. Documents that are not cached are not added. Only `secret` can
+        read the new version from the cache, because access rules may depend on the document's data.
+        Args:
+            doc: Fauna document (dict with `ref`, `ts` and `data`)
+            ttl: Seconds the document is kept
+            secret: Optional - secret the document was read with
+
+        Returns: None
+        """
+        ref = doc['ref']
+        key = self.get_key(ref.collection().id(), ref.id())
+        cached = self.backend.get(key)
+        if cached is not None and cached['doc'].get('ts', 0) < doc.get('ts', 0):
+            self.backend.set(key, self.get_entry(doc, [self.get_reader(secret)]), ttl)
+
+    def delete(self, collection_name: str, id: str) -> None:
+        self.backend.delete(self.get_key(collection_name, id))
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+    def get_stats(self, collection_name: str = None) -> dict:
+        """
+        Returns the hit and miss counters.
+        Args:
+            collection_name: Optional - counters of one collection. Defaults to the totals.
+
+        Returns: dict
+        """
+        if collection_name:
+            return {'hits': self.hits[collection_name], 'misses': self.misses[collection_name]}
+        return {'hits': sum(self.hits.values()), 'misses': sum(self.misses.values())}
+
+
+document_cache = DocumentCache()
+
+
+def invalidate_cached_document(instance) -> None:
+    """
+    Signal that drops the cached document of an instance. Added to `post_save_signals` and `post_delete_signals` of
+    collections that set `Meta.cache_ttl`.
+    Args:
+        instance: Collection instance
+
+    Returns: None
+    """
+    if instance.ref is not None:
+        document_cache.delete(instance.get_collection_name(), instance.ref.id())
@@ -7,6 +7,7 @@ import datetime
 from jinja2 import TemplateNotFound
 from valley.utils import import_util
 from werkzeug.serving import run_simple
+from pfunk.advisor import IndexAdvisor
 from pfunk.client import FaunaClient, q
 
 from pfunk.contrib.auth.collections import Group, PermissionGroup
@@ -266,6 +267,22 @@ def deploy(stage_name: str, config_path: str):
         return
     d.deploy(stage_name)
 
+
+@pfunk.command(name='index-advisor')
+@click.option('--path', help='File with the recorded query patterns', default=None)
+@click.option('--limit', help='Maximum number of suggested indexes', default=20)
+def index_advisor(path: str, limit: int):
+    """
+    Print the Index classes missing for the query patterns recorded with PFUNK_INDEX_ADVISOR=True
+    Args:
+        path: File with the recorded query patterns (default: PFUNK_INDEX_ADVISOR_FILE or .pfunk-index-advisor.json)
+        limit: Maximum number of suggested indexes
+
+    Returns:
+
+    """
+    print(IndexAdvisor(path=path).render(limit=limit))
+
 if __name__ == '__main__':
     pfunk()
 
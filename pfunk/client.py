@@ -1,7 +1,24 @@
+import asyncio
+import weakref
+from collections import OrderedDict
+from threading import RLock
+from time import time
+
+from cachetools import TTLCache
 from envs import env
-from faunadb.client import FaunaClient as FC
+from faunadb import __api_version__ as api_version
+from faunadb._json import parse_json_or_none, to_json
+from faunadb.client import FaunaClient as FC, _LastTxnTime
+from faunadb.errors import FaunaError, UnexpectedError, _get_or_raise
 from faunadb import query as q
 from faunadb.objects import Ref
+from faunadb.query import _wrap
+from faunadb.request_result import RequestResult
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
 
 
 class FaunaClient(FC):
@@ -53,3 +70,339 @@ class FaunaClient(FC):
                                           pool_connections=pool_connections,
                                           pool_maxsize=pool_maxsize,
                                           **kwargs)
+
+
+class AsyncFaunaClient(object):
+    """
+    asyncio-native counterpart of FaunaClient. Queries are sent with an `httpx.AsyncClient` so many in-flight queries
+    share one event loop instead of blocking one thread each. Requires the optional `httpx` dependency
+    (`pip install pfunk[async]`).
+    """
+
+    def __init__(
+            self,
+            secret=None,
+            domain=env('FAUNA_DOMAIN', 'db.fauna.com'),
+            scheme=env('FAUNA_SCHEME', "https"),
+            port=None,
+            timeout=60,
+            observer=None,
+            pool_maxsize=10,
+            **kwargs) -> None:
+        """
+        Args:
+          secret (str, required, default=None):
+            Auth token for the FaunaDB server.
+          domain (str, optional, default="db.fauna.com"):
+            Base URL for the FaunaDB server.
+          scheme (str, optional, default="https"):
+            ``"web"`` or ``"https"``.
+          port (int, optional, default=None):
+            Port of the FaunaDB server.
+          timeout (int, optional, default=60):
+            Read timeout in seconds.
+          observer (optional, default=None):
+            Callback that will be passed a :any:`RequestResult` after every completed request.
+          pool_maxsize (int, optional, default=10):
+            The maximum number of connections to keep open.
+          **kwargs:
+            Extra keyword arguments passed to `httpx.AsyncClient`.
+            """
+        if httpx is None:
+            raise ImportError('AsyncFaunaClient requires httpx. Install it with: pip install pfunk[async]')  # pragma: no cover
+        self.secret = secret or env('FAUNA_SECRET')
+        env_port = env('FAUNA_PORT')
+        if env_port:
+            port = int(env_port)
+        if not self.secret:
+            raise ValueError('When creating an AsyncFaunaClient instance you must supply the secret argument or set '
+                             'the FAUNA_SECRET environment variable.')  # pragma: no cover
+
+        self.domain = domain
+        self.scheme = scheme
+        self.port = (443 if scheme == "https" else 80) if port is None else port
+        self.base_url = f"{self.scheme}://{self.domain}:{self.port}"
+        self.observer = observer
+        self._last_txn_time = _LastTxnTime()
+        self.session = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {self.secret}",
+                "Accept-Encoding": "gzip",
+                "Content-Type": "application/json;charset=utf-8",
+                "X-Fauna-Driver": "python",
+                "X-FaunaDB-API-Version": api_version,
+            },
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            **kwargs
+        )
+
+    async def query(self, expression, timeout_millis=None):
+        """
+        Use the FaunaDB query API.
+        Args:
+            expression: A query
+            timeout_millis: Query timeout in milliseconds.
+
+        Returns: Converted JSON response.
+
+        """
+        return await self._execute("POST", "", _wrap(expression), with_txn_time=True, query_timeout_ms=timeout_millis)
+
+    async def ping(self, scope=None, timeout=None):
+        """
+        Ping FaunaDB.
+        """
+        return await self._execute("GET", "ping", query={"scope": scope, "timeout": timeout})
+
+    async def close(self) -> None:
+        """
+        Closes the underlying HTTP connections.
+
+        Returns: None
+        """
+        await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _execute(self, action, path, data=None, query=None, with_txn_time=False, query_timeout_ms=None):
+        """Performs an HTTP action, logs it, and looks for errors."""
+        if query is not None:
+            query = {k: v for k, v in query.items() if v is not None}
+
+        headers = {}
+        if query_timeout_ms is not None:
+            headers["X-Query-Timeout"] = str(query_timeout_ms)
+        if with_txn_time:
+            headers.update(self._last_txn_time.request_header)
+
+        start_time = time()
+        response = await self.session.request(action, f"{self.base_url}/{path}", params=query,
+                                              content=to_json(data), headers=headers)
+        end_time = time()
+
+        if with_txn_time and "X-Txn-Time" in response.headers:
+            self._last_txn_time.update_txn_time(int(response.headers["X-Txn-Time"]))
+
+        response_raw = response.text
+        response_content = parse_json_or_none(response_raw)
+        request_result = RequestResult(
+            action, path, query, data,
+            response_raw, response_content, response.status_code, response.headers,
+            start_time, end_time)
+
+        if self.observer is not None:
+            self.observer(request_result)
+
+        if response_content is None:
+            raise UnexpectedError("Invalid JSON.", request_result)
+
+        FaunaError.raise_for_status_code(request_result)
+        return _get_or_raise(request_result, response_content, "resource")
+
+
+class FaunaClientPool(object):
+    """
+    Bounded, thread-safe registry of FaunaClient instances keyed by secret.
+
+    Every FaunaClient owns its own HTTP session and connection pool, so building one per query means a new TLS
+    handshake per query. The pool keeps the most recently used clients alive and evicts the least recently used one
+    when it is full. Clients that have not been used for `ttl` seconds are evicted as well.
+    """
+    client_class = FaunaClient
+
+    def __init__(self, maxsize: int = env('PFUNK_CLIENT_POOL_SIZE', 32, var_type='integer'),
+                 ttl: int = env('PFUNK_CLIENT_POOL_TTL', 300, var_type='integer')):
+        """
+        Args:
+            maxsize: Maximum number of clients (secrets) kept alive at the same time.
+            ttl: Number of seconds a client may stay idle before it is evicted.
+        """
+        self._clients = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = RLock()
+
+    def get_key(self, secret: str):
+        """
+        Returns the key the client for this secret is stored under.
+        Args:
+            secret: Token (secret) used to initialize client
+
+        """
+        return secret
+
+    def get(self, secret: str = None) -> FaunaClient:
+        """
+        Returns the pooled client for the secret, creating it if needed.
+        Args:
+            secret: Token (secret) used to initialize client. Defaults to the FAUNA_SECRET environment variable.
+
+        Returns: FaunaClient
+
+        """
+        secret = secret or env('FAUNA_SECRET')
+        key = self.get_key(secret)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                # Re-inserting refreshes both the idle timer and the LRU order.
+                self._clients[key] = client
+                return client
+        # Clients are built outside of the lock so a slow handshake does not block other secrets.
+        client = self.client_class(secret=secret)
+        with self._lock:
+            client = self._clients.setdefault(key, client)
+            self._clients[key] = client
+        return client
+
+    def clear(self) -> None:
+        """
+        Drops every pooled client. Their sessions are closed once the last reference goes away.
+
+        Returns: None
+        """
+        with self._lock:
+            self._clients.clear()
+
+    def __contains__(self, secret):
+        with self._lock:
+            return self.get_key(secret) in self._clients
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+
+class AsyncFaunaClientPool(FaunaClientPool):
+    """
+    Pool of AsyncFaunaClient instances. An `httpx.AsyncClient` is bound to the event loop it was first used on, so
+    every event loop gets its own clients, keyed by secret. Event loops are referenced weakly and the clients of closed
+    loops are dropped. Evicted clients are closed on their loop.
+    """
+    client_class = AsyncFaunaClient
+
+    def __init__(self, maxsize: int = env('PFUNK_CLIENT_POOL_SIZE', 32, var_type='integer'),
+                 ttl: int = env('PFUNK_CLIENT_POOL_TTL', 300, var_type='integer')):
+        """
+        Args:
+            maxsize: Maximum number of clients (secrets) kept alive per event loop.
+            ttl: Number of seconds a client may stay idle before it is evicted.
+        """
+        super(AsyncFaunaClientPool, self).__init__(maxsize=maxsize, ttl=ttl)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._loops = weakref.WeakKeyDictionary()
+        self._closing = set()
+
+    def get_clients(self) -> OrderedDict:
+        """
+        Returns the clients of the running event loop, least recently used first, as `secret: (client, last_used)`.
+
+        Returns: OrderedDict
+        """
+        for loop in [i for i in self._loops.keys() if i.is_closed()]:
+            del self._loops[loop]
+        return self._loops.setdefault(asyncio.get_running_loop(), OrderedDict())
+
+    def get(self, secret: str = None) -> AsyncFaunaClient:
+        """
+        Returns the pooled client for the secret and the running event loop, creating it if needed.
+        Args:
+            secret: Token (secret) used to initialize client. Defaults to the FAUNA_SECRET environment variable.
+
+        Returns: AsyncFaunaClient
+
+        """
+        secret = secret or env('FAUNA_SECRET')
+        now = time()
+        with self._lock:
+            clients = self.get_clients()
+            for key in [k for k, (_, used) in clients.items() if now - used > self.ttl]:
+                self.close_client(asyncio.get_running_loop(), clients.pop(key)[0])
+            if secret in clients:
+                client = clients.pop(secret)[0]
+            else:
+                client = self.client_class(secret=secret)
+                while len(clients) >= self.maxsize:
+                    self.close_client(asyncio.get_running_loop(), clients.popitem(last=False)[1][0])
+            clients[secret] = (client, now)
+        return client
+
+    def close_client(self, loop, client: AsyncFaunaClient) -> None:
+        """
+        Schedules `client.close()` on the event loop the client belongs to.
+
+        Returns: None
+        """
+        if loop.is_closed():
+            return
+
+        def schedule():
+            task = loop.create_task(client.close())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+        loop.call_soon_threadsafe(schedule)
+
+    async def close(self) -> None:
+        """
+        Closes and drops the clients of the running event loop.
+
+        Returns: None
+        """
+        with self._lock:
+            clients = self._loops.pop(asyncio.get_running_loop(), {})
+        for client, _ in clients.values():
+            await client.close()
+
+    def clear(self) -> None:
+        """
+        Drops every pooled client and schedules closing them on their event loops.
+
+        Returns: None
+        """
+        with self._lock:
+            loops = list(self._loops.items())
+            self._loops.clear()
+        for loop, clients in loops:
+            for client, _ in clients.values():
+                self.close_client(loop, client)
+
+    def __contains__(self, secret):
+        with self._lock:
+            return secret in self.get_clients()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(i) for i in self._loops.values())
+
+
+client_pool = FaunaClientPool()
+async_client_pool = AsyncFaunaClientPool()
+
+
+def get_client(secret: str = None) -> FaunaClient:
+    """
+    Returns a FaunaClient from the process-wide pool.
+    Args:
+        secret: Token (secret) used to initialize client
+
+    Returns: FaunaClient
+
+    """
+    return client_pool.get(secret)
+
+
+def get_async_client(secret: str = None) -> AsyncFaunaClient:
+    """
+    Returns an AsyncFaunaClient from the process-wide pool for the running event loop.
+    Args:
+        secret: Token (secret) used to initialize client
+
+    Returns: AsyncFaunaClient
+
+    """
+    return async_client_pool.get(secret)
@@ -1,21 +1,36 @@
+from copy import copy
+from functools import partial
+from itertools import product
+from time import perf_counter
+
 from envs import env
-from faunadb.errors import BadRequest
+from faunadb.errors import BadRequest, NotFound
 from valley.contrib import Schema
 from valley.declarative import DeclaredVars, DeclarativeVariablesMetaclass
+from valley.exceptions import ValidationException
 from valley.properties import BaseProperty, CharProperty, ListProperty
 from valley.schema import BaseSchema
 from valley.utils import import_util
 
-from pfunk.client import FaunaClient
+from pfunk.client import FaunaClient, AsyncFaunaClient, Ref, get_client, get_async_client
 from pfunk.web.views.json import DetailView, CreateView, UpdateView, DeleteView, ListView
+from .advisor import index_advisor
+from .aggregates import Aggregates
+from .batch import BulkResult, QueryBatch, get_current_batch
+from .cache import document_cache, invalidate_cached_document
 from .client import q
 from .contrib.generic import GenericCreate, GenericDelete, GenericUpdate, AllFunction
 from .exceptions import DocNotFound
-from .queryset import Queryset
+from .identity import get_identity_map, remember, forget
+from .queryset import Queryset, ValuesQueryset
 from .resources import Index
 
 __all__ = ['Enum', 'Collection']
 
+MAX_PAGE_SIZE = 100000
+"""Largest page Fauna returns. Used to fetch every relation of a document in one page."""
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+
 
 class PFunkDeclaredVars(DeclaredVars):
     base_field_class = BaseProperty
@@ -23,6 +38,50 @@ class PFunkDeclaredVars(DeclaredVars):
 
 class PFunkDeclarativeVariablesMetaclass(DeclarativeVariablesMetaclass):
     declared_vars_class = PFunkDeclaredVars
+    metadata_vars = ('collection_indexes', 'collection_roles', 'collection_functions', 'collection_views')
+    """Class variables compiled to sets once per class. The declared lists are kept in `_declared_<name>`."""
+
+    def __new__(cls, name, bases, attrs):
+        new_class = super(PFunkDeclarativeVariablesMetaclass, cls).__new__(cls, name, bases, attrs)
+        cls.compile_metadata(new_class, attrs)
+        if getattr(getattr(new_class, 'Meta', None), 'cache_ttl', None):
+            # Cached documents are dropped when they are saved or deleted. The lists are copied so the signals of
+            # parent classes are not changed.
+            for signal in ('post_save_signals', 'post_delete_signals'):
+                signals = list(getattr(new_class, signal, None) or [])
+                if invalidate_cached_document not in signals:
+                    signals.append(invalidate_cached_document)
+                setattr(new_class, signal, signals)
+        return new_class
+
+    @classmethod
+    def compile_metadata(mcs, new_class, attrs) -> None:
+        """
+        Builds the indexes, roles, functions and views of a collection class once, when the class is created, so
+        instances share them instead of rebuilding them.
+        Args:
+            new_class: Collection class
+            attrs: Class variables declared in the class body
+
+        Returns: None
+        """
+        for var in mcs.metadata_vars:
+            if var in attrs:
+                declared = list(attrs[var] or [])
+            else:
+                declared = list(getattr(new_class, f'_declared_{var}', None) or getattr(new_class, var, None) or [])
+            setattr(new_class, f'_declared_{var}', declared)
+            setattr(new_class, var, set(declared))
+        if getattr(new_class, 'use_crud_functions', False):
+            new_class.collection_functions.update(new_class.crud_functions)
+        if getattr(new_class, 'use_crud_views', False):
+            new_class.collection_views.update(new_class.crud_views)
+        new_class._converters = {k: (v.get_python_value, v.get_default_value)
+                                 for k, v in new_class._base_properties.items()}
+        protected_vars = set(getattr(new_class, 'protected_vars', None) or [])
+        intersected_var_names = protected_vars.intersection(new_class._base_properties.keys())
+        if len(intersected_var_names) != 0:
+            raise ValueError(f'You are using protected var names in your schema: {intersected_var_names}')
 
 
 class Enum(Schema):
@@ -65,10 +124,15 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
     """Overrides the default collection name."""
     collection_views: list = []
     """Events that are attached to this collection."""
+    lazy_hydration: bool = True
+    """Specifies whether fields of documents loaded from Fauna are converted on first access instead of up front."""
+    aggregates: Aggregates = Aggregates()
+    """Counts, sums, minimums, maximums and means computed on the server. See `pfunk.aggregates.Aggregates`."""
     protected_vars: list = ['functions', 'indexes', 'roles', 'lazied', 'all_index', 'use_crud_functions',
                             'use_base_events', 'base_events', 'non_public_fields', 'verbose_plural_name',
-                            'collection_name']
-    """List of class variables that are not allowed a field names. """
+                            'collection_name', 'batch', 'filter', 'exclude', 'afilter', 'aggregates']
+    """List of class variables and methods that are not allowed as field names. A field with one of these names
+    would be shadowed by the class attribute."""
 
     def __init__(self, _ref: object = None, _lazied: bool = False, **kwargs) -> None:
         """
@@ -80,23 +144,18 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
         """
 
         super(Collection, self).__init__(**kwargs)
-        intersected_var_names = set(self.protected_vars).intersection(self._base_properties.keys())
-        if len(intersected_var_names) != 0:
-            raise ValueError(f'You are using protected var names in your schema: {intersected_var_names}')
-
         if _ref:
             self.ref = _ref
         self._lazied = _lazied
-        self.collection_indexes = set(self.collection_indexes)
-        self.collection_roles = set(self.collection_roles)
-        self.collection_functions = set(self.collection_functions)
-        if self.use_crud_views:
-            self.collection_views.extend(self.crud_views)
-        self.collection_views = set(self.collection_views)
-
-        if self.use_crud_functions:
-            for i in self.crud_functions:
-                self.collection_functions.add(i)
+        self._queryset = None
+        self._deferred = set()
+        self._ts = None
+        self._snapshot()
+        if not _ref:
+            # Fields passed to the constructor are dirty until the instance is saved, so setting a ref afterwards
+            # still updates them.
+            for name in kwargs:
+                self._loaded_data.pop(name, None)
 
     def get_fields(self) -> dict:
         """
@@ -127,12 +186,195 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
         return [i.enum for i in self._base_properties.values() if isinstance(i, import_util('pfunk.EnumField'))]
 
     def __getattr__(self, name):
-        if name in list(self._base_properties.keys()):
-            if self._lazied:
-                self._get(self.ref.id())
-                self._lazied = False
+        if name in self._base_properties:
+            if self._lazied or name in (self._deferred or ()):
+                self._resolve_lazied()
+            pending = self.__dict__.get('_pending')
+            if pending and name in pending:
+                return self._convert_field(name)
             prop = self._base_properties[name]
-            return prop.get_python_value(self._data.get(name))
+            return prop.get_python_value(self.__dict__['_data'].get(name))
+
+    def __setattr__(self, name, value):
+        d = self.__dict__
+        if name in d.get('_deferred', ()):
+            self._deferred.discard(name)
+        if name in self._base_properties and '_data' in d:
+            pending = d.get('_pending')
+            if pending and name in pending:
+                self._convert_field(name)
+            d['_data'][name] = value
+            return
+        super(Collection, self).__setattr__(name, value)
+
+    @property
+    def _data(self) -> dict:
+        """
+        Field values. Fields of documents loaded from Fauna that were not read yet are converted first.
+        """
+        d = self.__dict__
+        if d.get('_pending'):
+            for name in list(d['_pending']):
+                self._convert_field(name)
+        return d['_data']
+
+    @_data.setter
+    def _data(self, value: dict) -> None:
+        self.__dict__['_data'] = value
+        self.__dict__['_pending'] = None
+
+    def _set_db_data(self, data: dict) -> None:
+        """
+        Stores the `data` of a Fauna document without converting it. Each field is converted by `_convert_field` the
+        first time it is read, and the snapshot used by `get_dirty_fields` is filled in as fields are converted.
+        Args:
+            data: `data` of a Fauna document
+
+        Returns: None
+        """
+        if not self.lazy_hydration:
+            self._data = self.process_schema_kwargs(data)
+            self._snapshot()
+            return
+        d = self.__dict__
+        d['_data'] = {k: data.get(k) for k in self._converters}
+        d['_pending'] = set(self._converters)
+        d['_loaded_data'] = {}
+        for i in self.BUILTIN_DOC_ATTRS:
+            if data.get(i):
+                d['_data'][i] = d['_loaded_data'][i] = data[i]
+
+    def _convert_field(self, name):
+        """
+        Converts a field stored by `_set_db_data` the same way `process_schema_kwargs` does and caches the result.
+        Args:
+            name: Field name
+
+        Returns: converted value
+        """
+        d = self.__dict__
+        to_python, get_default = self._converters[name]
+        value = d['_data'].get(name) or get_default()
+        try:
+            value = to_python(value)
+        except ValueError:
+            pass
+        d['_data'][name] = value
+        d['_pending'].discard(name)
+        d['_loaded_data'][name] = copy(value) if isinstance(value, (list, dict)) else value
+        return value
+
+    @classmethod
+    def from_db(cls, doc: dict, lazied: bool = False):
+        """
+        Builds an instance from a Fauna document without running `__init__` and `process_schema_kwargs`. Fields are
+        converted on first access (see `lazy_hydration`). Only use it for data that came from Fauna.
+        Args:
+            doc: Fauna document (dict with `ref` and `data`)
+            lazied: Specifies if the document only has a ref. The document is loaded at the first evaluation.
+
+        Returns: Collection
+        """
+        obj = cls.__new__(cls)
+        d = obj.__dict__
+        d['_errors'] = {}
+        if doc.get('ref'):
+            d['ref'] = doc['ref']
+        d['_lazied'] = lazied
+        d['_queryset'] = None
+        d['_deferred'] = set()
+        d['_ts'] = doc.get('ts')
+        obj._set_db_data(doc.get('data') or {})
+        return obj
+
+    def _snapshot(self) -> None:
+        """
+        Remembers the current field values. `get_dirty_fields` compares against them.
+
+        Returns: None
+        """
+        self._loaded_data = {k: copy(v) if isinstance(v, (list, dict)) else v for k, v in self._data.items()}
+
+    def get_dirty_fields(self) -> list:
+        """
+        Returns the names of the fields changed since the instance was loaded or saved. Fields are compared by
+        identity and then by value, so lists and dicts changed in place are detected too. Fields passed to the
+        constructor without a `_ref` are dirty.
+
+        Returns: list
+        """
+        return [k for k, v in self._data.items()
+                if k not in self._loaded_data or (v is not self._loaded_data[k] and v != self._loaded_data[k])]
+
+    def _resolve_lazied(self) -> None:
+        """
+        Loads the full document of a lazied or partially loaded (see `only` in `get_index`) instance. Instances that
+        belong to a Queryset are loaded together with the rest of the page in one query.
+
+        Returns: None
+        """
+        if self._queryset is not None:
+            self._queryset.resolve_lazied()
+        if self._lazied or self._deferred:
+            doc = self._get_known_document(self.ref.id())
+            if doc is None:
+                doc = self.client().query(self._get_query(self.ref.id()))
+                self._remember_document(doc)
+            self._load(doc)
+
+    def _get_known_document(self, id, _token=None):
+        """
+        Returns the document from the identity map of the current request or from the document cache (see
+        `Meta.cache_ttl`) without querying Fauna. Cached documents are only returned to the token that read them.
+        Args:
+            id: ID of the document
+            _token: Token (secret) the document is read with
+
+        Returns: dict or None
+        """
+        identity_map = get_identity_map()
+        doc = identity_map.get(self.get_collection_name(), id) if identity_map is not None else None
+        if doc is None and self.get_cache_ttl():
+            doc = document_cache.get(self.get_collection_name(), id, secret=_token)
+            remember(doc)
+        return doc
+
+    def _remember_document(self, doc, _token=None) -> None:
+        """
+        Stores a fetched document in the identity map of the current request and in the document cache.
+        Args:
+            doc: Fauna document
+            _token: Token (secret) the document was read with
+
+        Returns: None
+        """
+        remember(doc)
+        ttl = self.get_cache_ttl()
+        if ttl and doc:
+            document_cache.set(doc, ttl, secret=_token)
+
+    @classmethod
+    def get_cache_ttl(cls) -> int:
+        """
+        Returns the number of seconds documents of this collection are cached by `get`, set with `Meta.cache_ttl`.
+        The cache is shared by every request of the process (or every process with a shared backend) so it is meant
+        for reference data that rarely changes.
+
+        Returns: int or None if documents are not cached
+        """
+        try:
+            return cls.Meta.cache_ttl
+        except AttributeError:
+            return None
+
+    @classmethod
+    def get_cache_stats(cls) -> dict:
+        """
+        Returns the hit and miss counters of the document cache for this collection.
+
+        Returns: dict
+        """
+        return document_cache.get_stats(cls().get_collection_name())
 
     @classmethod
     def get_verbose_plural_name(cls) -> str:
@@ -183,13 +425,32 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
         if _validate:
             self._data.update(kwargs)
             self.validate()
-        return self.client(_token=_token).query(
+        return self._query(q.call(func_name, kwargs), _token=_token)
+
+    async def acall_function(self, func_name: str, _validate: bool = False, _token: str = None, **kwargs):
+        """
+        Async version of `call_function`.
+        Args:
+            func_name: Name of the function
+            _validate: If True the keyword arguments will validated against Collection schema
+            _token: Token (secret) used to make call
+            **kwargs: keyword arguments
+
+        Returns: dict
+
+        """
+
+        if _validate:
+            self._data.update(kwargs)
+            self.validate()
+        return await self.aclient(_token=_token).query(
             q.call(func_name, kwargs)
         )
 
     def client(self, _token=None) -> FaunaClient:
         """
-        Initializes FaunaClient
+        Returns a pooled FaunaClient. Clients are shared process-wide and keyed by secret so the HTTP session and its
+        connections are reused between calls.
         Args:
             _token: Token (secret) used to initialize client
 
@@ -197,9 +458,59 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
 
         """
 
-        if _token:
-            return FaunaClient(secret=_token)
-        return FaunaClient(secret=env('FAUNA_SECRET'))
+        return get_client(_token or env('FAUNA_SECRET'))
+
+    def aclient(self, _token=None) -> AsyncFaunaClient:
+        """
+        Returns a pooled AsyncFaunaClient for the running event loop.
+        Args:
+            _token: Token (secret) used to initialize client
+
+        Returns: AsyncFaunaClient
+
+        """
+
+        return get_async_client(_token or env('FAUNA_SECRET'))
+
+    def _query(self, query, callback=None, _token=None):
+        """
+        Sends a query, or records it if a batch is open (see `Collection.batch`).
+        Args:
+            query: Fauna expression
+            callback: Called with the response once it is available
+            _token: Token (secret) used to make call
+
+        Returns: Fauna response or BatchResult
+
+        """
+        batch = get_current_batch()
+        if batch is not None:
+            return batch.add(query, callback=callback, _token=_token)
+        resp = self.client(_token=_token).query(query)
+        if callback:
+            callback(resp)
+        return resp
+
+    @classmethod
+    def batch(cls, chunk_size: int = None) -> QueryBatch:
+        """
+        Opens a batch that records the queries sent by `save`, `delete`, `get` and `call_function` and sends them in
+        as few requests as possible when the block exits.
+
+        Usage:
+            with Collection.batch():
+                for i in range(500):
+                    Sport.create(name=f'Sport {i}')
+
+        Args:
+            chunk_size: Maximum number of expressions sent in one request.
+
+        Returns: QueryBatch
+
+        """
+        if chunk_size:
+            return QueryBatch(chunk_size=chunk_size)
+        return QueryBatch()
 
     @classmethod
     def create(cls, _credentials=None, _token=None, **kwargs):
@@ -218,6 +529,341 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
         c.save(_credentials=_credentials, _token=_token)
         return c
 
+    @classmethod
+    async def acreate(cls, _credentials=None, _token=None, **kwargs):
+        """
+        Async version of `create`.
+        Args:
+            _credentials: If this Collection provides authentication this would be the password field.
+            _token: Token (secret) used to make call
+            **kwargs: Keyword arguments used to specify the document's attributes
+
+        Returns: Collection
+
+        """
+
+        c = cls(**kwargs)
+        await c.asave(_credentials=_credentials, _token=_token)
+        return c
+
+    @classmethod
+    def get_or_create(cls, index_name, terms=[], defaults=None, _token=None) -> tuple:
+        """
+        Get the first document of an index or create it from `defaults` if the index has no match. The check, the
+        create and the ManyToMany relations are sent as one query, so two concurrent calls can't both create it.
+
+        Usage:
+            group, created = Group.get_or_create('group_by_slug', terms=['admins'],
+                                                 defaults={'name': 'Admins', 'slug': 'admins'})
+
+        Args:
+            index_name: Name of the index
+            terms: Terms of the index
+            defaults: Field values of the created document. They have to validate as a complete document.
+            _token: Token (secret) used to make call
+
+        Returns: tuple (Collection, created)
+
+        """
+        c = cls(**(defaults or {}))
+        resp = c.client(_token=_token).query(c.get_or_create_query(index_name, terms))
+        return c._post_get_or_create(resp), resp['created']
+
+    @classmethod
+    async def aget_or_create(cls, index_name, terms=[], defaults=None, _token=None) -> tuple:
+        """
+        Async version of `get_or_create`.
+        Args:
+            index_name: Name of the index
+            terms: Terms of the index
+            defaults: Field values of the created document. They have to validate as a complete document.
+            _token: Token (secret) used to make call
+
+        Returns: tuple (Collection, created)
+
+        """
+        c = cls(**(defaults or {}))
+        resp = await c.aclient(_token=_token).query(c.get_or_create_query(index_name, terms))
+        return c._post_get_or_create(resp), resp['created']
+
+    @classmethod
+    def update_or_create(cls, index_name, terms=[], defaults=None, _token=None) -> tuple:
+        """
+        Update the first document of an index with `defaults` or create it from `defaults` if the index has no match,
+        in one query. The update only sends the fields in `defaults`; the other fields of the document are kept.
+        Args:
+            index_name: Name of the index
+            terms: Terms of the index
+            defaults: Field values that are set. They have to validate as a complete document.
+            _token: Token (secret) used to make call
+
+        Returns: tuple (Collection, created)
+
+        """
+        c = cls(**(defaults or {}))
+        resp = c.client(_token=_token).query(
+            c.get_or_create_query(index_name, terms, update=True, update_fields=list(defaults or {})))
+        return c._post_get_or_create(resp, update=True), resp['created']
+
+    @classmethod
+    async def aupdate_or_create(cls, index_name, terms=[], defaults=None, _token=None) -> tuple:
+        """
+        Async version of `update_or_create`.
+        Args:
+            index_name: Name of the index
+            terms: Terms of the index
+            defaults: Field values that are set. They have to validate as a complete document.
+            _token: Token (secret) used to make call
+
+        Returns: tuple (Collection, created)
+
+        """
+        c = cls(**(defaults or {}))
+        resp = await c.aclient(_token=_token).query(
+            c.get_or_create_query(index_name, terms, update=True, update_fields=list(defaults or {})))
+        return c._post_get_or_create(resp, update=True), resp['created']
+
+    def get_or_create_query(self, index_name, terms=[], update=False, update_fields=None):
+        """
+        Builds the query used by `get_or_create` and `update_or_create`. It returns an object with the `doc` and
+        `created` keys. The ManyToMany relations are saved in the same query when the document is created or updated.
+        Args:
+            index_name: Name of the index
+            terms: Terms of the index
+            update: Optional - default False. If True an existing document is updated with the instance's data.
+            update_fields: Optional - names of the fields sent by the update. Defaults to the changed fields (see
+            `get_dirty_fields`). A created document gets every field.
+
+        Returns: query
+
+        """
+        self.call_signals('pre_validate_signals')
+        self.validate()
+        ref = q.select('ref', q.var('doc'))
+        data_dict, relational_data = self.get_data_dict()
+        match = q.match(q.index(index_name), terms)
+        created = q.create(q.collection(self.get_collection_name()), data_dict)
+        created_queries = self.get_related_queries(relational_data, ref=ref)
+        if update:
+            update_dict, update_relational_data = self.get_data_dict(fields=self.get_update_fields(update_fields))
+            existing = q.update(q.select('ref', q.get(match)), update_dict)
+            existing_queries = self.get_related_queries(update_relational_data, ref=ref)
+        else:
+            existing = q.get(match)
+            existing_queries = []
+        result = {'doc': q.var('doc'), 'created': q.not_(q.var('found'))}
+        if created_queries or existing_queries:
+            result = q.do(q.if_(
+                q.var('found'),
+                q.do(*existing_queries) if existing_queries else None,
+                q.do(*created_queries) if created_queries else None
+            ), result)
+        return q.let(
+            {
+                'found': q.exists(match),
+                'doc': q.if_(q.var('found'), existing, created)
+            },
+            result
+        )
+
+    def _post_get_or_create(self, resp, update=False):
+        """
+        Applies the response of `get_or_create_query`. Signals are only called if the document was saved.
+        Args:
+            resp: Fauna response
+            update: Specifies if the query updated an existing document
+
+        Returns: Collection
+
+        """
+        if resp['created']:
+            self._post_save_query(resp['doc'], True)
+            self.call_signals('post_save_signals')
+            return self
+        remember(resp['doc'])
+        obj = self.from_db(resp['doc'])
+        if update:
+            obj.call_signals('post_save_signals')
+        return obj
+
+    ########
+    # Bulk #
+    ########
+
+    @classmethod
+    def bulk_create(cls, instances: list, chunk_size: int = 500, _token=None) -> BulkResult:
+        """
+        Create many documents with one `q.map_` query per chunk. Instances are validated locally first and the
+        ManyToMany relations of every instance are created in the same query as the document.
+        Args:
+            instances: list of unsaved Collection instances
+            chunk_size: Number of documents sent per request
+            _token: Token (secret) used to make call
+
+        Returns: BulkResult (refs in input order and per-item errors). The `ref` of every created instance is set.
+
+        """
+        result = BulkResult(len(instances))
+        items = []
+        for index, obj in enumerate(instances):
+            try:
+                obj.call_signals('pre_validate_signals')
+                obj.validate()
+            except ValidationException as e:
+                result.errors[index] = e
+                continue
+            obj.call_signals('pre_create_signals')
+            data_dict, relational_data = obj.get_data_dict()
+            items.append((index, {'doc': data_dict, 'relations': obj.get_relations(relational_data)}))
+
+        ref_key = f"{cls.get_class_name()}ID"
+        cls._bulk_query(
+            lambda payloads: q.map_(
+                q.lambda_('item',
+                          q.let({'ref': q.select('ref', q.create(q.collection(cls().get_collection_name()),
+                                                                 q.select('doc', q.var('item'))))},
+                                q.do(
+                                    q.foreach(
+                                        q.lambda_('rel', q.create(
+                                            q.collection(q.select('collection', q.var('rel'))),
+                                            {'data': q.merge(q.select('data', q.var('rel')),
+                                                             {ref_key: q.var('ref')})}
+                                        )),
+                                        q.select('relations', q.var('item'))
+                                    ),
+                                    q.var('ref')
+                                ))
+                          ),
+                payloads
+            ),
+            items, result, chunk_size=chunk_size, _token=_token
+        )
+        for index, obj in enumerate(instances):
+            if result.refs[index]:
+                obj.ref = result.refs[index]
+                obj._snapshot()
+                obj.call_signals('post_create_signals')
+                obj.call_signals('post_save_signals')
+        return result
+
+    @classmethod
+    def bulk_update(cls, instances: list, chunk_size: int = 500, _token=None) -> BulkResult:
+        """
+        Update many documents with one `q.map_` query per chunk. Instances are validated locally first and the
+        ManyToMany relations of every instance are saved in the same query as the document.
+        Args:
+            instances: list of saved Collection instances
+            chunk_size: Number of documents sent per request
+            _token: Token (secret) used to make call
+
+        Returns: BulkResult (refs in input order and per-item errors)
+
+        """
+        result = BulkResult(len(instances))
+        items = []
+        for index, obj in enumerate(instances):
+            try:
+                if not obj.ref:
+                    raise ValueError('bulk_update requires saved instances.')
+                data_dict, relational_data = obj.get_save_data()
+            except (ValidationException, ValueError) as e:
+                result.errors[index] = e
+                continue
+            obj.call_signals('pre_save_related_signals')
+            forget(obj.ref)
+            items.append((index, {'ref': obj.ref, 'doc': data_dict,
+                                  'relations': obj.get_relation_refs(relational_data)}))
+
+        fields = cls.get_relation_fields()
+        updated = q.select('ref', q.update(q.select('ref', q.var('item')), q.select('doc', q.var('item'))))
+        if fields:
+            updated = q.let({'ref': updated}, q.do(*[
+                q.if_(
+                    q.contains_path(['relations', name], q.var('item')),
+                    field.get_relation_query(cls, q.var('ref'), q.select(['relations', name], q.var('item'))),
+                    None
+                ) for name, field in fields.items()
+            ], q.var('ref')))
+        cls._bulk_query(
+            lambda payloads: q.map_(q.lambda_('item', updated), payloads),
+            items, result, chunk_size=chunk_size, _token=_token
+        )
+        for index, obj in enumerate(instances):
+            if result.refs[index]:
+                obj._snapshot()
+                obj.call_signals('post_save_signals')
+        return result
+
+    @classmethod
+    def bulk_delete(cls, instances: list, chunk_size: int = 500, _token=None) -> BulkResult:
+        """
+        Delete many documents with one `q.map_` query per chunk.
+        Args:
+            instances: list of saved Collection instances
+            chunk_size: Number of documents sent per request
+            _token: Token (secret) used to make call
+
+        Returns: BulkResult (refs in input order and per-item errors)
+
+        """
+        result = BulkResult(len(instances))
+        items = []
+        for index, obj in enumerate(instances):
+            obj.call_signals('pre_delete_signals')
+            forget(obj.ref)
+            items.append((index, obj.ref))
+
+        cls._bulk_query(
+            lambda payloads: q.map_(q.lambda_('ref', q.select('ref', q.delete(q.var('ref')))), payloads),
+            items, result, chunk_size=chunk_size, _token=_token
+        )
+        for index, obj in enumerate(instances):
+            if result.refs[index]:
+                obj.call_signals('post_delete_signals')
+        return result
+
+    @classmethod
+    def _bulk_query(cls, build_query, items: list, result: BulkResult, chunk_size: int = 500, _token=None) -> None:
+        """
+        Sends the items in chunks and stores the returned refs in the result.
+        Args:
+            build_query: Function that builds the query for a list of payloads
+            items: list of (position, payload) tuples
+            result: BulkResult the refs and errors are stored in
+            chunk_size: Number of items sent per request
+            _token: Token (secret) used to make call
+
+        Returns: None
+
+        """
+        client = cls().client(_token=_token)
+        for n in range(0, len(items), chunk_size):
+            cls._bulk_chunk(client, build_query, items[n:n + chunk_size], result)
+
+    @classmethod
+    def _bulk_chunk(cls, client, build_query, chunk: list, result: BulkResult) -> None:
+        """
+        Sends one chunk. A chunk is a single transaction, so when it fails it is split in halves and retried until
+        the failing items are isolated.
+
+        Returns: None
+
+        """
+        if not chunk:
+            return
+        try:
+            refs = client.query(build_query([payload for _, payload in chunk]))
+        except (BadRequest, NotFound) as e:
+            if len(chunk) == 1:
+                result.errors[chunk[0][0]] = e
+                return
+            middle = len(chunk) // 2
+            cls._bulk_chunk(client, build_query, chunk[:middle], result)
+            cls._bulk_chunk(client, build_query, chunk[middle:], result)
+            return
+        for (index, _), ref in zip(chunk, refs):
+            result.refs[index] = ref
+
     ##############
     # Deployment #
     ##############
@@ -248,9 +894,6 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
         Returns: None
         """
         c = cls()
-        if c.use_crud_functions:
-            for f in c.crud_functions:
-                c.collection_functions.add(f)
         for i in c.collection_functions:
             i(c).publish()
 
@@ -313,9 +956,12 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
         except AttributeError:
             return None
 
+        index_names = {i.name for i in self.collection_indexes}
         for i in meta_unique_together:
             fields = '_'.join(i)
             name = f'{self.get_class_name()}_unique_{fields}'
+            if name in index_names:
+                continue
             terms = [{'binding': f, 'field': ['data', f]} for f in i]
             unique = True
             source = self.get_collection_name()
@@ -329,15 +975,19 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
                         })
             self.collection_indexes.add(Indy)
 
-    def get_db_values(self) -> tuple:
+    def get_db_values(self, fields=None) -> tuple:
         """
         Get and transform the values before sending to the database.
+        Args:
+            fields: Optional - names of the fields to transform. Defaults to every field.
 
         Returns: tuple
         """
         data = dict()
         relational_data = dict()
         for k, v in self._data.items():
+            if fields is not None and k not in fields:
+                continue
             prop = self._base_properties.get(k)
             if not prop.relation_field:
                 data[k] = prop.get_db_value(value=v)
@@ -352,7 +1002,7 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
 
     def _save_related(self, relational_data, _token=None) -> None:
         """
-        Save related data
+        Save related data in one query
         Args:
             relational_data: dict that contains data to be saved
             _token: Token (secret) used to make call
@@ -361,111 +1011,368 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
 
         """
 
-        client = self.client(_token=_token)
-        for k, v in relational_data.items():
-            for i in v:
-                try:
-                    resp = client.query(
-                        q.create(
-                            q.collection(k),
-                            {
-                                "data": {
-                                    f"{self.get_class_name()}ID": self.ref,
-                                    f"{i.get_class_name()}ID": i.ref
-                                }
-                            }
-                        )
-                    )
-                except BadRequest:
-                    pass
-
-    def call_signals(self, name):
-        signals = getattr(self, name) or []
-        for i in signals:
-            i(self)
-
-    def get_data_dict(self, _credentials=None):
-        data, relational_data = self.get_db_values()
-
-        data_dict = dict()
-        data_dict['data'] = data
+        queries = self.get_related_queries(relational_data)
+        if not queries:
+            return
+        self.client(_token=_token).query(q.do(*queries))
 
-        if _credentials:
-            data_dict['credentials'] = {
-                'password': _credentials
-            }
-        return data_dict, relational_data
-
-    def save(self, _credentials=None, _token=None) -> None:
+    async def _asave_related(self, relational_data, _token=None) -> None:
         """
-        Save current instance to Fauna
+        Async version of `_save_related`.
         Args:
-            _credentials: If this Collection provides authentication this would be the password field.
+            relational_data: dict that contains data to be saved
             _token: Token (secret) used to make call
 
         Returns: None
 
         """
+
+        queries = self.get_related_queries(relational_data)
+        if not queries:
+            return
+        await self.aclient(_token=_token).query(q.do(*queries))
+
+    def get_related_queries(self, relational_data, ref=None) -> list:
+        """
+        Builds one query per ManyToMany field that creates the relation documents that do not exist yet. Fields
+        declared with `sync_relations=True` also delete the relations to documents that are not in the list anymore.
+        Args:
+            relational_data: dict that contains data to be saved
+            ref: Optional - ref or expression of the document. Defaults to the instance's ref.
+
+        Returns: list
+
+        """
+        fields = self.get_relation_fields()
+        if ref is None:
+            ref = self.ref
+        return [fields[k].get_relation_query(self.__class__, ref, v)
+                for k, v in self.get_relation_refs(relational_data).items()]
+
+    @classmethod
+    def get_relation_fields(cls) -> dict:
+        """
+        Returns the ManyToMany fields keyed by relation name.
+
+        Returns: dict
+        """
+        return {prop.relation_name: prop for prop in cls._base_properties.values() if prop.relation_field}
+
+    def get_relation_refs(self, relational_data) -> dict:
+        """
+        Returns the related refs of the ManyToMany data that is saved: non-empty lists, and empty lists of fields
+        declared with `sync_relations=True`.
+        Args:
+            relational_data: dict that contains data to be saved
+
+        Returns: dict of relation name to list of refs
+        """
+        fields = self.get_relation_fields()
+        return {k: [i.ref for i in v] for k, v in relational_data.items()
+                if v or (v is not None and fields[k].kwargs.get('sync_relations'))}
+
+    def get_relations(self, relational_data) -> list:
+        """
+        Lists the relation documents for the ManyToMany data, without this instance's own ref.
+        Args:
+            relational_data: dict that contains data to be saved
+
+        Returns: list of dicts with the relation `collection` name and the related document `data`
+
+        """
+        return [
+            {'collection': k, 'data': {f"{i.get_class_name()}ID": i.ref}}
+            for k, v in relational_data.items() for i in (v or [])
+        ]
+
+    def call_signals(self, name):
+        signals = getattr(self, name) or []
+        for i in signals:
+            i(self)
+
+    def get_data_dict(self, _credentials=None, fields=None):
+        data, relational_data = self.get_db_values(fields=fields)
+
+        data_dict = dict()
+        data_dict['data'] = data
+
+        if _credentials:
+            data_dict['credentials'] = {
+                'password': _credentials
+            }
+        return data_dict, relational_data
+
+    def save(self, _credentials=None, update_fields=None, _token=None) -> None:
+        """
+        Save current instance to Fauna. Updates only send the fields changed since the instance was loaded (see
+        `get_dirty_fields`).
+        Args:
+            _credentials: If this Collection provides authentication this would be the password field.
+            update_fields: Optional - names of the fields sent by an update instead of the changed fields.
+            _token: Token (secret) used to make call
+
+        Returns: None
+
+        """
+        created = not self.ref
+        query, relational_data = self.get_save_query(_credentials=_credentials, update_fields=update_fields)
+        batched = get_current_batch() is not None
+        if batched:
+            # The relations are saved by the batched query so the batch still sends one request per chunk.
+            self.call_signals('pre_save_related_signals')
+            query = self.get_save_related_query(query, relational_data)
+
+        def callback(resp):
+            self._post_save_query(resp, created)
+            if not batched:
+                self.call_signals('pre_save_related_signals')
+                self._save_related(relational_data, _token=_token)
+            self.call_signals('post_save_signals')
+
+        self._query(query, callback, _token=_token)
+
+    async def asave(self, _credentials=None, update_fields=None, _token=None) -> None:
+        """
+        Async version of `save`.
+        Args:
+            _credentials: If this Collection provides authentication this would be the password field.
+            update_fields: Optional - names of the fields sent by an update instead of the changed fields.
+            _token: Token (secret) used to make call
+
+        Returns: None
+
+        """
+        created = not self.ref
+        query, relational_data = self.get_save_query(_credentials=_credentials, update_fields=update_fields)
+        resp = await self.aclient(_token=_token).query(query)
+        self._post_save_query(resp, created)
+
+        self.call_signals('pre_save_related_signals')
+        await self._asave_related(relational_data, _token=_token)
+        self.call_signals('post_save_signals')
+
+    def get_save_query(self, _credentials=None, update_fields=None) -> tuple:
+        """
+        Validates the instance and builds the create or update query used by `save`. An update only contains the
+        `update_fields` or, by default, the changed fields.
+        Args:
+            _credentials: If this Collection provides authentication this would be the password field.
+            update_fields: Optional - names of the fields sent by an update.
+
+        Returns: tuple (query, relational_data)
+
+        """
+        data_dict, relational_data = self.get_save_data(_credentials=_credentials, update_fields=update_fields)
+        if not self.ref:
+            return q.create(q.collection(self.get_collection_name()), data_dict), relational_data
+        return q.update(self.ref, data_dict), relational_data
+
+    def get_save_data(self, _credentials=None, update_fields=None) -> tuple:
+        """
+        Validates the instance, calls the create or update signals and serializes the data a save sends. `save` and
+        `bulk_update` both use it so signals that change the instance are applied the same way.
+        Args:
+            _credentials: If this Collection provides authentication this would be the password field.
+            update_fields: Optional - names of the fields sent by an update.
+
+        Returns: tuple (data_dict, relational_data)
+
+        """
+        if self._deferred:
+            self._resolve_lazied()
         self.call_signals('pre_validate_signals')
         self.validate()
 
         if not self.ref:
             self.call_signals('pre_create_signals')
-            data_dict, relational_data = self.get_data_dict(_credentials=_credentials)
-            resp = self.client(_token=_token).query(
-                q.create(
-                    q.collection(self.get_collection_name()),
-                    data_dict
-                ))
+            return self.get_data_dict(_credentials=_credentials)
+
+        self.call_signals('pre_update_signals')
+        return self.get_data_dict(_credentials=_credentials, fields=self.get_update_fields(update_fields))
+
+    def get_save_related_query(self, query, relational_data):
+        """
+        Wraps a create or update query so it also saves the ManyToMany relations of the document.
+        Args:
+            query: Create or update query
+            relational_data: dict that contains data to be saved
+
+        Returns: Fauna expression that returns the document
+        """
+        queries = self.get_related_queries(relational_data, ref=q.select('ref', q.var('doc')))
+        if not queries:
+            return query
+        return q.let({'doc': query}, q.do(*queries, q.var('doc')))
+
+    def get_update_fields(self, update_fields=None) -> list:
+        """
+        Returns the names of the fields an update sends.
+        Args:
+            update_fields: Optional - names of the fields. Defaults to the changed fields.
+
+        Returns: list
+        """
+        if update_fields is None:
+            return self.get_dirty_fields()
+        for name in update_fields:
+            if name not in self._base_properties:
+                raise ValueError(f'update_fields: {name} is not a field of {self.__class__.__name__}')
+        return list(update_fields)
+
+    def _post_save_query(self, resp, created) -> None:
+        """
+        Applies the response of the create or update query to the instance.
+        Args:
+            resp: Fauna response
+            created: True if the query created the document
+
+        Returns: None
+
+        """
+        remember(resp)
+        self._snapshot()
+        self._ts = resp.get('ts')
+        if created:
             self.ref = resp['ref']
             self.call_signals('post_create_signals')
-        else:
-            data_dict, relational_data = self.get_data_dict(_credentials=_credentials)
-            self.call_signals('pre_update_signals')
-            self.client(_token=_token).query(
-                q.update(
-                    self.ref,
-                    data_dict
-                )
-            )
-
-        self.call_signals('pre_save_related_signals')
-        self._save_related(relational_data, _token=_token)
-        self.call_signals('post_save_signals')
 
-    def _get(self, ref, _token=None):
+    def _get(self, ref, select_related=None, prefetch_related=None, _token=None):
         """
         Instance method to get one document by ref
         Args:
             ref: Ref (ID) string
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
             _token: Token (secret) used to make call
 
         Returns: Collection
 
         """
+        if not select_related and not prefetch_related:
+            doc = self._get_known_document(ref, _token=_token)
+            if doc is not None:
+                return self._load(doc)
 
-        resp = self.client(_token=_token).query(q.get(q.ref(q.collection(self.get_collection_name()), ref)))
-        ref = resp['ref']
-        data = resp['data']
-        self._data = self.process_schema_kwargs(data)
-        self.ref = ref
+        def callback(resp):
+            self._remember_document(resp, _token=_token)
+            self._load(resp)
+
+        self._query(self._get_query(ref, select_related=select_related, prefetch_related=prefetch_related),
+                    callback, _token=_token)
         return self
 
+    async def _aget(self, ref, select_related=None, prefetch_related=None, _token=None):
+        """
+        Async version of `_get`.
+        Args:
+            ref: Ref (ID) string
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            _token: Token (secret) used to make call
+
+        Returns: Collection
+
+        """
+
+        if not select_related and not prefetch_related:
+            doc = self._get_known_document(ref, _token=_token)
+            if doc is not None:
+                return self._load(doc)
+        query = self._get_query(ref, select_related=select_related, prefetch_related=prefetch_related)
+        resp = await self.aclient(_token=_token).query(query)
+        self._remember_document(resp, _token=_token)
+        return self._load(resp)
+
+    def _get_query(self, ref, select_related=None, prefetch_related=None):
+        """
+        Builds the query that fetches one document by ref
+        Args:
+            ref: Ref (ID) string
+            select_related: Optional - list of ReferenceField names
+            prefetch_related: Optional - list of ManyToManyField names
+
+        Returns: query
+
+        """
+        return self.get_document_query(q.ref(q.collection(self.get_collection_name()), ref),
+                                       select_related=select_related, prefetch_related=prefetch_related)
+
+    def _load(self, resp):
+        """
+        Loads a Fauna document response into the instance
+        Args:
+            resp: Fauna document (dict with `ref` and `data`)
+
+        Returns: Collection
+
+        """
+        changed = {k: self._data[k] for k in self.get_dirty_fields()} if self._deferred else {}
+        self._set_db_data(resp['data'])
+        self.ref = resp['ref']
+        self._ts = resp.get('ts')
+        self._lazied = False
+        self._deferred = set()
+        self._load_related(resp.get('related'))
+        if changed:
+            self._data.update(changed)
+        return self
+
+    def _load_related(self, related: dict) -> None:
+        """
+        Stores the documents fetched with `select_related` as loaded (not lazied) instances.
+        Args:
+            related: dict of field name to Fauna document (ReferenceField) or list of documents (ManyToManyField)
+
+        Returns: None
+
+        """
+        for name, doc in (related or {}).items():
+            foreign_class = self._base_properties[name].get_foreign_class()
+            if isinstance(doc, list):
+                value = [foreign_class.from_db(i) for i in doc]
+            elif doc:
+                value = foreign_class.from_db(doc)
+            else:
+                continue
+            self.__dict__['_data'][name] = value
+            if self.__dict__.get('_pending'):
+                self._pending.discard(name)
+            self._loaded_data[name] = copy(value) if isinstance(doc, list) else value
+
     @classmethod
-    def get(cls, ref, _token=None):
+    def get(cls, ref, _token=None, select_related=None, prefetch_related=None):
         """
         Class method to get one document by ref
         Args:
             ref: Ref (ID) string
             _token: Token (secret) used to make call
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+
+        Returns: Collection
+
+        """
+        return cls()._get(ref, select_related=select_related, prefetch_related=prefetch_related, _token=_token)
+
+    @classmethod
+    async def aget(cls, ref, _token=None, select_related=None, prefetch_related=None):
+        """
+        Async version of `get`.
+        Args:
+            ref: Ref (ID) string
+            _token: Token (secret) used to make call
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
 
         Returns: Collection
 
         """
-        return cls()._get(ref, _token=_token)
+        return await cls()._aget(ref, select_related=select_related, prefetch_related=prefetch_related,
+                                 _token=_token)
 
     @classmethod
-    def all(cls, page_size=100, after=None, before=None, ts=None, events=False, sources=False, _token=None) -> list:
+    def all(cls, page_size=100, after=None, before=None, ts=None, events=False, sources=False, select_related=None,
+            prefetch_related=None, only=None, defer=None, _token=None) -> list:
         """
         Calls the built-in "all" index.
         Args:
@@ -475,6 +1382,11 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
             ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
             events: Optional - default False. If True, return a Page from the event history of the input.
             sources: Optional - default false. If true, includes the source of truth providing why this object was included in the results.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
             _token: Token (secret) used to make call
 
         Returns: list
@@ -483,18 +1395,70 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
 
         return cls.get_index(cls().all_index_name(), page_size=page_size, after=after, before=before, ts=ts,
                              events=events,
-                             sources=sources, _token=_token)
+                             sources=sources, select_related=select_related,
+                             prefetch_related=prefetch_related, only=only, defer=defer, _token=_token)
+
+    @classmethod
+    async def aall(cls, page_size=100, after=None, before=None, ts=None, events=False, sources=False,
+                   select_related=None, prefetch_related=None, only=None, defer=None, _token=None) -> list:
+        """
+        Async version of `all`.
+        Args:
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
+            events: Optional - default False. If True, return a Page from the event history of the input.
+            sources: Optional - default false. If true, includes the source of truth providing why this object was included in the results.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+            _token: Token (secret) used to make call
+
+        Returns: list
+
+        """
+
+        return await cls.aget_index(cls().all_index_name(), page_size=page_size, after=after, before=before, ts=ts,
+                                    events=events, sources=sources, select_related=select_related,
+                                    prefetch_related=prefetch_related, only=only, defer=defer, _token=_token)
+
+    @classmethod
+    def iter_all(cls, page_size=100, prefetch=False, select_related=None, prefetch_related=None, only=None,
+                 defer=None, _token=None):
+        """
+        Iterates over every document of the collection, following the `after` cursors page by page. Only one page is
+        kept in memory so full-collection scans run in constant memory.
+        Args:
+            page_size: The number of records fetched per request.
+            prefetch: Optional - default False. If True the next page is fetched on a background thread while the
+            current one is consumed.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+            _token: Token (secret) used to make call
+
+        Returns: generator
+
+        """
+        return cls.all(page_size=page_size, select_related=select_related, prefetch_related=prefetch_related,
+                       only=only, defer=defer, _token=_token).iterator(prefetch=prefetch)
 
     @classmethod
     def get_by(cls, index_name, terms=[], use_map=True):
         try:
-            return cls.get_index(index_name, terms=terms, use_map=use_map)[0]
+            return cls.get_index(index_name, terms=terms, page_size=1, use_map=use_map)[0]
         except IndexError:
             raise DocNotFound('Document not found.')
 
     @classmethod
     def get_index(cls, index_name, terms=[], page_size=100, after=None, before=None, ts=None, events=False,
-                  sources=False, use_map=True, _token=None):
+                  sources=False, use_map=True, select_related=None, prefetch_related=None, only=None, defer=None,
+                  batch_lazied=True, _token=None):
         """
         Call an index
         Args:
@@ -506,44 +1470,762 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
             ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
             events: Optional - default False. If True, return a Page from the event history of the input.
             sources: Optional - default false. If true, includes the source of truth providing why this object was included in the results.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+            batch_lazied: Optional - default True. If `use_map` is False, the first attribute read on any instance of
+            the page loads every lazied instance of the page in one query. If False each instance loads itself.
             _token: Token (secret) used to make call
 
-        Returns:
+        Returns: Queryset
 
         """
 
-        c = cls()
+        query = cls.get_index_query(index_name, terms=terms, page_size=page_size, after=after, before=before, ts=ts,
+                                    events=events, use_map=use_map, select_related=select_related,
+                                    prefetch_related=prefetch_related, only=only, defer=defer)
+        started = perf_counter()
+        query_response = cls().client(_token=_token).query(query)
+        if index_advisor.enabled:
+            cls.record_index_query(index_name, terms, query_response, perf_counter() - started)
+        if use_map and not only and not defer:
+            cls.remember_page(query_response, _token=_token)
+        fetch_page = partial(cls.get_index, index_name, terms=terms, page_size=page_size, ts=ts, events=events,
+                             sources=sources, use_map=use_map, select_related=select_related,
+                             prefetch_related=prefetch_related, only=only, defer=defer, batch_lazied=batch_lazied,
+                             _token=_token)
+        return Queryset(query_response, cls, not use_map, batch_lazied=batch_lazied, _token=_token,
+                        fetch_page=fetch_page,
+                        deferred=cls.get_deferred_fields(only, defer, select_related, prefetch_related))
+
+    @classmethod
+    async def aget_index(cls, index_name, terms=[], page_size=100, after=None, before=None, ts=None, events=False,
+                         sources=False, use_map=True, select_related=None, prefetch_related=None, only=None,
+                         defer=None, batch_lazied=True, _token=None):
+        """
+        Async version of `get_index`.
+        Args:
+            index_name: Name of the index
+            terms: Fields that should be indexed together.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
+            events: Optional - default False. If True, return a Page from the event history of the input.
+            sources: Optional - default false. If true, includes the source of truth providing why this object was included in the results.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+            batch_lazied: Optional - default True. If `use_map` is False, the first attribute read on any instance of
+            the page loads every lazied instance of the page in one query. If False each instance loads itself.
+            _token: Token (secret) used to make call
+
+        Returns: Queryset
+
+        """
+
+        query = cls.get_index_query(index_name, terms=terms, page_size=page_size, after=after, before=before, ts=ts,
+                                    events=events, use_map=use_map, select_related=select_related,
+                                    prefetch_related=prefetch_related, only=only, defer=defer)
+        started = perf_counter()
+        query_response = await cls().aclient(_token=_token).query(query)
+        if index_advisor.enabled:
+            cls.record_index_query(index_name, terms, query_response, perf_counter() - started)
+        if use_map and not only and not defer:
+            cls.remember_page(query_response, _token=_token)
+        return Queryset(query_response, cls, not use_map, batch_lazied=batch_lazied, _token=_token,
+                        deferred=cls.get_deferred_fields(only, defer, select_related, prefetch_related))
+
+    @classmethod
+    def remember_page(cls, query_response, _token=None) -> None:
+        """
+        Stores the documents of a page in the identity map of the current request and replaces cached documents that
+        are older.
+        Args:
+            query_response: Fauna page response
+            _token: Token (secret) the page was read with
+
+        Returns: None
+        """
+        ttl = cls.get_cache_ttl()
+        for doc in query_response.get('data', []):
+            remember(doc)
+            if ttl:
+                document_cache.refresh(doc, ttl, secret=_token)
+
+    @classmethod
+    def values_list(cls, index_name, fields=None, terms=[], page_size=100, after=None, before=None, ts=None,
+                    named=False, flat=False, _token=None) -> ValuesQueryset:
+        """
+        Reads the rows of an index straight from its `values` definition. Only the index is read, no document is
+        fetched.
+        Args:
+            index_name: Name of the index
+            fields: Optional - names of the values to return. Defaults to every value of the index. If the index is
+            not defined on the collection, these are the names of the values of the index in order.
+            terms: Fields that should be indexed together.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
+            named: Optional - default False. If True, rows are named tuples.
+            flat: Optional - default False. If True and there is one field, rows are the bare values.
+            _token: Token (secret) used to make call
+
+        Returns: ValuesQueryset
+
+        """
+        columns = cls.get_index_columns(index_name, fields)
+        query = cls.get_index_query(index_name, terms=terms, page_size=page_size, after=after, before=before, ts=ts,
+                                    use_map=False)
+        query_response = cls().client(_token=_token).query(query)
+        fetch_page = partial(cls.values_list, index_name, fields=fields, terms=terms, page_size=page_size, ts=ts,
+                             named=named, flat=flat, _token=_token)
+        return ValuesQueryset(query_response, cls, columns, fields=fields, named=named, flat=flat,
+                              fetch_page=fetch_page)
+
+    @classmethod
+    async def avalues_list(cls, index_name, fields=None, terms=[], page_size=100, after=None, before=None, ts=None,
+                           named=False, flat=False, _token=None) -> ValuesQueryset:
+        """
+        Async version of `values_list`.
+        Args:
+            index_name: Name of the index
+            fields: Optional - names of the values to return. Defaults to every value of the index. If the index is
+            not defined on the collection, these are the names of the values of the index in order.
+            terms: Fields that should be indexed together.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
+            named: Optional - default False. If True, rows are named tuples.
+            flat: Optional - default False. If True and there is one field, rows are the bare values.
+            _token: Token (secret) used to make call
+
+        Returns: ValuesQueryset
+
+        """
+        columns = cls.get_index_columns(index_name, fields)
+        query = cls.get_index_query(index_name, terms=terms, page_size=page_size, after=after, before=before, ts=ts,
+                                    use_map=False)
+        query_response = await cls().aclient(_token=_token).query(query)
+        return ValuesQueryset(query_response, cls, columns, fields=fields, named=named, flat=flat)
+
+    @classmethod
+    def get_index_columns(cls, index_name, fields=None) -> list:
+        """
+        Returns the names of the values of an index defined in `collection_indexes`. A value is named after its
+        `binding` or the last item of its `field` path. An index without `values` returns refs.
+        Args:
+            index_name: Name of the index
+            fields: Optional - used as the names of the values if the index is not defined on the collection
+
+        Returns: list
+
+        """
+        for i in cls().collection_indexes:
+            index = i()
+            if index.get_name() != index_name:
+                continue
+            if not index.values:
+                return ['ref']
+            columns = []
+            for value in index.values:
+                field = value.get('binding') or value.get('field')
+                columns.append(field[-1] if isinstance(field, list) else field)
+            return columns
+        if not fields:
+            raise ValueError(f'{index_name} is not defined on {cls.__name__}. Provide the names of its values.')
+        return list(fields)
+
+    ##########
+    # Filter #
+    ##########
+
+    @classmethod
+    def filter(cls, _exclude=None, _page_size=100, _select_related=None, _prefetch_related=None, _only=None,
+               _defer=None, _token=None, **lookups):
+        """
+        Get the documents that match field lookups. The lookups are compiled to matches of the collection's indexes,
+        so callers don't need to know index names or term order. Lookups are `<field>=value`, `<field>__in=[...]`,
+        and the range lookups `<field>__gt`, `__gte`, `__lt` and `__lte`. See `get_filter_query`.
+
+        Usage:
+            Person.filter(last_name='James', sport=sport)
+            Task.filter(due_date__gte=today, _exclude={'status': 'DONE'})
+
+        Args:
+            _exclude: Optional - dict of lookups. Documents that match all of them are left out.
+            _page_size: The number of records to paginate by.
+            _select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            _prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            _only: Optional - list of field names. Only these fields are fetched.
+            _defer: Optional - list of field names that are not fetched until they are accessed.
+            _token: Token (secret) used to make call
+            **lookups: Field lookups
+
+        Returns: Queryset
+
+        """
+        return cls.get_filter(lookups, exclude=_exclude, page_size=_page_size, select_related=_select_related,
+                              prefetch_related=_prefetch_related, only=_only, defer=_defer, _token=_token)
+
+    @classmethod
+    async def afilter(cls, _exclude=None, _page_size=100, _select_related=None, _prefetch_related=None, _only=None,
+                      _defer=None, _token=None, **lookups):
+        """
+        Async version of `filter`.
+
+        Returns: Queryset
+
+        """
+        return await cls.aget_filter(lookups, exclude=_exclude, page_size=_page_size, select_related=_select_related,
+                                     prefetch_related=_prefetch_related, only=_only, defer=_defer, _token=_token)
+
+    @classmethod
+    def exclude(cls, _page_size=100, _select_related=None, _prefetch_related=None, _only=None, _defer=None,
+                _token=None, **lookups):
+        """
+        Get the documents that do not match all of the lookups. The "all" index is the source of the documents.
+        Args:
+            _page_size: The number of records to paginate by.
+            _select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            _prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            _only: Optional - list of field names. Only these fields are fetched.
+            _defer: Optional - list of field names that are not fetched until they are accessed.
+            _token: Token (secret) used to make call
+            **lookups: Field lookups
+
+        Returns: Queryset
+
+        """
+        return cls.get_filter(None, exclude=lookups, page_size=_page_size, select_related=_select_related,
+                              prefetch_related=_prefetch_related, only=_only, defer=_defer, _token=_token)
+
+    @classmethod
+    def get_filter(cls, lookups, exclude=None, page_size=100, after=None, before=None, select_related=None,
+                   prefetch_related=None, only=None, defer=None, _token=None):
+        """
+        Get a page of the documents that match `lookups` and don't match `exclude`. Used by `filter` and `exclude`.
+        Args:
+            lookups: dict of field lookups
+            exclude: Optional - dict of lookups. Documents that match all of them are left out.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+            _token: Token (secret) used to make call
+
+        Returns: Queryset
+
+        """
+        query = cls.get_set_query(cls.get_advised_filter_query(lookups, exclude), page_size=page_size, after=after,
+                                  before=before, select_related=select_related, prefetch_related=prefetch_related,
+                                  only=only, defer=defer)
+        started = perf_counter()
+        query_response = cls().client(_token=_token).query(query)
+        if index_advisor.enabled:
+            cls.record_filter(lookups, exclude, query_response, perf_counter() - started)
+        return cls._get_filter_page(query_response, lookups, exclude, page_size, select_related, prefetch_related,
+                                    only, defer, _token)
+
+    @classmethod
+    async def aget_filter(cls, lookups, exclude=None, page_size=100, after=None, before=None, select_related=None,
+                          prefetch_related=None, only=None, defer=None, _token=None):
+        """
+        Async version of `get_filter`.
+
+        Returns: Queryset
+
+        """
+        query = cls.get_set_query(cls.get_advised_filter_query(lookups, exclude), page_size=page_size, after=after,
+                                  before=before, select_related=select_related, prefetch_related=prefetch_related,
+                                  only=only, defer=defer)
+        started = perf_counter()
+        query_response = await cls().aclient(_token=_token).query(query)
+        if index_advisor.enabled:
+            cls.record_filter(lookups, exclude, query_response, perf_counter() - started)
+        return cls._get_filter_page(query_response, lookups, exclude, page_size, select_related, prefetch_related,
+                                    only, defer, _token)
+
+    @classmethod
+    def _get_filter_page(cls, query_response, lookups, exclude, page_size, select_related, prefetch_related, only,
+                         defer, _token):
+        if not only and not defer:
+            cls.remember_page(query_response, _token=_token)
+        fetch_page = partial(cls.get_filter, lookups, exclude=exclude, page_size=page_size,
+                             select_related=select_related, prefetch_related=prefetch_related, only=only, defer=defer,
+                             _token=_token)
+        return Queryset(query_response, cls, _token=_token, fetch_page=fetch_page,
+                        deferred=cls.get_deferred_fields(only, defer, select_related, prefetch_related))
+
+    @classmethod
+    def get_filter_query(cls, lookups=None, exclude=None):
+        """
+        Compiles lookups to a set of refs. Equality and `__in` lookups pick the indexes whose terms they cover
+        (`q.union` for `__in`), range lookups use an index whose first value is the field (`q.range`), and the sets of
+        several indexes are combined with `q.intersection`. `exclude` is removed with `q.difference`.
+        Args:
+            lookups: Optional - dict of field lookups. Without lookups the "all" index is used.
+            exclude: Optional - dict of lookups. Documents that match all of them are left out.
+
+        Returns: query
+
+        Raises: ValueError if a lookup is not valid or no index covers it. Filters never scan the collection.
+
+        """
+        query = cls.get_lookups_set(lookups or {})
+        excluded = cls.get_lookups_set(exclude or {})
+        if query is None:
+            if not cls.all_index:
+                raise ValueError(f'{cls.__name__} has no "all" index. Filter on an indexed field.')
+            query = q.match(q.index(cls().all_index_name()))
+        if excluded is not None:
+            query = q.difference(query, excluded)
+        return query
+
+    @classmethod
+    def get_advised_filter_query(cls, lookups=None, exclude=None):
+        """
+        Calls `get_filter_query` and records the lookups no index covers when the index advisor is enabled.
+
+        Returns: query
+        """
+        try:
+            return cls.get_filter_query(lookups, exclude)
+        except ValueError:
+            if index_advisor.enabled:
+                cls.record_filter(lookups, exclude)
+            raise
+
+    @classmethod
+    def record_filter(cls, lookups=None, exclude=None, query_response=None, duration=0.0) -> None:
+        """
+        Records the patterns of a filter in the index advisor (see `pfunk.advisor.IndexAdvisor`). Lookups that are
+        not valid are not recorded.
+        Args:
+            lookups: dict of field lookups
+            exclude: dict of excluded lookups
+            query_response: Optional - Fauna response of the filter. Omitted if no index covers the lookups.
+            duration: Seconds the query took
+
+        Returns: None
+        """
+        reads = len(query_response.get('data', [])) if query_response else 0
+        if not lookups:
+            index_advisor.record(cls.__name__, cls().get_collection_name(), 'filter', index=cls().all_index_name(),
+                                 scan=True, reads=reads, duration=duration)
+        for i in (lookups, exclude):
+            if not i:
+                continue
+            try:
+                equal, ranges = cls.parse_lookups(i)
+            except ValueError:
+                continue
+            try:
+                cls.get_lookups_set(i)
+                covered = True
+            except ValueError:
+                covered = False
+            index_advisor.record(cls.__name__, cls().get_collection_name(), 'filter', terms=sorted(equal),
+                                 ranges=sorted(ranges), covered=covered, reads=reads, duration=duration)
+
+    @classmethod
+    def record_index_query(cls, index_name, terms, query_response, duration=0.0) -> None:
+        """
+        Records a `get_index` call in the index advisor. The term fields are known for indexes declared on the
+        collection.
+        Args:
+            index_name: Name of the index
+            terms: Terms of the index
+            query_response: Fauna response
+            duration: Seconds the query took
+
+        Returns: None
+        """
+        fields = None
+        for index in cls.get_filter_indexes():
+            if index.get_name() == index_name:
+                fields = index.get_term_fields()
+        if fields is None:
+            fields = [f'term{i}' for i in range(len(terms or []))]
+        index_advisor.record(cls.__name__, cls().get_collection_name(), 'get_index', index=index_name, terms=fields,
+                             scan=index_name == cls().all_index_name(), reads=len(query_response.get('data', [])),
+                             duration=duration)
+
+    @classmethod
+    def get_filter_indexes(cls) -> list:
+        """
+        Returns the indexes that filters can use: `collection_indexes`, the `Meta.unique_together` indexes and the
+        indexes Fauna creates for fields declared with `unique=True`. Indexes that don't return refs are left out.
+
+        Returns: list of Index instances
+        """
+        indexes = [i() for i in cls.get_indexes()]
+        names = {i.get_name() for i in indexes}
+        for k, prop in cls._base_properties.items():
+            name = f'unique_{cls.__name__}_{k}'
+            if prop.kwargs.get('unique') and name not in names:
+                indexes.append(Index(name=name, source=cls.__name__, terms=[{'field': ['data', k]}]))
+        return [i for i in indexes if i.get_term_fields() is not None and 'ref' in i.get_value_fields()]
+
+    @classmethod
+    def parse_lookups(cls, lookups: dict) -> tuple:
+        """
+        Splits lookups into equality and range lookups and converts the values to database values.
+        Args:
+            lookups: dict of field lookups
+
+        Returns: tuple (equal, ranges). `equal` maps a field to its list of values, `ranges` maps a field to a dict
+        of range operators and values.
+
+        """
+        equal, ranges = {}, {}
+        for key, value in lookups.items():
+            name, _, operator = key.partition('__')
+            prop = cls._base_properties.get(name)
+            if prop is None or prop.relation_field:
+                raise ValueError(f'{key}: {name} is not a field of {cls.__name__} that can be filtered')
+            if operator == 'in':
+                if not value:
+                    raise ValueError(f'{key}: at least one value is required')
+                equal[name] = [cls.get_lookup_value(prop, i) for i in value]
+            elif not operator:
+                equal[name] = [cls.get_lookup_value(prop, value)]
+            elif operator in RANGE_LOOKUPS:
+                ranges.setdefault(name, {})[operator] = cls.get_lookup_value(prop, value)
+            else:
+                raise ValueError(f'{key}: {operator} is not a lookup. Use in, {", ".join(RANGE_LOOKUPS)}.')
+        return equal, ranges
+
+    @staticmethod
+    def get_lookup_value(prop, value):
+        if isinstance(value, Ref) or value is None:
+            return value
+        return prop.get_db_value(value=value)
+
+    @classmethod
+    def get_lookups_set(cls, lookups: dict):
+        """
+        Compiles lookups to the intersection of index sets. See `get_filter_query`.
+        Args:
+            lookups: dict of field lookups
+
+        Returns: query or None if there are no lookups
+
+        """
+        equal, ranges = cls.parse_lookups(lookups)
+        if not equal and not ranges:
+            return None
+        indexes = cls.get_filter_indexes()
+        single = {k for k, v in equal.items() if len(v) == 1}
+        sets = []
+        remaining = set(equal)
+        for name, bounds in ranges.items():
+            candidates = [i for i in indexes
+                          if i.get_value_fields()[0] == name and set(i.get_term_fields()) <= single]
+            if not candidates:
+                raise ValueError(f'No index of {cls.__name__} returns {name} as its first value. Add an Index with '
+                                 f'the value {name} and ref to collection_indexes to filter on a range of {name}.')
+            index = max(candidates, key=lambda i: len(i.get_term_fields()))
+            match = q.match(q.index(index.get_name()), [equal[f][0] for f in index.get_term_fields()])
+            query = q.range(match, bounds.get('gte', bounds.get('gt', [])), bounds.get('lte', bounds.get('lt', [])))
+            if 'gt' in bounds:
+                query = q.filter_(q.lambda_('row', q.gt(q.select(0, q.var('row')), bounds['gt'])), query)
+            if 'lt' in bounds:
+                query = q.filter_(q.lambda_('row', q.lt(q.select(0, q.var('row')), bounds['lt'])), query)
+            sets.append(cls.get_ref_set(index, query))
+            remaining -= set(index.get_term_fields())
+        while remaining:
+            candidates = [i for i in indexes if i.get_term_fields() and set(i.get_term_fields()) <= set(equal)
+                          and remaining & set(i.get_term_fields())]
+            if not candidates:
+                raise ValueError(f'No index of {cls.__name__} covers {", ".join(sorted(remaining))}. Add an Index '
+                                 f'with these terms to collection_indexes or Meta.unique_together.')
+            index = max(candidates, key=lambda i: (len(remaining & set(i.get_term_fields())),
+                                                   i.get_value_fields() == ['ref']))
+            matches = [q.match(q.index(index.get_name()), list(terms))
+                       for terms in product(*[equal[f] for f in index.get_term_fields()])]
+            sets.append(cls.get_ref_set(index, matches[0] if len(matches) == 1 else q.union(*matches)))
+            remaining -= set(index.get_term_fields())
+        return sets[0] if len(sets) == 1 else q.intersection(*sets)
+
+    @staticmethod
+    def get_ref_set(index, query):
+        """
+        Returns a set of the refs of an index set. Indexes that return more values than the ref are joined to the
+        ref so their sets can be intersected.
+        Args:
+            index: Index instance
+            query: Set of the index
+
+        Returns: query
+        """
+        values = index.get_value_fields()
+        if values == ['ref']:
+            return query
+        return q.join(query, q.lambda_('row', q.singleton(q.select(values.index('ref'), q.var('row')))))
+
+    ##############
+    # Timestamps #
+    ##############
+
+    @classmethod
+    def get_ts(cls, ref, _token=None) -> int:
+        """
+        Returns the `ts` (last write, in UNIX microseconds) of a document without transferring its data. Used to
+        answer conditional requests.
+        Args:
+            ref: Ref (ID) string
+            _token: Token (secret) used to make call
+
+        Returns: int
+
+        """
+        return cls().client(_token=_token).query(cls.get_ts_query(ref))
+
+    @classmethod
+    async def aget_ts(cls, ref, _token=None) -> int:
+        """
+        Async version of `get_ts`.
+
+        Returns: int
+
+        """
+        return await cls().aclient(_token=_token).query(cls.get_ts_query(ref))
+
+    @classmethod
+    def get_index_ts(cls, index_name, terms=[], page_size=100, after=None, before=None, _token=None) -> dict:
+        """
+        Returns a page of an index with only the `ref` and `ts` of each document, in the same order and with the same
+        cursors as `get_index`.
+        Args:
+            index_name: Name of the index
+            terms: Fields that should be indexed together.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            _token: Token (secret) used to make call
+
+        Returns: dict (Fauna page of `{'ref': ..., 'ts': ...}` dicts)
+
+        """
+        return cls().client(_token=_token).query(
+            cls.get_index_ts_query(index_name, terms, page_size=page_size, after=after, before=before))
+
+    @classmethod
+    async def aget_index_ts(cls, index_name, terms=[], page_size=100, after=None, before=None, _token=None) -> dict:
+        """
+        Async version of `get_index_ts`.
+
+        Returns: dict
+
+        """
+        return await cls().aclient(_token=_token).query(
+            cls.get_index_ts_query(index_name, terms, page_size=page_size, after=after, before=before))
+
+    @classmethod
+    def get_ts_query(cls, ref):
+        return q.select('ts', q.get(q.ref(q.collection(cls().get_collection_name()), ref)))
+
+    @classmethod
+    def get_index_ts_query(cls, index_name, terms=[], page_size=100, after=None, before=None):
+        """
+        Builds the query used by `get_index_ts`. If the index returns `ref` and `ts` in its values, both are read from
+        the index and no document is read. Otherwise every document of the page is fetched to read its `ts`: the
+        response is smaller than the page of documents but the read operations are the same, so declare an index
+        with `{'field': ['ts']}` and `{'field': ['ref']}` values to make it cheaper.
+        Args:
+            index_name: Name of the index
+            terms: Fields that should be indexed together.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+
+        Returns: query
+
+        """
+        page = cls.get_index_query(index_name, terms=terms, page_size=page_size, after=after, before=before,
+                                   use_map=False)
+        index = {i.get_name(): i for i in [i() for i in cls.get_indexes()]}.get(index_name)
+        paths = [[i['field']] if isinstance(i['field'], str) else i['field'] for i in (index and index.values) or []]
+        if ['ref'] in paths and ['ts'] in paths:
+            return q.map_(q.lambda_('row', {
+                'ref': q.select(paths.index(['ref']), q.var('row')),
+                'ts': q.select(paths.index(['ts']), q.var('row'))
+            }), page)
+        return q.map_(q.lambda_('ref', {'ref': q.var('ref'), 'ts': q.select('ts', q.get(q.var('ref')))}), page)
+
+    @classmethod
+    def get_index_query(cls, index_name, terms=[], page_size=100, after=None, before=None, ts=None, events=False,
+                        use_map=True, select_related=None, prefetch_related=None, only=None, defer=None):
+        """
+        Builds the paginated index query used by `get_index`.
+        Args:
+            index_name: Name of the index
+            terms: Fields that should be indexed together.
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
+            events: Optional - default False. If True, return a Page from the event history of the input.
+            use_map: If True every ref in the page is replaced by its document.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+
+        Returns: query
+
+        """
+        return cls.get_set_query(q.match(q.index(index_name), terms), page_size=page_size, after=after,
+                                 before=before, ts=ts, events=events, use_map=use_map, select_related=select_related,
+                                 prefetch_related=prefetch_related, only=only, defer=defer)
+
+    @classmethod
+    def get_set_query(cls, set_query, page_size=100, after=None, before=None, ts=None, events=False, use_map=True,
+                      select_related=None, prefetch_related=None, only=None, defer=None):
+        """
+        Builds the query that paginates a set of refs, like an index match or a `filter` set.
+        Args:
+            set_query: Set expression
+            page_size: The number of records to paginate by.
+            after: Optional - Return the next Page of results after this cursor (inclusive).
+            before: Optional - Return the previous Page of results before this cursor (exclusive).
+            ts: Optional - default current. Return the results at the specified point in time (number of UNIX microseconds or a Timestamp).
+            events: Optional - default False. If True, return a Page from the event history of the input.
+            use_map: If True every ref in the page is replaced by its document.
+            select_related: Optional - list of ReferenceField names whose documents are fetched in the same query.
+            prefetch_related: Optional - list of ManyToManyField names whose documents are fetched in the same query.
+            only: Optional - list of field names. Only these fields are fetched; the other fields are loaded on first
+            access.
+            defer: Optional - list of field names that are not fetched until they are accessed.
+
+        Returns: query
+
+        """
+        query = q.paginate(
+            set_query,
+            size=page_size,
+            after=after,
+            before=before,
+            ts=ts,
+            events=events
+        )
         if use_map:
-            query_response = c.client(_token=_token).query(
-                q.map_(
-                    q.lambda_(['ref'],
-                              q.get(q.var('ref'))
-                              ),
-                    q.paginate(
-                        q.match(q.index(index_name), terms),
-                        size=page_size,
-                        after=after,
-                        before=before,
-                        ts=ts,
-                        events=events
-                    )
-                )
+            query = q.map_(
+                q.lambda_(['ref'],
+                          cls.get_document_query(q.var('ref'), select_related=select_related,
+                                                 prefetch_related=prefetch_related, only=only, defer=defer)
+                          ),
+                query
             )
-            lazied = False
+        return query
+
+    @classmethod
+    def get_projected_fields(cls, only=None, defer=None, select_related=None, prefetch_related=None):
+        """
+        Returns the names of the fields fetched when `only` or `defer` is used. Fields named in `select_related` and
+        `prefetch_related` are always fetched.
+        Args:
+            only: Optional - list of field names
+            defer: Optional - list of field names
+            select_related: Optional - list of ReferenceField names
+            prefetch_related: Optional - list of ManyToManyField names
+
+        Returns: list or None if every field is fetched
+
+        """
+        if not only and not defer:
+            return None
+        for name in list(only or []) + list(defer or []):
+            if name not in cls._base_properties:
+                raise ValueError(f'{name} is not a field of {cls.__name__}')
+        fields = list(only) if only else [k for k in cls._base_properties.keys() if k not in defer]
+        for name in list(select_related or []) + list(prefetch_related or []):
+            if name not in fields:
+                fields.append(name)
+        return fields
+
+    @classmethod
+    def get_deferred_fields(cls, only=None, defer=None, select_related=None, prefetch_related=None) -> set:
+        """
+        Returns the names of the fields that are not fetched when `only` or `defer` is used. Relation fields
+        are not stored on the document so they are never deferred.
+
+        Returns: set
+
+        """
+        fields = cls.get_projected_fields(only, defer, select_related, prefetch_related)
+        if fields is None:
+            return set()
+        return {k for k, v in cls._base_properties.items() if not v.relation_field and k not in fields}
+
+    @classmethod
+    def get_document_query(cls, ref, select_related=None, prefetch_related=None, only=None, defer=None):
+        """
+        Builds the query that fetches a document. The documents referenced by the `select_related` fields and the
+        documents related through the `prefetch_related` fields are fetched in the same query and returned under the
+        `related` key. If `only` or `defer` is used, the document is projected on the server and only the selected
+        fields are returned.
+        Args:
+            ref: Ref or expression that evaluates to a ref
+            select_related: Optional - list of ReferenceField names
+            prefetch_related: Optional - list of ManyToManyField names
+            only: Optional - list of field names to fetch
+            defer: Optional - list of field names not to fetch
+
+        Returns: query
+
+        """
+        fields = cls.get_projected_fields(only, defer, select_related, prefetch_related)
+        if fields is None:
+            doc = q.var('doc')
         else:
-            query_response = c.client(_token=_token).query(
-                q.paginate(
-                    q.match(q.index(index_name), terms),
-                    size=page_size,
-                    after=after,
-                    before=before,
-                    ts=ts,
-                    events=events
+            doc = {
+                'ref': q.select('ref', q.var('doc')),
+                'ts': q.select('ts', q.var('doc')),
+                'data': {name: q.select(['data', name], q.var('doc'), None) for name in fields}
+            }
+        if not select_related and not prefetch_related:
+            if fields is None:
+                return q.get(ref)
+            return q.let({'doc': q.get(ref)}, doc)
+        related = {}
+        for name in select_related or []:
+            if not isinstance(cls._base_properties.get(name), import_util('pfunk.fields.ReferenceField')):
+                raise ValueError(f'select_related: {name} is not a ReferenceField of {cls.__name__}')
+            related[name] = q.let(
+                {'related_ref': q.select(['data', name], q.var('doc'), None)},
+                q.if_(
+                    q.is_ref(q.var('related_ref')),
+                    q.if_(q.exists(q.var('related_ref')), q.get(q.var('related_ref')), None),
+                    None
                 )
             )
-            lazied = True
-
-        return Queryset(query_response, cls, lazied)
+        for name in prefetch_related or []:
+            prop = cls._base_properties.get(name)
+            if not isinstance(prop, import_util('pfunk.fields.ManyToManyField')):
+                raise ValueError(f'prefetch_related: {name} is not a ManyToManyField of {cls.__name__}')
+            related[name] = q.map_(
+                q.lambda_('related_ref', q.get(q.var('related_ref'))),
+                q.filter_(
+                    q.lambda_('related_ref', q.exists(q.var('related_ref'))),
+                    q.select('data', q.paginate(
+                        q.match(q.index(prop.get_relation_index_name(cls)), q.select('ref', q.var('doc'))),
+                        size=MAX_PAGE_SIZE
+                    ))
+                )
+            )
+        return q.let({'doc': q.get(ref)}, q.merge(doc, {'related': related}))
 
     def delete(self, _token=None) -> None:
         """
@@ -555,22 +2237,41 @@ class Collection(BaseSchema, metaclass=PFunkDeclarativeVariablesMetaclass):
 
         """
         self.call_signals('pre_delete_signals')
-        self.client(_token=_token).query(q.delete(self.ref))
+        forget(self.ref)
+        self._query(q.delete(self.ref), lambda resp: self.call_signals('post_delete_signals'), _token=_token)
+
+    async def adelete(self, _token=None) -> None:
+        """
+        Async version of `delete`.
+        Args:
+            _token: Token (secret) used to make call
+
+        Returns: None
+
+        """
+        self.call_signals('pre_delete_signals')
+        forget(self.ref)
+        await self.aclient(_token=_token).query(q.delete(self.ref))
         self.call_signals('post_delete_signals')
 
     @classmethod
     def delete_from_id(cls, id: str, _token=None) -> None:
         c = cls()
         c.call_signals('pre_delete_signals')
-        c.client(_token=_token).query(q.delete(q.ref(q.collection(c.get_collection_name()), id)))
-        c.call_signals('post_delete_signals')
+        forget(Ref(id, Ref(c.get_collection_name(), Ref('collections'))))
+
+        def callback(resp):
+            c.ref = resp['ref']
+            c.call_signals('post_delete_signals')
+
+        c._query(q.delete(q.ref(q.collection(c.get_collection_name()), id)), callback, _token=_token)
 
     ########
     # JSON #
     ########
 
     def to_dict(self):
-        field_data = self._data.copy()
+        field_data = {k: v for k, v in self._data.items() if k not in self._deferred}
         ref = {'id': self.ref.id(), 'collection': self.ref.collection().id()}
         obj = {
             'ref': ref,
@@ -18,7 +18,7 @@ from pfunk.collection import Collection, Enum
 from pfunk.contrib.auth.resources import LoginUser, UpdatePassword, Public, UserRole, LogoutUser
 from pfunk.contrib.auth.views import ForgotPasswordChangeView, LoginView, SignUpView, VerifyEmailView, LogoutView, UpdatePasswordView, ForgotPasswordView
 from pfunk.contrib.email.base import send_email
-from pfunk.exceptions import LoginFailed, DocNotFound, Unauthorized
+from pfunk.exceptions import LoginFailed, Unauthorized
 from pfunk.fields import EmailField, SlugField, ManyToManyField, ListField, ReferenceField, StringField, EnumField
 
 AccountStatus = Enum(name='AccountStatus', choices=['ACTIVE', 'INACTIVE'])
@@ -388,8 +388,11 @@ class User(BaseUser):
 
     def get_groups(self, _token=None):
         """ Returns the groups (collections) that the user is bound with """
-        return [Group.get(i.id(), _token=_token) for i in self.client(_token=_token).query(
-            q.paginate(q.match('users_groups_by_user', self.ref))
+        return [Group(_ref=i['ref'], **i['data']) for i in self.client(_token=_token).query(
+            q.map_(
+                q.lambda_('ref', q.get(q.var('ref'))),
+                q.paginate(q.match('users_groups_by_user', self.ref))
+            )
         ).get('data')]
 
     def permissions(self, _token=None):
@@ -443,11 +446,7 @@ class User(BaseUser):
         for i in permissions:
             perm_list.extend(i.permissions)
 
-        try:
-            user_group = UserGroups.get_by('users_groups_by_group_and_user', terms=[group.ref, self.ref])
-        except DocNotFound:
-            user_group = UserGroups.create(userID=self.ref, groupID=group.ref, permissions=perm_list)
-        if user_group.permissions != perm_list:
-            user_group.permissions = perm_list
-        user_group.save()
+        user_group, _ = UserGroups.update_or_create(
+            'users_groups_by_group_and_user', terms=[group.ref, self.ref],
+            defaults={'userID': self.ref, 'groupID': group.ref, 'permissions': perm_list})
         return user_group
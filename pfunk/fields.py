@@ -8,8 +8,8 @@ from valley.utils import import_util
 
 from valley.validators import Validator, ChoiceValidator, ForeignValidator
 
-from pfunk.collection import Enum
-from pfunk.client import Ref
+from pfunk.collection import Enum, MAX_PAGE_SIZE
+from pfunk.client import Ref, q
 
 
 class ChoiceListValidator(ChoiceValidator):
@@ -177,6 +177,80 @@ class ManyToManyField(GraphQLMixin, ForeignListProperty):
             req = '!'
         return f'[{self.get_foreign_class().__name__}{req}] @relation(name: "{self.relation_name}")'
 
+    def get_relation_index_name(self, collection):
+        """
+        Returns the name of the relation index that returns the related refs for a document of `collection`. Fauna
+        names it `<relation_name>_by_<collection>` when it imports the @relation; pass `relation_index_name` to the
+        field to override it.
+        """
+        return self.kwargs.get('relation_index_name') or f'{self.relation_name}_by_{collection.get_class_name()}'
+
+    def get_relation_pair_index_name(self, collection):
+        """
+        Returns the name of the unique relation index whose terms are both refs, in alphabetical order of the class
+        names, and that returns the relation documents. Fauna names it `<relation_name>_by_<class>_and_<class>`; pass
+        `relation_pair_index_name` to the field to override it.
+        """
+        names = sorted([collection.get_class_name(), self.get_foreign_class().get_class_name()])
+        return self.kwargs.get('relation_pair_index_name') or f'{self.relation_name}_by_{names[0]}_and_{names[1]}'
+
+    def get_relation_query(self, collection, ref, related_refs, sync=None):
+        """
+        Builds one query that creates the relation documents that do not exist yet between `ref` and each of the
+        `related_refs`. If `sync` (default: the `sync_relations` argument of the field) is True, the relation documents
+        to refs that are not in `related_refs` are deleted, so the relation matches the list.
+        Args:
+            collection: Collection class that declares the field
+            ref: Ref of the document
+            related_refs: Refs of the related documents
+            sync: Optional - remove the relations that are no longer in the list
+
+        Returns: query
+        """
+        if sync is None:
+            sync = self.kwargs.get('sync_relations', False)
+        own_key = f'{collection.get_class_name()}ID'
+        foreign_key = f'{self.get_foreign_class().get_class_name()}ID'
+
+        def contains(items, value):
+            return q.is_nonempty(q.filter_(q.lambda_('item', q.equals(q.var('item'), value)), items))
+
+        queries = [q.foreach(
+            q.lambda_('related_ref', q.if_(
+                contains(q.var('existing'), q.var('related_ref')),
+                None,
+                q.create(q.collection(self.relation_name),
+                         {'data': {own_key: ref, foreign_key: q.var('related_ref')}})
+            )),
+            q.var('related')
+        )]
+        if sync:
+            if collection.get_class_name() <= self.get_foreign_class().get_class_name():
+                terms = [ref, q.var('existing_ref')]
+            else:
+                terms = [q.var('existing_ref'), ref]
+            queries.append(q.foreach(
+                q.lambda_('existing_ref', q.if_(
+                    contains(q.var('related'), q.var('existing_ref')),
+                    None,
+                    q.foreach(
+                        q.lambda_('relation_ref', q.delete(q.var('relation_ref'))),
+                        q.paginate(q.match(q.index(self.get_relation_pair_index_name(collection)), *terms),
+                                   size=MAX_PAGE_SIZE)
+                    )
+                )),
+                q.var('existing')
+            ))
+        return q.let(
+            {
+                'related': related_refs,
+                'existing': q.select('data', q.paginate(
+                    q.match(q.index(self.get_relation_index_name(collection)), ref), size=MAX_PAGE_SIZE
+                ))
+            },
+            q.do(*queries)
+        )
+
     def get_python_value(self, value):
         ref_list = []
         ra = ref_list.append
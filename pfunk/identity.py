@@ -0,0 +1,137 @@
+from contextvars import ContextVar
+
+__all__ = ['IdentityMap', 'get_identity_map', 'remember', 'forget']
+
+_current_identity_map = ContextVar('pfunk_identity_map', default=None)
+
+
+def get_identity_map():
+    """
+    Returns the IdentityMap that is open in the current context or None.
+
+    Returns: IdentityMap
+    """
+    return _current_identity_map.get()
+
+
+class IdentityMap(object):
+    """
+    Keeps the documents fetched in the current context keyed by ref, so a document is fetched once no matter how
+    many times it is loaded. The web layer opens one around each request.
+
+    Usage:
+        with IdentityMap():
+            person.group.name
+            person.group.name  # No query
+
+    Saved documents replace the stored copy and deleted documents are dropped. Documents fetched with `only` or
+    `defer` are not stored because they are incomplete.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self._reset_token = None
+
+    @staticmethod
+    def get_key(ref) -> tuple:
+        """
+        Returns the key of a ref: the collection name and the document ID.
+        Args:
+            ref: Ref of the document
+
+        Returns: tuple
+        """
+        collection = ref.collection()
+        if collection is None:
+            return None
+        return collection.id(), ref.id()
+
+    def get(self, collection_name: str, id: str):
+        """
+        Returns the stored document or None.
+        Args:
+            collection_name: Name of the collection
+            id: ID of the document
+
+        Returns: dict
+        """
+        return self.docs.get((collection_name, id))
+
+    def get_by_ref(self, ref):
+        """
+        Returns the stored document of a ref or None.
+        Args:
+            ref: Ref of the document
+
+        Returns: dict
+        """
+        return self.docs.get(self.get_key(ref))
+
+    def add(self, doc) -> None:
+        """
+        Stores a Fauna document. Documents fetched with `select_related` or `prefetch_related` are stored too.
+        Args:
+            doc: Fauna document (dict with `ref` and `data`)
+
+        Returns: None
+        """
+        if not isinstance(doc, dict) or doc.get('ref') is None or 'data' not in doc:
+            return
+        related = doc.get('related') or {}
+        for value in related.values():
+            for i in (value if isinstance(value, list) else [value]):
+                self.add(i)
+        key = self.get_key(doc['ref'])
+        if key is not None:
+            self.docs[key] = {k: v for k, v in doc.items() if k != 'related'}
+
+    def discard(self, ref) -> None:
+        """
+        Drops the stored document of a ref.
+        Args:
+            ref: Ref of the document
+
+        Returns: None
+        """
+        self.docs.pop(self.get_key(ref), None)
+
+    def clear(self) -> None:
+        self.docs.clear()
+
+    def __enter__(self):
+        self._reset_token = _current_identity_map.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_identity_map.reset(self._reset_token)
+        self._reset_token = None
+        self.clear()
+
+    def __len__(self):
+        return len(self.docs)
+
+
+def remember(doc) -> None:
+    """
+    Stores a document in the IdentityMap of the current context, if one is open.
+    Args:
+        doc: Fauna document
+
+    Returns: None
+    """
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.add(doc)
+
+
+def forget(ref) -> None:
+    """
+    Drops a document from the IdentityMap of the current context, if one is open.
+    Args:
+        ref: Ref of the document
+
+    Returns: None
+    """
+    identity_map = get_identity_map()
+    if identity_map is not None and ref is not None:
+        identity_map.discard(ref)
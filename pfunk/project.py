@@ -21,6 +21,7 @@ from pfunk.web.request import HTTPRequest, RESTRequest, WSGIRequest
 from pfunk.web.response import HttpNotFoundResponse, JSONMethodNotAllowedResponse
 from .collection import Collection
 from .fields import ForeignList
+from .identity import IdentityMap
 from .template import graphql_template
 from .utils.publishing import BearerAuth
 from .web.views.graphql import GraphQLView
@@ -261,8 +262,14 @@ class Project(Schema):
 
     def wsgi_app(self, environ, start_response):
         request = WerkzeugRequest(environ)
-        response = self.event_handler(request, object())
+        # The body is rendered inside the identity map so lazied documents the view already fetched are reused.
+        # Streamed bodies are rendered after it is closed, so it doesn't keep every page they fetch.
+        with IdentityMap():
+            response = self.event_handler(request, object())
+            body = None if response.streaming else response.content
         status_str = f'{response.status_code} {HTTP_STATUS_CODES.get(response.status_code)}'
 
         start_response(status_str, response.wsgi_headers)
-        return [str.encode(response.body)]
+        if response.streaming:
+            return response.iter_content()
+        return [body]
@@ -1,8 +1,40 @@
+import contextvars
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from faunadb.objects import Ref
+
+from pfunk.client import q
+from pfunk.identity import IdentityMap
+
+
 class Queryset:
 
-    def __init__(self, query_response: dict, cls, lazied=False):
+    def __init__(self, query_response: dict, cls, lazied=False, batch_lazied=True, _token=None, fetch_page=None,
+                 deferred=None):
+        """
+        A page of documents. Rows are turned into `Collection` instances the first time they are read.
+        Args:
+            query_response: Fauna page response
+            cls: Collection class of the documents in the page
+            lazied: Specifies if the page only contains refs. The documents are loaded at the first evaluation.
+            batch_lazied: If True every lazied instance of the page is loaded in one query when any one of them is
+            first evaluated.
+            _token: Token (secret) used to load lazied instances
+            fetch_page: Optional - callable that takes an `after` cursor and returns the next Queryset. Used by
+            `iterator`.
+            deferred: Optional - set of field names that were not fetched (see `only` in `Collection.get_index`).
+        """
         self.query_response = query_response
-        self.data = [cls(_ref=i.get('ref'), _lazied=lazied, **i.get('data')) for i in query_response.get('data', [])]
+        self.cls = cls
+        self.lazied = lazied
+        self.batch_lazied = batch_lazied
+        self._token = _token
+        self.fetch_page = fetch_page
+        self.deferred = deferred or set()
+        self._rows = query_response.get('data', [])
+        self._instances = [None] * len(self._rows)
+        self.after_cursor = query_response.get('after')
         if query_response.get('after'):
             self.after = query_response.get('after')[0]
         else:
@@ -12,17 +44,182 @@ class Queryset:
         else:
             self.before = None
 
+    @property
+    def data(self) -> list:
+        return [self._get_instance(i) for i in range(len(self._rows))]
+
+    def _get_instance(self, index):
+        obj = self._instances[index]
+        if obj is None:
+            obj = self.get_instance(self.cls, self._rows[index], self.lazied)
+            self._instances[index] = obj
+        return obj
+
+    def get_instance(self, cls, doc, lazied=False):
+        if isinstance(doc, Ref):
+            obj = cls.from_db({'ref': doc}, lazied=True)
+        else:
+            obj = cls.from_db(doc, lazied=lazied)
+            obj._load_related(doc.get('related'))
+            if self.deferred and not obj._lazied:
+                obj._deferred = set(self.deferred)
+        if (obj._lazied or obj._deferred) and self.batch_lazied:
+            obj._queryset = self
+        return obj
+
+    def resolve_lazied(self) -> None:
+        """
+        Loads every lazied or partially loaded instance of the page with one `q.map_(q.get)` query. Documents that no
+        longer exist are left lazied and raise on their own evaluation.
+
+        Returns: None
+        """
+        data = self.data
+        for i in data:
+            i._queryset = None
+        load_instances(data, _token=self._token)
+
+    def iterator(self, prefetch=False):
+        """
+        Iterates over this page and every following page by passing the `after` cursor to `fetch_page`. Only the
+        page being consumed is kept in memory.
+        Args:
+            prefetch: Optional - default False. If True the next page is fetched on a background thread while the
+            current one is consumed.
+
+        Returns: generator
+        """
+        return (i for page in _iter_pages(self, prefetch) for i in page)
+
+    def pages(self, prefetch=False):
+        """
+        Iterates over this page and every following page like `iterator`, yielding one Queryset per page.
+        Args:
+            prefetch: Optional - default False. If True the next page is fetched on a background thread while the
+            current one is consumed.
+
+        Returns: generator
+        """
+        return _iter_pages(self, prefetch)
+
     def to_dict(self):
         return self.query_response
 
     def __iter__(self):
-        return iter(self.data)
+        for i in range(len(self._rows)):
+            yield self._get_instance(i)
 
     def __next__(self):
         return self
 
     def __len__(self):
-        return len(self.data)
+        return len(self._rows)
 
     def __getitem__(self, x):
-        return self.data[x]
\ No newline at end of file
+        if isinstance(x, slice):
+            return [self._get_instance(i) for i in range(*x.indices(len(self._rows)))]
+        return self._get_instance(range(len(self._rows))[x])
+
+
+class ValuesQueryset(Queryset):
+
+    def __init__(self, query_response: dict, cls, columns: list, fields: list = None, named=False, flat=False,
+                 fetch_page=None):
+        """
+        A page of index rows read from the `values` of the index. No document is fetched.
+        Args:
+            query_response: Fauna page response
+            cls: Collection class the index belongs to
+            columns: Names of the values of the index, in order
+            fields: Optional - names of the columns returned in each row. Defaults to every column.
+            named: Optional - default False. If True, rows are named tuples.
+            flat: Optional - default False. If True and there is one field, rows are the bare values.
+            fetch_page: Optional - callable that takes an `after` cursor and returns the next page. Used by
+            `iterator`.
+        """
+        fields = list(fields or columns)
+        for i in fields:
+            if i not in columns:
+                raise ValueError(f'{i} is not a value of the index. Available values: {columns}')
+        if flat and len(fields) > 1:
+            raise ValueError('flat is only available for a single field.')
+        self.columns = columns
+        self.fields = fields
+        self.positions = [columns.index(i) for i in fields]
+        self.flat = flat
+        self.row_class = namedtuple(f'{cls.__name__}Row', fields, rename=True) if named else tuple
+        super(ValuesQueryset, self).__init__(query_response, cls, fetch_page=fetch_page)
+
+    def get_instance(self, cls, doc, lazied=False):
+        if not isinstance(doc, list):
+            doc = [doc]
+        if self.flat:
+            return doc[self.positions[0]]
+        values = [doc[i] for i in self.positions]
+        if self.row_class is tuple:
+            return tuple(values)
+        return self.row_class(*values)
+
+    def resolve_lazied(self) -> None:
+        return None
+
+
+def load_instances(instances, _token=None) -> None:
+    """
+    Loads the lazied or partially loaded instances of a list with one `q.map_(q.get)` query. Documents found in the
+    identity map or the document cache are not fetched, and a document referenced by several instances is fetched
+    once. Documents that no longer exist are left lazied.
+    Args:
+        instances: list of Collection instances
+        _token: Token (secret) used to make call
+
+    Returns: None
+    """
+    pending = {}
+    for obj in instances:
+        if not (obj._lazied or obj._deferred):
+            continue
+        doc = obj._get_known_document(obj.ref.id(), _token=_token)
+        if doc is not None:
+            obj._load(doc)
+            continue
+        pending.setdefault(IdentityMap.get_key(obj.ref), []).append(obj)
+    if not pending:
+        return
+    groups = list(pending.values())
+    docs = groups[0][0].client(_token=_token).query(
+        q.map_(
+            q.lambda_('ref', q.if_(q.exists(q.var('ref')), q.get(q.var('ref')), None)),
+            [i[0].ref for i in groups]
+        )
+    )
+    for group, doc in zip(groups, docs):
+        if doc:
+            group[0]._remember_document(doc, _token=_token)
+            for obj in group:
+                obj._load(doc)
+
+
+def _iter_pages(page, prefetch=False):
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        while page is not None:
+            next_page = None
+            if page.after_cursor and page.fetch_page:
+                if executor:
+                    # Copies the context vars of the consumer into the background thread
+                    next_page = executor.submit(contextvars.copy_context().run, page.fetch_page,
+                                                after=page.after_cursor)
+                else:
+                    next_page = page.fetch_page
+            after = page.after_cursor
+            yield page
+            if next_page is None:
+                page = None
+            elif executor:
+                page = next_page.result()
+            else:
+                page = next_page(after=after)
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
@@ -209,6 +209,49 @@ class Index(object):
         """
         return self.name
 
+    @staticmethod
+    def get_field_name(item: dict):
+        """
+        Returns the name of the field of a term or value: the document field for `['data', <field>]` and `ref` for
+        `['ref']`. Other paths and bindings return None.
+        Args:
+            item: Term or value of the index
+
+        Returns: str
+        """
+        if not isinstance(item, dict):
+            return None
+        field = item.get('field')
+        if isinstance(field, str):
+            field = [field]
+        if field == ['ref']:
+            return 'ref'
+        if isinstance(field, list) and len(field) == 2 and field[0] == 'data':
+            return field[1]
+        return None
+
+    def get_term_fields(self) -> list:
+        """
+        Returns the names of the fields the index is matched on, in term order, or None if a term is not a document
+        field.
+
+        Returns: list
+        """
+        fields = [self.get_field_name(i) for i in self.terms or []]
+        if None in fields:
+            return None
+        return fields
+
+    def get_value_fields(self) -> list:
+        """
+        Returns the names of the fields the index returns. An index without values returns refs.
+
+        Returns: list
+        """
+        if not self.values:
+            return ['ref']
+        return [self.get_field_name(i) for i in self.values]
+
     def publish(self, client) -> query:
         """
         Publish the index to Fauna
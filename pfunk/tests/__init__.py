@@ -1,4 +1,7 @@
+from unittest import mock
+
 from pfunk import Collection, StringField, EnumField, Enum, ReferenceField, SlugField
+from pfunk.client import Ref
 from pfunk.resources import Index
 from pfunk.contrib.auth.collections import User, Group
 from pfunk.contrib.auth.resources import GenericGroupBasedRole, GenericUserBasedRole
@@ -44,4 +47,42 @@ class House(Collection):
     user = ReferenceField(User)
 
     def __unicode__(self):
-        return self.address
\ No newline at end of file
+        return self.address
+
+
+def ref(collection, id):
+    return Ref(id, Ref(collection, Ref('collections')))
+
+
+def person_doc(id, sport=None, related=None):
+    doc = {'ref': ref('Person', id), 'ts': 1,
+           'data': {'first_name': f'First {id}', 'last_name': f'Last {id}', 'sport': sport}}
+    if related is not None:
+        doc['related'] = related
+    return doc
+
+
+class MockClientMixin(object):
+    """
+    Replaces the `client` of the `mock_collections` with one mock FaunaClient, `self.client`. Tests set its
+    `query.return_value` or `query.side_effect`. Mixed into `unittest.TestCase` classes.
+    """
+    mock_collections: tuple = ()
+
+    def setUp(self) -> None:
+        super(MockClientMixin, self).setUp()
+        self.client = mock.Mock()
+        for collection in self.mock_collections:
+            self.client_factory = self.start_patch(mock.patch.object(collection, 'client', return_value=self.client))
+
+    def start_patch(self, patcher):
+        """
+        Starts a patcher and stops it when the test ends.
+        Args:
+            patcher: Patcher returned by `mock.patch` or `mock.patch.object`
+
+        Returns: the patched object
+        """
+        patched = patcher.start()
+        self.addCleanup(patcher.stop)
+        return patched
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from click.testing import CliRunner
+
+from pfunk.advisor import IndexAdvisor
+from pfunk.cli import pfunk
+from pfunk.tests import MockClientMixin, Sport
+
+
+class IndexAdvisorTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Sport,)
+
+    def setUp(self) -> None:
+        super(IndexAdvisorTestCase, self).setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'advisor.json')
+        self.advisor = IndexAdvisor(path=self.path, enabled=True)
+        self.client.query.return_value = {'data': []}
+        self.start_patch(mock.patch('pfunk.collection.index_advisor', self.advisor))
+
+    def test_records_uncovered_filter(self):
+        for i in range(3):
+            with self.assertRaises(ValueError):
+                Sport.filter(name='Soccer')
+        self.client.query.assert_not_called()
+        self.assertEqual(self.advisor.get_patterns(), [{
+            'collection': 'Sport', 'source': 'Sport', 'kind': 'filter', 'index': None, 'terms': ['name'],
+            'ranges': [], 'covered': False, 'scan': False, 'count': 3, 'reads': 0, 'duration': 0.0
+        }])
+
+    def test_records_get_index(self):
+        self.client.query.return_value = {'data': [None] * 40}
+        Sport.all()
+        Sport.get_index('sport_unique_name_slug', terms=['Soccer', 'soccer'])
+        scans = self.advisor.get_scans()
+        self.assertEqual([(i['index'], i['reads']) for i in scans], [('all_sports', 40)])
+        covered = [i for i in self.advisor.get_patterns() if not i['scan']]
+        self.assertEqual(covered[0]['terms'], ['name', 'slug'])
+
+    def test_suggestions_ranked_by_savings(self):
+        self.advisor.record('Sport', 'Sport', 'get_index', index='all_sports', scan=True, reads=500)
+        for i in range(2):
+            self.advisor.record('Sport', 'Sport', 'filter', terms=['name'], covered=False)
+        self.advisor.record('Sport', 'Sport', 'filter', terms=['slug'], ranges=['name'], covered=False)
+        suggestions = self.advisor.get_suggestions()
+        self.assertEqual([(i['name'], i['savings']) for i in suggestions],
+                         [('sport_by_name', 998), ('sport_by_slug_sorted_by_name', 499)])
+        self.assertEqual(suggestions[1]['values'], ['name', 'ref'])
+        source = self.advisor.render()
+        self.assertIn("class SportByNameIndex(Index):\n    name = 'sport_by_name'", source)
+        self.assertIn("values = [{'field': ['data', 'name']}, {'field': ['ref']}]", source)
+        self.assertIn('all_sports read 500 documents', source)
+
+    def test_unique_together_entry(self):
+        self.advisor.record('Sport', 'Sport', 'filter', terms=['name', 'slug'], covered=False)
+        self.assertIn("('name', 'slug') to Sport.Meta.unique_together", self.advisor.render())
+
+    def test_cli(self):
+        self.advisor.record('Sport', 'Sport', 'filter', terms=['name'], covered=False)
+        self.advisor.flush()
+        self.assertEqual(self.advisor.patterns, {})
+        result = CliRunner().invoke(pfunk, ['index-advisor', '--path', self.path])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('class SportByNameIndex(Index):', result.output)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from faunadb.errors import NotFound
+
+from pfunk.client import AsyncFaunaClient, AsyncFaunaClientPool, get_async_client, q
+from pfunk.queryset import Queryset
+from pfunk.tests import Sport
+
+
+def sport_doc(id, name):
+    return {
+        'ref': {'@ref': {'id': id, 'collection': {'@ref': {'id': 'Sport', 'collection': {'@ref': {'id': 'collections'}}}}}},
+        'ts': 1,
+        'data': {'name': name, 'slug': name.lower()}
+    }
+
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+@unittest.skipUnless(httpx, 'httpx is not installed')
+class AsyncFaunaClientTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.requests = []
+
+    def get_client(self, resource, status_code=200):
+        def handler(request):
+            self.requests.append(request)
+            if status_code != 200:
+                return httpx.Response(status_code, json={'errors': [{'code': 'instance not found',
+                                                                     'description': 'Not found'}]})
+            return httpx.Response(200, json={'resource': resource}, headers={'X-Txn-Time': '10'})
+        return AsyncFaunaClient(secret='secret-a', transport=httpx.MockTransport(handler))
+
+    def test_query(self):
+        client = self.get_client(sport_doc('1', 'Soccer'))
+        resp = asyncio.run(client.query(q.get(q.ref(q.collection('Sport'), '1'))))
+        self.assertEqual(resp['ref'].id(), '1')
+        self.assertEqual(resp['data']['name'], 'Soccer')
+        self.assertEqual(self.requests[0].headers['Authorization'], 'Bearer secret-a')
+        self.assertEqual(json.loads(self.requests[0].content), {'get': {'ref': {'collection': 'Sport'}, 'id': '1'}})
+        self.assertEqual(client._last_txn_time.time, 10)
+
+    def test_query_error(self):
+        client = self.get_client(None, status_code=404)
+        with self.assertRaises(NotFound):
+            asyncio.run(client.query(q.get(q.ref(q.collection('Sport'), '1'))))
+
+    def test_aget(self):
+        client = self.get_client(sport_doc('1', 'Soccer'))
+        with mock.patch.object(Sport, 'aclient', return_value=client):
+            sport = asyncio.run(Sport.aget('1'))
+        self.assertIsInstance(sport, Sport)
+        self.assertEqual(sport.ref.id(), '1')
+        self.assertEqual(sport.name, 'Soccer')
+
+    def test_aall(self):
+        client = self.get_client({'data': [sport_doc('1', 'Soccer'), sport_doc('2', 'Tennis')]})
+        with mock.patch.object(Sport, 'aclient', return_value=client):
+            sports = asyncio.run(Sport.aall())
+        self.assertIsInstance(sports, Queryset)
+        self.assertEqual([i.name for i in sports], ['Soccer', 'Tennis'])
+
+    def test_asave(self):
+        client = self.get_client(sport_doc('3', 'Golf'))
+        sport = Sport(name='Golf', slug='golf')
+        with mock.patch.object(Sport, 'aclient', return_value=client):
+            asyncio.run(sport.asave())
+        self.assertEqual(sport.ref.id(), '3')
+        self.assertIn('create', json.loads(self.requests[0].content))
+
+    def test_pool_per_event_loop(self):
+        async def get_twice():
+            return get_async_client('secret-a'), get_async_client('secret-a')
+
+        first, second = asyncio.run(get_twice())
+        self.assertIs(first, second)
+        self.assertIsNot(first, asyncio.run(get_twice())[0])
+
+    def test_pool_closes_evicted_clients(self):
+        pool = AsyncFaunaClientPool(maxsize=1, ttl=60)
+
+        async def evict():
+            first = pool.get('secret-a')
+            second = pool.get('secret-b')
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            self.assertTrue(first.session.is_closed)
+            self.assertNotIn('secret-a', pool)
+            await pool.close()
+            return second
+
+        self.assertTrue(asyncio.run(evict()).session.is_closed)
+        self.assertEqual(len(pool), 0)
+
+    def test_pool_drops_closed_loops(self):
+        pool = AsyncFaunaClientPool(maxsize=2, ttl=60)
+
+        async def get():
+            pool.get('secret-a')
+            return len(pool._loops)
+
+        loops = [asyncio.new_event_loop() for i in range(2)]
+        for loop in loops:
+            self.assertEqual(loop.run_until_complete(get()), 1)
+            loop.close()
@@ -0,0 +1,80 @@
+import json
+import unittest
+from unittest import mock
+
+from faunadb._json import to_json
+
+from pfunk import StringField
+from pfunk.batch import BatchResult, get_current_batch
+from pfunk.client import q
+from pfunk.collection import Collection
+from pfunk.tests import MockClientMixin, Sport, User, Group, ref
+
+
+class QueryBatchTestCase(MockClientMixin, unittest.TestCase):
+
+    def setUp(self) -> None:
+        super(QueryBatchTestCase, self).setUp()
+        self.client.query.side_effect = lambda queries: [
+            {'ref': ref('Sport', str(n)), 'data': {'name': f'Sport {n}'}} for n, _ in enumerate(queries)
+        ]
+        self.start_patch(mock.patch('pfunk.batch.get_client', return_value=self.client))
+
+    def test_batch_is_current(self):
+        self.assertIsNone(get_current_batch())
+        with Collection.batch() as b:
+            self.assertIs(get_current_batch(), b)
+        self.assertIsNone(get_current_batch())
+
+    def test_create_assigns_refs(self):
+        with Collection.batch() as b:
+            sports = [Sport.create(name=f'Sport {i}', slug=f'sport-{i}') for i in range(3)]
+            self.assertEqual(len(b), 3)
+            self.assertIsNone(sports[0].ref)
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual([i.ref.id() for i in sports], ['0', '1', '2'])
+
+    def test_chunks(self):
+        with Collection.batch(chunk_size=2):
+            for i in range(5):
+                Sport.create(name=f'Sport {i}', slug=f'sport-{i}')
+        self.assertEqual(self.client.query.call_count, 3)
+
+    def test_get(self):
+        with Collection.batch():
+            sport = Sport.get('0')
+        self.assertEqual(sport.name, 'Sport 0')
+        self.client.query.assert_called_once_with([q.get(q.ref(q.collection('Sport'), '0'))])
+
+    def test_call_function(self):
+        with Collection.batch():
+            result = Sport().call_function('all_sports_function', size=10)
+        self.assertIsInstance(result, BatchResult)
+        self.assertTrue(result.done)
+        self.assertEqual(result.value['data']['name'], 'Sport 0')
+
+    def test_exception_discards_batch(self):
+        with self.assertRaises(ValueError):
+            with Collection.batch():
+                Sport.create(name='Sport', slug='sport')
+                raise ValueError
+        self.client.query.assert_not_called()
+
+    def test_save_related_in_batch(self):
+        group = Group(_ref=ref('Group', '1'))
+        with mock.patch.object(User, 'validate'), mock.patch.object(User, 'client') as client:
+            with Collection.batch():
+                user = User(username='user', groups=[group])
+                user.save()
+        client.assert_not_called()
+        self.assertEqual(user.ref.id(), '0')
+        query = json.loads(to_json(self.client.query.call_args[0][0]))[0]
+        self.assertEqual(query['let'][0]['doc']['create'], {'collection': 'User'})
+        relation, doc = query['in']['do']
+        self.assertEqual(relation['let'][1]['existing']['from']['paginate']['terms'],
+                         {'select': 'ref', 'from': {'var': 'doc'}})
+        self.assertEqual(doc, {'var': 'doc'})
+
+    def test_batch_is_protected(self):
+        with self.assertRaises(ValueError):
+            type('Item', (Collection,), {'__module__': __name__, 'batch': StringField()})
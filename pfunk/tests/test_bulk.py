@@ -0,0 +1,98 @@
+import json
+import unittest
+from unittest import mock
+
+from faunadb._json import to_json
+from faunadb.errors import BadRequest
+from faunadb.request_result import RequestResult
+
+from pfunk.batch import BulkResult
+from pfunk.contrib.auth.collections import Group, User
+from pfunk.tests import MockClientMixin, Sport, ref
+
+
+def bad_request():
+    return BadRequest(RequestResult('POST', '', None, None, '', {'errors': [
+        {'code': 'instance not unique', 'description': 'document is not unique.'}]}, 400, {}, 0, 0))
+
+
+class BulkTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Sport,)
+
+    def setUp(self) -> None:
+        super(BulkTestCase, self).setUp()
+        self.client.query.side_effect = self.query
+        self.sent = []
+
+    def query(self, expr):
+        payloads = json.loads(to_json(expr))['collection']
+        self.sent.append(payloads)
+        if '"bad"' in json.dumps(payloads):
+            raise bad_request()
+        return [ref('Sport', str(len(self.sent) * 100 + n)) for n, _ in enumerate(payloads)]
+
+    def test_bulk_create(self):
+        sports = [Sport(name=f'Sport {i}', slug=f'sport-{i}') for i in range(5)]
+        result = Sport.bulk_create(sports, chunk_size=2)
+        self.assertIsInstance(result, BulkResult)
+        self.assertTrue(result.success)
+        self.assertEqual(self.client.query.call_count, 3)
+        self.assertEqual([i.id() for i in result], ['100', '101', '200', '201', '300'])
+        self.assertEqual([i.ref for i in sports], list(result))
+
+    def test_bulk_create_validation_errors(self):
+        sports = [Sport(name='Soccer', slug='soccer'), Sport(slug='no-name')]
+        result = Sport.bulk_create(sports)
+        self.assertEqual(list(result.errors.keys()), [1])
+        self.assertIsNotNone(result[0])
+        self.assertIsNone(result[1])
+        self.assertEqual(self.client.query.call_count, 1)
+
+    def test_bulk_create_isolates_failures(self):
+        sports = [Sport(name=f'Sport {i}', slug=f'sport-{i}') for i in range(3)]
+        sports.insert(2, Sport(name='Bad', slug='bad'))
+        result = Sport.bulk_create(sports)
+        self.assertEqual(list(result.errors.keys()), [2])
+        self.assertIsInstance(result.errors[2], BadRequest)
+        self.assertIsNone(sports[2].ref)
+        self.assertEqual(len([i for i in result if i]), 3)
+
+    def test_bulk_update_requires_ref(self):
+        saved = Sport(_ref=ref('Sport', '1'), name='Soccer', slug='soccer')
+        result = Sport.bulk_update([saved, Sport(name='Tennis', slug='tennis')])
+        self.assertEqual(list(result.errors.keys()), [1])
+        self.assertEqual(self.client.query.call_count, 1)
+
+    def test_bulk_update_signals(self):
+        sport = Sport.from_db({'ref': ref('Sport', '1'), 'data': {'name': 'Soccer', 'slug': 'soccer'}})
+        sport.name = 'Football'
+        signal = mock.Mock(side_effect=lambda obj: setattr(obj, 'slug', 'football'))
+        with mock.patch.object(Sport, 'pre_update_signals', [signal], create=True):
+            result = Sport.bulk_update([sport])
+        self.assertTrue(result.success)
+        signal.assert_called_once_with(sport)
+        self.assertEqual(self.sent[0][0]['object']['doc']['object']['data']['object'],
+                         {'name': 'Football', 'slug': 'football'})
+
+    def test_bulk_delete(self):
+        sports = [Sport(_ref=ref('Sport', str(i)), name=f'Sport {i}', slug=f'sport-{i}') for i in range(3)]
+        result = Sport.bulk_delete(sports)
+        self.assertTrue(result.success)
+        self.assertEqual(len(self.sent[0]), 3)
+
+    def test_bulk_update_relations(self):
+        users = [User(_ref=ref('User', str(i)), username=f'user{i}') for i in range(3)]
+        group = Group(_ref=ref('Group', '1'))
+        for user in users[:2]:
+            user.groups = [group]
+        with mock.patch.object(User, 'client', return_value=self.client), mock.patch.object(User, 'validate'):
+            result = User.bulk_update(users, chunk_size=2)
+        self.assertTrue(result.success)
+        self.assertEqual(self.client.query.call_count, 2)
+        relation = json.loads(to_json(self.client.query.call_args_list[0][0][0]))['map']['expr']['in']['do'][0]
+        self.assertEqual(relation['if'], {'contains_path': ['relations', 'users_groups'], 'in': {'var': 'item'}})
+        existing = relation['then']['let'][1]['existing']['from']['paginate']
+        self.assertEqual(existing, {'match': {'index': 'users_groups_by_user'}, 'terms': {'var': 'ref'}})
+        self.assertEqual([list(i['object'].get('relations', {}).get('object', {})) for i in self.sent[0]],
+                         [['users_groups'], ['users_groups']])
+        self.assertEqual(self.sent[1][0]['object']['relations'], {'object': {}})
@@ -0,0 +1,109 @@
+import unittest
+from unittest import mock
+
+from pfunk import StringField
+from pfunk.cache import DocumentCache, LocalCacheBackend, document_cache, invalidate_cached_document
+from pfunk.identity import IdentityMap
+from pfunk.tests import MockClientMixin, Sport, ref
+
+
+class Package(Sport):
+    price = StringField()
+
+    class Meta:
+        cache_ttl = 60
+
+
+def package_doc(id, ts=1, name=None):
+    return {'ref': ref('Package', id), 'ts': ts, 'data': {'name': name or f'Package {id}', 'slug': f'package-{id}'}}
+
+
+class LocalCacheBackendTestCase(unittest.TestCase):
+
+    def test_expiry(self):
+        backend = LocalCacheBackend(maxsize=2)
+        with mock.patch('pfunk.cache.time', return_value=100):
+            backend.set('a', {'ts': 1}, 10)
+            self.assertEqual(backend.get('a'), {'ts': 1})
+        with mock.patch('pfunk.cache.time', return_value=111):
+            self.assertIsNone(backend.get('a'))
+
+    def test_lru(self):
+        backend = LocalCacheBackend(maxsize=2)
+        for key in 'abc':
+            backend.set(key, {}, 10)
+        self.assertIsNone(backend.get('a'))
+        self.assertEqual(backend.get('c'), {})
+
+
+class DocumentCacheTestCase(unittest.TestCase):
+
+    def test_older_document_does_not_replace(self):
+        cache = DocumentCache(LocalCacheBackend())
+        cache.set(package_doc('1', ts=2, name='New'), 60)
+        cache.set(package_doc('1', ts=1, name='Old'), 60)
+        self.assertEqual(cache.get('Package', '1')['data']['name'], 'New')
+        cache.refresh(package_doc('1', ts=3, name='Newer'), 60)
+        self.assertEqual(cache.get('Package', '1')['data']['name'], 'Newer')
+        cache.refresh(package_doc('2', ts=3), 60)
+        self.assertIsNone(cache.get('Package', '2'))
+        self.assertEqual(cache.get_stats('Package'), {'hits': 2, 'misses': 1})
+
+
+class CollectionCacheTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Package,)
+
+    def setUp(self) -> None:
+        super(CollectionCacheTestCase, self).setUp()
+        document_cache.clear()
+        self.addCleanup(document_cache.clear)
+
+    def test_signals(self):
+        self.assertIn(invalidate_cached_document, Package.post_save_signals)
+        self.assertIn(invalidate_cached_document, Package.post_delete_signals)
+        self.assertFalse(getattr(Sport, 'post_save_signals', None))
+        self.assertIsNone(Sport.get_cache_ttl())
+
+    def test_read_through(self):
+        self.client.query.return_value = package_doc('1')
+        self.assertEqual(Package.get('1').name, 'Package 1')
+        self.assertEqual(Package.get('1').name, 'Package 1')
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual(Package.get_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_save_invalidates(self):
+        self.client.query.return_value = package_doc('1')
+        package = Package.get('1')
+        package.save()
+        self.assertIsNone(document_cache.backend.get('Package:1'))
+
+    def test_delete_from_id_invalidates(self):
+        self.client.query.return_value = package_doc('1')
+        Package.get('1')
+        Package.delete_from_id('1')
+        self.assertIsNone(document_cache.backend.get('Package:1'))
+
+    def test_page_refreshes_cached_documents(self):
+        self.client.query.return_value = package_doc('1')
+        Package.get('1')
+        self.client.query.return_value = {'data': [package_doc('1', ts=2, name='Renamed')]}
+        Package.all()
+        self.assertEqual(Package.get('1').name, 'Renamed')
+
+    def test_other_token_misses(self):
+        self.client.query.return_value = package_doc('1')
+        Package.get('1')
+        Package.get('1', _token='user-secret')
+        self.assertEqual(self.client.query.call_count, 2)
+        self.assertEqual(Package.get_cache_stats(), {'hits': 0, 'misses': 2})
+        Package.get('1', _token='user-secret')
+        Package.get('1')
+        self.assertEqual(self.client.query.call_count, 2)
+        self.assertNotIn('user-secret', str(document_cache.backend.get('Package:1')))
+
+    def test_identity_map_first(self):
+        self.client.query.return_value = package_doc('1')
+        with IdentityMap():
+            Package.get('1')
+            Package.get('1')
+        self.assertEqual(Package.get_cache_stats(), {'hits': 0, 'misses': 1})
@@ -0,0 +1,35 @@
+import unittest
+
+from pfunk.client import FaunaClientPool, FaunaClient
+from pfunk.tests import Person
+
+
+class FaunaClientPoolTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.pool = FaunaClientPool(maxsize=2, ttl=60)
+
+    def test_same_secret_same_client(self):
+        client = self.pool.get('secret-a')
+        self.assertIsInstance(client, FaunaClient)
+        self.assertIs(client, self.pool.get('secret-a'))
+
+    def test_different_secret_different_client(self):
+        self.assertIsNot(self.pool.get('secret-a'), self.pool.get('secret-b'))
+
+    def test_bounded(self):
+        self.pool.get('secret-a')
+        self.pool.get('secret-b')
+        self.pool.get('secret-a')
+        self.pool.get('secret-c')
+        self.assertEqual(len(self.pool), 2)
+        self.assertIn('secret-a', self.pool)
+        self.assertNotIn('secret-b', self.pool)
+
+    def test_clear(self):
+        self.pool.get('secret-a')
+        self.pool.clear()
+        self.assertEqual(len(self.pool), 0)
+
+    def test_collection_client_is_shared(self):
+        self.assertIs(Person().client(_token='secret-a'), Person().client(_token='secret-a'))
@@ -1,9 +1,15 @@
+import json
 import unittest
+from unittest import mock
 
+from faunadb._json import to_json
 from valley.exceptions import ValidationException
 
-from pfunk.resources import q
-from pfunk.tests import Person, Sport, GENDER_PRONOUN
+from pfunk import Collection, FloatField, IntegerField, StringField
+from pfunk.client import Ref
+from pfunk.contrib.generic import GenericCreate
+from pfunk.resources import Index, q
+from pfunk.tests import MockClientMixin, Person, Sport, User, Group, GENDER_PRONOUN
 
 
 class CollectionTestCase(unittest.TestCase):
@@ -54,3 +60,249 @@ class CollectionTestCase(unittest.TestCase):
 
 
 
+
+    def test_metadata_compiled_once(self):
+        views = set(self.collection.collection_views)
+        for _ in range(10):
+            self.collection()
+        self.assertEqual(self.collection.collection_views, views)
+        self.assertEqual(len(views), len(self.collection.crud_views))
+        self.assertIn(GenericCreate, Sport.collection_functions)
+        self.assertNotIn(GenericCreate, self.collection.collection_functions)
+
+    def test_get_unique_together_idempotent(self):
+        sport = Sport()
+        sport.get_unique_together()
+        sport.get_unique_together()
+        self.assertEqual(len(Sport.get_indexes()), 1)
+
+
+class DirtyFieldsTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.ref = Ref('1', Ref('Person', Ref('collections')))
+        self.person = Person(_ref=self.ref, first_name='Mike', last_name='James')
+
+    def get_update_data(self, **kwargs):
+        query, _ = self.person.get_save_query(**kwargs)
+        return json.loads(to_json(query))['params']['object']['data']['object']
+
+    def test_clean_after_load(self):
+        self.assertEqual(self.person.get_dirty_fields(), [])
+
+    def test_changed_fields(self):
+        self.person.first_name = 'Michael'
+        self.assertEqual(self.person.get_dirty_fields(), ['first_name'])
+        self.assertEqual(self.get_update_data(), {'first_name': 'Michael'})
+
+    def test_data_update(self):
+        self.person._data.update({'last_name': 'Jones'})
+        self.assertEqual(self.get_update_data(), {'last_name': 'Jones'})
+
+    def test_update_fields(self):
+        self.person.first_name = 'Michael'
+        self.assertEqual(self.get_update_data(update_fields=['last_name']), {'last_name': 'James'})
+        with self.assertRaises(ValueError):
+            self.get_update_data(update_fields=['age'])
+
+    def test_clean_after_save(self):
+        self.person.first_name = 'Michael'
+        self.person._post_save_query({'ref': self.ref}, False)
+        self.assertEqual(self.person.get_dirty_fields(), [])
+
+    def test_ref_set_after_init(self):
+        self.person = Person(first_name='Michael')
+        self.person.ref = self.ref
+        self.assertEqual(self.person.get_dirty_fields(), ['first_name'])
+        with mock.patch.object(Person, 'validate'):
+            self.assertEqual(self.get_update_data(), {'first_name': 'Michael'})
+
+
+class SaveRelatedTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (User,)
+
+    def setUp(self) -> None:
+        super(SaveRelatedTestCase, self).setUp()
+        self.user = User(_ref=Ref('1', Ref('User', Ref('collections'))), username='ted')
+        self.groups = [Group(_ref=Ref(str(i), Ref('Group', Ref('collections')))) for i in range(50)]
+
+    def test_one_query(self):
+        self.user._save_related({'users_groups': self.groups})
+        self.assertEqual(self.client.query.call_count, 1)
+        query, = json.loads(to_json(self.client.query.call_args[0][0]))['do']
+        self.assertEqual(len(query['let'][0]['related']), 50)
+        self.assertEqual(query['let'][1]['existing']['from']['paginate']['match'], {'index': 'users_groups_by_user'})
+        self.assertEqual(len(query['in']['do']), 1)
+        self.assertEqual(query['in']['do'][0]['foreach']['expr']['else']['create'], {'collection': 'users_groups'})
+
+    def test_nothing_to_save(self):
+        self.user._save_related({'users_groups': []})
+        self.client.query.assert_not_called()
+
+    def test_sync(self):
+        field = User._base_properties['groups']
+        self.assertEqual(field.get_relation_pair_index_name(User), 'users_groups_by_group_and_user')
+        query = json.loads(to_json(field.get_relation_query(User, self.user.ref, [], sync=True)))
+        self.assertEqual(len(query['in']['do']), 2)
+        delete = query['in']['do'][1]['foreach']['expr']['else']
+        self.assertEqual(delete['foreach']['expr'], {'delete': {'var': 'relation_ref'}})
+        self.assertEqual(delete['collection']['paginate']['match'], {'index': 'users_groups_by_group_and_user'})
+
+
+class GetOrCreateTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Sport,)
+
+    def setUp(self) -> None:
+        super(GetOrCreateTestCase, self).setUp()
+        self.doc = {'ref': Ref('1', Ref('Sport', Ref('collections'))), 'ts': 1,
+                    'data': {'name': 'Soccer', 'slug': 'soccer'}}
+
+    def test_one_query(self):
+        self.client.query.return_value = {'doc': self.doc, 'created': True}
+        sport, created = Sport.get_or_create('sport_by_slug', terms=['soccer'],
+                                             defaults={'name': 'Soccer', 'slug': 'soccer'})
+        self.assertTrue(created)
+        self.assertEqual(sport.ref, self.doc['ref'])
+        self.assertEqual(self.client.query.call_count, 1)
+        query = json.loads(to_json(self.client.query.call_args[0][0]))
+        self.assertEqual(query['let'][0], {'found': {'exists': {'match': {'index': 'sport_by_slug'},
+                                                                'terms': ['soccer']}}})
+        self.assertEqual(query['let'][1]['doc']['else']['create'], {'collection': 'Sport'})
+        self.assertEqual(query['let'][1]['doc']['then'], {'get': {'match': {'index': 'sport_by_slug'},
+                                                                  'terms': ['soccer']}})
+
+    def test_existing(self):
+        self.client.query.return_value = {'doc': self.doc, 'created': False}
+        sport, created = Sport.get_or_create('sport_by_slug', terms=['soccer'],
+                                             defaults={'name': 'Football', 'slug': 'soccer'})
+        self.assertFalse(created)
+        self.assertEqual(sport.name, 'Soccer')
+
+    def test_update_or_create(self):
+        self.client.query.return_value = {'doc': self.doc, 'created': False}
+        sport, created = Sport.update_or_create('sport_by_slug', terms=['soccer'],
+                                                defaults={'name': 'Soccer', 'slug': 'soccer'})
+        self.assertFalse(created)
+        query = json.loads(to_json(self.client.query.call_args[0][0]))
+        self.assertEqual(query['let'][1]['doc']['then']['update'],
+                         {'select': 'ref', 'from': {'get': {'match': {'index': 'sport_by_slug'}, 'terms': ['soccer']}}})
+
+    def test_update_only_sends_defaults(self):
+        self.client.query.return_value = {'doc': self.doc, 'created': False}
+        Sport.update_or_create('sport_by_slug', terms=['soccer'], defaults={'name': 'Football'})
+        doc = json.loads(to_json(self.client.query.call_args[0][0]))['let'][1]['doc']
+        self.assertEqual(doc['then']['params']['object']['data']['object'], {'name': 'Football'})
+        self.assertEqual(doc['else']['params']['object']['data']['object'], {'name': 'Football', 'slug': None})
+
+    def test_invalid_defaults(self):
+        with self.assertRaises(ValidationException):
+            Sport.get_or_create('sport_by_slug', terms=['soccer'], defaults={'slug': 'soccer'})
+        self.client.query.assert_not_called()
+
+
+class OrderTotalsIndex(Index):
+    name = 'order_totals'
+    source = 'Order'
+    values = [{'field': ['data', 'total']}]
+
+
+class Order(Collection):
+    collection_indexes = [OrderTotalsIndex]
+    total = FloatField()
+    status = StringField()
+
+
+class AggregateTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Order,)
+
+    def sent(self):
+        return json.loads(to_json(self.client.query.call_args[0][0]))
+
+    def test_count(self):
+        self.client.query.return_value = 42
+        self.assertEqual(Order.aggregates.count(), 42)
+        self.assertEqual(self.sent(), {'count': {'match': {'index': 'all_orders'}, 'terms': []}})
+        with self.assertRaises(ValueError):
+            Order.aggregates.count(terms=['PAID'])
+
+    def test_sum_reads_index_values(self):
+        self.client.query.return_value = {'sum': 12.5, 'after': None}
+        self.assertEqual(Order.aggregates.sum('total'), 12.5)
+        self.assertEqual(self.client.query.call_count, 1)
+        query = self.sent()
+        self.assertEqual(list(query['in']['object']), ['sum', 'after'])
+        page = query['let'][0]['page']['collection']
+        self.assertEqual(page['paginate'], {'match': {'index': 'order_totals'}, 'terms': []})
+        self.assertEqual(page['size'], 1000)
+
+    def test_follows_after_cursor(self):
+        after = [Ref('2', Ref('Order', Ref('collections')))]
+        self.client.query.side_effect = [{'sum': 10, 'count': 4, 'after': after}, {'sum': 5, 'count': 1}]
+        self.assertEqual(Order.aggregates.mean('total', _page_size=4), 3)
+        self.assertEqual(self.client.query.call_count, 2)
+        self.assertEqual(self.sent()['let'][0]['page']['collection']['after'], json.loads(to_json(after)))
+        self.client.query.side_effect = [{'max': 3, 'after': after}, {'max': None}]
+        self.assertEqual(Order.aggregates.max('total'), 3)
+
+    def test_mean_reads_documents(self):
+        self.client.query.return_value = {'sum': 0, 'count': 0}
+        self.assertIsNone(Order.aggregates.mean('total', 'orders_by_status', terms=['PAID']))
+        query = self.sent()
+        self.assertEqual(query['let'][0]['page']['collection']['map']['expr'],
+                         {'select': ['data', 'total'], 'from': {'get': {'var': 'row'}}, 'default': None})
+        self.assertEqual(list(query['in']['object']), ['sum', 'count', 'after'])
+        with self.assertRaises(ValueError):
+            Order.aggregates.mean('total', terms=['PAID'])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Order.aggregates.max('missing')
+        with self.assertRaises(ValueError):
+            Order.aggregates.aggregate('median', 'total')
+        self.client.query.assert_not_called()
+
+    def test_fields_named_like_aggregates(self):
+        item_class = type('Item', (Collection,), {'__module__': __name__, 'count': IntegerField(),
+                                                  'max': IntegerField()})
+        self.assertEqual(item_class(count=3, max=5).count, 3)
+        self.assertEqual(item_class(count=3, max=5).max, 5)
+        with self.assertRaises(ValueError):
+            type('Item', (Collection,), {'__module__': __name__, 'aggregates': IntegerField()})
+
+
+class LazyHydrationTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.doc = {'ref': Ref('1', Ref('Person', Ref('collections'))), 'ts': 1,
+                    'data': {'first_name': 'Mike', 'last_name': 'James',
+                             'sport': Ref('2', Ref('Sport', Ref('collections')))}}
+
+    def test_converted_on_access(self):
+        person = Person.from_db(self.doc)
+        self.assertEqual(person._pending, set(Person._base_properties))
+        self.assertEqual(person.first_name, 'Mike')
+        self.assertNotIn('first_name', person._pending)
+        self.assertIn('sport', person._pending)
+        sport = person.sport
+        self.assertIsInstance(sport, Sport)
+        self.assertIs(person.sport, sport)
+        self.assertEqual(sport.ref.id(), '2')
+
+    def test_same_values_as_init(self):
+        person = Person.from_db(self.doc)
+        expected = Person(_ref=self.doc['ref'], **self.doc['data'])
+        self.assertEqual(person.to_dict()['data'].keys(), expected.to_dict()['data'].keys())
+        self.assertFalse(person._pending)
+        self.assertEqual(person.last_name, expected.last_name)
+
+    def test_dirty_fields(self):
+        person = Person.from_db(self.doc)
+        self.assertEqual(person.get_dirty_fields(), [])
+        person.last_name = 'Jones'
+        self.assertEqual(person.get_dirty_fields(), ['last_name'])
+
+    def test_opt_out(self):
+        with mock.patch.object(Person, 'lazy_hydration', False):
+            person = Person.from_db(self.doc)
+        self.assertFalse(person._pending)
+        self.assertEqual(person.get_dirty_fields(), [])
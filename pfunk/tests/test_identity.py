@@ -0,0 +1,91 @@
+import json
+import unittest
+from unittest import mock
+
+from faunadb._json import to_json
+
+from pfunk.identity import IdentityMap, get_identity_map, forget
+from pfunk.queryset import Queryset
+from pfunk.tests import MockClientMixin, Person, Sport, ref
+
+
+def sport_doc(id):
+    return {'ref': ref('Sport', id), 'ts': 1, 'data': {'name': f'Sport {id}', 'slug': f'sport-{id}'}}
+
+
+def person_doc(id, sport_id='1'):
+    return {'ref': ref('Person', id), 'ts': 1,
+            'data': {'first_name': f'First {id}', 'last_name': f'Last {id}', 'sport': ref('Sport', sport_id)}}
+
+
+class IdentityMapTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Person, Sport)
+
+    def test_context(self):
+        self.assertIsNone(get_identity_map())
+        with IdentityMap() as identity_map:
+            self.assertIs(get_identity_map(), identity_map)
+            identity_map.add(sport_doc('1'))
+            self.assertEqual(identity_map.get('Sport', '1'), sport_doc('1'))
+        self.assertIsNone(get_identity_map())
+        self.assertEqual(len(identity_map), 0)
+
+    def test_get_once(self):
+        self.client.query.return_value = sport_doc('1')
+        with IdentityMap():
+            Sport.get('1')
+            sport = Sport.get('1')
+        self.assertEqual(sport.name, 'Sport 1')
+        self.assertEqual(self.client.query.call_count, 1)
+
+    def test_without_map(self):
+        self.client.query.return_value = sport_doc('1')
+        Sport.get('1')
+        Sport.get('1')
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_shared_reference(self):
+        self.client.query.side_effect = [
+            {'data': [person_doc('1'), person_doc('2')]},
+            sport_doc('1'),
+        ]
+        with IdentityMap():
+            names = [i.sport.name for i in Person.all()]
+        self.assertEqual(names, ['Sport 1', 'Sport 1'])
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_lazied_page_uses_map(self):
+        with IdentityMap() as identity_map:
+            identity_map.add(person_doc('1'))
+            self.client.query.return_value = [person_doc('2')]
+            qs = Queryset({'data': [ref('Person', '1'), ref('Person', '2')]}, Person, lazied=True)
+            self.assertEqual([i.first_name for i in qs], ['First 1', 'First 2'])
+        refs = json.loads(to_json(self.client.query.call_args[0][0]))['collection']
+        self.assertEqual([i['@ref']['id'] for i in refs], ['2'])
+
+    def test_delete_forgets(self):
+        self.client.query.return_value = sport_doc('1')
+        with IdentityMap() as identity_map:
+            sport = Sport.get('1')
+            sport.delete()
+            self.assertIsNone(identity_map.get('Sport', '1'))
+
+    def test_delete_from_id_forgets(self):
+        self.client.query.return_value = sport_doc('1')
+        with IdentityMap() as identity_map:
+            Sport.get('1')
+            with mock.patch('pfunk.collection.forget', wraps=forget) as forget_mock:
+                Sport.delete_from_id('1')
+            self.assertEqual(forget_mock.call_args[0][0], ref('Sport', '1'))
+            self.assertIsNone(identity_map.get('Sport', '1'))
+
+    def test_save_replaces(self):
+        updated = sport_doc('1')
+        updated['data']['name'] = 'Updated'
+        self.client.query.side_effect = [sport_doc('1'), updated]
+        with IdentityMap():
+            sport = Sport.get('1')
+            sport.name = 'Updated'
+            sport.save()
+            self.assertEqual(Sport.get('1').name, 'Updated')
+        self.assertEqual(self.client.query.call_count, 2)
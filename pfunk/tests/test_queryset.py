@@ -0,0 +1,323 @@
+import contextvars
+import json
+import unittest
+from unittest import mock
+
+from faunadb._json import to_json
+
+from pfunk import Collection, StringField
+from pfunk.queryset import Queryset, ValuesQueryset
+from pfunk.resources import Index
+from pfunk.tests import MockClientMixin, Person, Sport, User, Group, ref, person_doc
+
+
+class SelectRelatedTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Person,)
+
+    def test_query(self):
+        query = json.loads(to_json(Person.get_index_query('all_people', select_related=['sport'])))
+        doc_query = query['map']['expr']
+        self.assertEqual(doc_query['let'], [{'doc': {'get': {'var': 'ref'}}}])
+        self.assertEqual(list(doc_query['in']['with']['object']['related']['object'].keys()), ['sport'])
+
+    def test_not_a_reference_field(self):
+        with self.assertRaises(ValueError):
+            Person.get_index_query('all_people', select_related=['first_name'])
+
+    def test_hydrates_related(self):
+        sport_doc = {'ref': ref('Sport', '10'), 'ts': 1, 'data': {'name': 'Soccer', 'slug': 'soccer'}}
+        self.client.query.return_value = {'data': [
+            person_doc('1', sport=ref('Sport', '10'), related={'sport': sport_doc}),
+            person_doc('2', related={'sport': None}),
+        ]}
+        people = Person.all(select_related=['sport'])
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertIsInstance(people[0]._data['sport'], Sport)
+        self.assertFalse(people[0]._data['sport']._lazied)
+        with mock.patch.object(Sport, '_get') as sport_get:
+            self.assertEqual(people[0].sport.name, 'Soccer')
+            sport_get.assert_not_called()
+        self.assertIsNone(people[1].sport)
+
+
+class QuerysetTestCase(unittest.TestCase):
+
+    def test_cursors(self):
+        qs = Queryset({'data': [person_doc('1')], 'after': [ref('Person', '2')]}, Person)
+        self.assertEqual(len(qs), 1)
+        self.assertEqual(qs.after, ref('Person', '2'))
+        self.assertIsNone(qs.before)
+
+    def test_rows_instantiated_on_read(self):
+        qs = Queryset({'data': [person_doc('1'), person_doc('2'), person_doc('3')]}, Person)
+        self.assertEqual(qs._instances, [None, None, None])
+        self.assertEqual(qs[-1].first_name, 'First 3')
+        self.assertEqual(qs._instances[:2], [None, None])
+        self.assertIs(qs[2], qs[-1])
+        self.assertEqual([i.first_name for i in qs[:2]], ['First 1', 'First 2'])
+        with self.assertRaises(IndexError):
+            qs[3]
+
+
+class IteratorTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Person,)
+
+    def setUp(self) -> None:
+        super(IteratorTestCase, self).setUp()
+        self.client.query.side_effect = [
+            {'data': [person_doc('1'), person_doc('2')], 'after': [ref('Person', '3')]},
+            {'data': [person_doc('3'), person_doc('4')], 'after': [ref('Person', '5')]},
+            {'data': [person_doc('5')]},
+        ]
+
+    def assert_all_pages(self, people):
+        self.assertEqual([i.first_name for i in people], [f'First {i}' for i in range(1, 6)])
+        self.assertEqual(self.client.query.call_count, 3)
+        cursor = json.loads(to_json(self.client.query.call_args_list[2][0][0]))['collection']['after']
+        self.assertEqual(cursor, [{'@ref': {'id': '5', 'collection': {'@ref': {'id': 'Person', 'collection': {
+            '@ref': {'id': 'collections'}}}}}}])
+
+    def test_iter_all(self):
+        self.assert_all_pages(Person.iter_all(page_size=2))
+
+    def test_prefetch(self):
+        self.assert_all_pages(Person.iter_all(page_size=2, prefetch=True))
+
+    def test_iterator(self):
+        self.assert_all_pages(Person.get_index('all_people', page_size=2).iterator())
+
+    def test_prefetch_context(self):
+        var = contextvars.ContextVar('var', default=None)
+        seen = []
+        page = Person.get_index('all_people', page_size=2)
+        fetch_page = page.fetch_page
+        page.fetch_page = lambda **kwargs: seen.append(var.get()) or fetch_page(**kwargs)
+        var.set('request')
+        self.assertEqual([len(i) for i in page.pages(prefetch=True)], [2, 2, 1])
+        self.assertEqual(seen, ['request'])
+
+
+class PrefetchRelatedTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (User,)
+
+    def user_doc(self, id, groups):
+        return {'ref': ref('User', id), 'ts': 1,
+                'data': {'username': f'user{id}', 'first_name': 'Ted', 'last_name': 'Lasso',
+                         'email': f'user{id}@example.org', 'account_status': 'ACTIVE'},
+                'related': {'groups': groups}}
+
+    def group_doc(self, id):
+        return {'ref': ref('Group', id), 'ts': 1, 'data': {'name': f'Group {id}', 'slug': f'group-{id}'}}
+
+    def test_query(self):
+        query = json.loads(to_json(User.get_index_query('all_users', prefetch_related=['groups'])))
+        related = query['map']['expr']['in']['with']['object']['related']['object']['groups']
+        self.assertEqual(related['map'], {'lambda': 'related_ref', 'expr': {'get': {'var': 'related_ref'}}})
+        paginate = related['collection']['collection']['from']['paginate']
+        self.assertEqual(paginate['match'], {'index': 'users_groups_by_user'})
+        self.assertEqual(paginate['terms'], {'select': 'ref', 'from': {'var': 'doc'}})
+
+    def test_not_a_many_to_many_field(self):
+        with self.assertRaises(ValueError):
+            User.get_index_query('all_users', prefetch_related=['username'])
+
+    def test_all(self):
+        self.client.query.return_value = {'data': [
+            self.user_doc('1', [self.group_doc('10'), self.group_doc('11')]),
+            self.user_doc('2', []),
+        ]}
+        users = User.all(prefetch_related=['groups'])
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual([g.name for g in users[0].groups], ['Group 10', 'Group 11'])
+        self.assertTrue(all(isinstance(g, Group) and not g._lazied for g in users[0].groups))
+        self.assertEqual(users[1].groups, [])
+
+    def test_get(self):
+        self.client.query.return_value = self.user_doc('1', [self.group_doc('10')])
+        user = User.get('1', prefetch_related=['groups'])
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual(user.groups[0].slug, 'group-10')
+
+
+class BatchLaziedTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Person,)
+
+    def lazied_page(self, **kwargs):
+        return Queryset({'data': [ref('Person', str(i)) for i in range(3)]}, Person, lazied=True, **kwargs)
+
+    def test_one_query_per_page(self):
+        self.client.query.return_value = [person_doc(str(i)) for i in range(3)]
+        qs = self.lazied_page()
+        self.assertEqual([i.first_name for i in qs], ['First 0', 'First 1', 'First 2'])
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertFalse(any(i._lazied for i in qs))
+
+    def test_missing_document_stays_lazied(self):
+        self.client.query.return_value = [person_doc('0'), None, person_doc('2')]
+        qs = self.lazied_page()
+        self.assertEqual(qs[0].first_name, 'First 0')
+        self.assertTrue(qs[1]._lazied)
+        self.assertIsNone(qs[1]._queryset)
+
+    def test_opt_out(self):
+        self.client.query.side_effect = lambda query: person_doc('0')
+        qs = self.lazied_page(batch_lazied=False)
+        qs[0].first_name
+        qs[1].first_name
+        self.assertEqual(self.client.query.call_count, 2)
+
+
+class ProjectionTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Person,)
+
+    def projected_doc(self, id):
+        return {'ref': ref('Person', id), 'ts': 1, 'data': {'first_name': f'First {id}'}}
+
+    def test_query(self):
+        query = json.loads(to_json(Person.get_index_query('all_people', only=['first_name'])))
+        doc_query = query['map']['expr']
+        self.assertEqual(doc_query['let'], [{'doc': {'get': {'var': 'ref'}}}])
+        self.assertEqual(list(doc_query['in']['object']['data']['object'].keys()), ['first_name'])
+
+    def test_defer(self):
+        fields = Person.get_projected_fields(defer=['last_name', 'sport'])
+        self.assertIn('first_name', fields)
+        self.assertNotIn('last_name', fields)
+        self.assertNotIn('sport', fields)
+        self.assertIn('sport', Person.get_projected_fields(defer=['sport'], select_related=['sport']))
+        with self.assertRaises(ValueError):
+            Person.get_projected_fields(only=['age'])
+
+    def test_deferred_fields_loaded_in_one_query(self):
+        self.client.query.side_effect = [
+            {'data': [self.projected_doc('1'), self.projected_doc('2')]},
+            [person_doc('1'), person_doc('2')],
+        ]
+        people = Person.all(only=['first_name'])
+        self.assertEqual(people[0].first_name, 'First 1')
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual(people[0].to_dict()['data'], {'first_name': 'First 1'})
+        people[1].first_name = 'Changed'
+        self.assertEqual([i.last_name for i in people], ['Last 1', 'Last 2'])
+        self.assertEqual(self.client.query.call_count, 2)
+        self.assertEqual(people[1].first_name, 'Changed')
+
+    def test_list_view_fields(self):
+        from valley.exceptions import ValidationException
+        from pfunk.web.views.base import QuerysetMixin
+
+        view = QuerysetMixin()
+        view.collection = Person
+        self.assertEqual(view.get_fields('first_name, last_name'), ['first_name', 'last_name'])
+        with self.assertRaises(ValidationException):
+            view.get_fields('first_name,age')
+
+
+class SportsByNameIndex(Index):
+    name = 'sports_by_name'
+    source = 'Sport'
+    values = [{'field': ['data', 'name']}, {'field': ['data', 'slug']}, {'field': ['ref']}]
+
+
+class ValuesListTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Sport,)
+
+    def setUp(self) -> None:
+        super(ValuesListTestCase, self).setUp()
+        self.client.query.return_value = {
+            'data': [['Baseball', 'baseball', ref('Sport', '1')], ['Soccer', 'soccer', ref('Sport', '2')]]
+        }
+        self.start_patch(mock.patch.object(Sport, 'collection_indexes', [SportsByNameIndex]))
+
+    def test_no_document_fetch(self):
+        rows = Sport.values_list('sports_by_name')
+        query = json.loads(to_json(self.client.query.call_args[0][0]))
+        self.assertNotIn('map', query)
+        self.assertIsInstance(rows, ValuesQueryset)
+        self.assertEqual(rows[0], ('Baseball', 'baseball', ref('Sport', '1')))
+
+    def test_named(self):
+        rows = Sport.values_list('sports_by_name', fields=['slug', 'ref'], named=True)
+        self.assertEqual(rows[1].slug, 'soccer')
+        self.assertEqual(rows[1].ref, ref('Sport', '2'))
+        self.assertEqual(rows.fields, ['slug', 'ref'])
+
+    def test_flat(self):
+        self.assertEqual(list(Sport.values_list('sports_by_name', fields=['name'], flat=True)), ['Baseball', 'Soccer'])
+        with self.assertRaises(ValueError):
+            Sport.values_list('sports_by_name', flat=True)
+
+    def test_not_covered(self):
+        with self.assertRaises(ValueError):
+            Sport.values_list('sports_by_name', fields=['created'])
+
+    def test_undefined_index(self):
+        self.client.query.return_value = {'data': ['baseball', 'soccer']}
+        self.assertEqual(list(Sport.values_list('sports_slugs', fields=['slug'], flat=True)), ['baseball', 'soccer'])
+        with self.assertRaises(ValueError):
+            Sport.values_list('sports_slugs')
+
+
+class SportsBySlugIndex(Index):
+    name = 'sports_by_slug'
+    source = 'Sport'
+    terms = [{'field': ['data', 'slug']}]
+
+
+class FilterTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Sport,)
+
+    def setUp(self) -> None:
+        super(FilterTestCase, self).setUp()
+        self.client.query.return_value = {'data': [person_doc('1')]}
+        self.start_patch(mock.patch.object(Sport, 'collection_indexes', {SportsByNameIndex, SportsBySlugIndex}))
+
+    def compile(self, lookups=None, exclude=None):
+        return json.loads(to_json(Sport.get_filter_query(lookups, exclude)))
+
+    def test_match(self):
+        self.assertEqual(self.compile({'slug': 'soccer'}), {'match': {'index': 'sports_by_slug'}, 'terms': ['soccer']})
+
+    def test_unique_together_index(self):
+        query = self.compile({'slug': 'soccer', 'name': 'Soccer'})
+        self.assertEqual(query, {'match': {'index': 'sport_unique_name_slug'}, 'terms': ['Soccer', 'soccer']})
+
+    def test_in(self):
+        query = self.compile({'slug__in': ['soccer', 'rugby']})
+        self.assertEqual([i['terms'] for i in query['union']], [['soccer'], ['rugby']])
+
+    def test_range(self):
+        query = self.compile({'name__gte': 'A', 'name__lt': 'M', 'slug': 'soccer'})
+        self.assertEqual(len(query['intersection']), 2)
+        by_name = query['intersection'][0]['join']['collection']
+        self.assertEqual(by_name['range'], {'match': {'index': 'sports_by_name'}, 'terms': []})
+        self.assertEqual([by_name['from'], by_name['to']], ['A', 'M'])
+        self.assertEqual(query['intersection'][0]['join']['filter'],
+                         {'lambda': 'row', 'expr': {'lt': [{'select': 0, 'from': {'var': 'row'}}, 'M']}})
+
+    def test_exclude(self):
+        query = self.compile(exclude={'slug': 'soccer'})
+        self.assertEqual(query['difference'], [{'match': {'index': 'all_sports'}},
+                                               {'match': {'index': 'sports_by_slug'}, 'terms': ['soccer']}])
+
+    def test_filter_is_protected(self):
+        with self.assertRaises(ValueError):
+            type('Item', (Collection,), {'__module__': __name__, 'filter': StringField()})
+
+    def test_not_indexed(self):
+        with self.assertRaises(ValueError):
+            Sport.filter(created='2021')
+        with self.assertRaises(ValueError):
+            Sport.filter(slug__gte='a')
+        with self.assertRaises(ValueError):
+            Sport.filter(slug__startswith='a')
+        self.client.query.assert_not_called()
+
+    def test_filter(self):
+        people = Sport.filter(slug='soccer', _page_size=10)
+        self.assertEqual(self.client.query.call_count, 1)
+        query = json.loads(to_json(self.client.query.call_args[0][0]))
+        self.assertEqual(query['collection']['paginate'], {'match': {'index': 'sports_by_slug'}, 'terms': ['soccer']})
+        self.assertEqual(query['collection']['size'], 10)
+        self.assertIsNotNone(people.fetch_page)
+
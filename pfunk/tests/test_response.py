@@ -0,0 +1,283 @@
+import base64
+import datetime
+import gzip
+import json
+import unittest
+from unittest import mock
+
+from faunadb._json import to_json
+from faunadb.objects import Ref
+from werkzeug.test import Client, EnvironBuilder
+
+from pfunk import Collection, ReferenceField, StringField
+from pfunk.project import Project
+from pfunk.queryset import Queryset
+from pfunk.resources import Index
+from pfunk.tests import MockClientMixin, Person, Sport, ref, person_doc
+from pfunk.utils import json_utils
+from pfunk.utils.json_utils import PFunkEncoder, StdlibJSONCodec, OrjsonCodec
+from pfunk.web.views.json import DetailView, ListView
+from pfunk.web.response import JSONResponse, JSONStreamingResponse, Response, get_accepted_encodings, get_content_encoding
+
+
+class CompressionTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.payload = [{'name': f'Sport {i}', 'slug': f'sport-{i}'} for i in range(100)]
+
+    def test_accept_encoding(self):
+        self.assertEqual(get_accepted_encodings('gzip, br;q=0.5, identity;q=0'),
+                         {'gzip': 1.0, 'br': 0.5, 'identity': 0.0})
+        self.assertEqual(get_content_encoding('deflate, gzip;q=0.8'), 'gzip')
+        self.assertIn(get_content_encoding('*'), ('br', 'gzip'))
+        self.assertIsNone(get_content_encoding('gzip;q=0, deflate'))
+        self.assertIsNone(get_content_encoding(''))
+
+    def test_compressed_response(self):
+        response = JSONResponse(self.payload).compress('gzip')
+        resp = response.response
+        self.assertTrue(resp['isBase64Encoded'])
+        self.assertEqual(resp['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(resp['headers']['Vary'], 'Accept-Encoding')
+        body = gzip.decompress(base64.b64decode(resp['body']))
+        self.assertEqual(json.loads(body)['data'], self.payload)
+        response = JSONResponse(self.payload, headers={'ETag': '"abc"'}).compress('gzip')
+        self.assertEqual(response.headers['ETag'], 'W/"abc"')
+
+    def test_small_or_not_accepted(self):
+        for response in (JSONResponse({'a': 1}).compress('gzip'), JSONResponse(self.payload).compress(None)):
+            resp = response.response
+            self.assertNotIn('isBase64Encoded', resp)
+            self.assertNotIn('Content-Encoding', resp['headers'])
+            self.assertEqual(resp['headers']['Vary'], 'Accept-Encoding')
+            self.assertEqual(json.loads(resp['body']), json.loads(response.content))
+        self.assertNotIn('Vary', JSONResponse(self.payload).response['headers'])
+
+    def test_disabled(self):
+        with mock.patch.object(Response, 'compression', False):
+            resp = JSONResponse(self.payload).compress('gzip').response
+        self.assertNotIn('Vary', resp['headers'])
+        self.assertNotIn('isBase64Encoded', resp)
+
+    def test_wsgi_app(self):
+        project = Project()
+        response = JSONResponse(self.payload)
+        view = mock.Mock(side_effect=lambda request, context, kwargs: response.compress(
+            request.headers.get('Accept-Encoding')))
+        with mock.patch.object(project, 'urls', create=True) as urls:
+            urls.match.return_value = (view, {})
+            resp = Client(project.wsgi_app).get('/sports/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(resp.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(gzip.decompress(resp.data))['data'], self.payload)
+
+
+class ConditionalTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.doc = {'ref': Ref('1', Ref('Sport', Ref('collections'))), 'ts': 1634567890123456,
+                    'data': {'name': 'Soccer', 'slug': 'soccer'}}
+        self.page = {'data': [self.doc], 'after': [Ref('2', Ref('Sport', Ref('collections')))]}
+
+    def get_view(self, view_class, **headers):
+        view = view_class(Sport)
+        view.request = mock.Mock(method='GET', headers=headers, kwargs={'id': '1'}, token=None, query_params={})
+        return view
+
+    def test_detail_etag(self):
+        with mock.patch.object(Sport, 'get', return_value=Sport.from_db(self.doc)):
+            response = self.get_view(DetailView).get_response()
+            etag = response.headers['ETag']
+            self.assertEqual(response.headers['Last-Modified'], 'Mon, 18 Oct 2021 14:38:10 GMT')
+            not_modified = self.get_view(DetailView, **{'If-None-Match': f'W/{etag}'}).get_response()
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertEqual(not_modified.body, '')
+            self.assertEqual(not_modified.headers['ETag'], etag)
+            view = self.get_view(DetailView, **{'if-modified-since': 'Mon, 18 Oct 2021 14:38:09 GMT'})
+            self.assertEqual(view.get_response().status_code, 200)
+
+    def test_conditional_query(self):
+        view = self.get_view(DetailView)
+        with mock.patch.object(Sport, 'get', return_value=Sport.from_db(self.doc)):
+            etag = view.get_response().headers['ETag']
+        view = self.get_view(DetailView, **{'If-None-Match': etag})
+        view.conditional_query = True
+        with mock.patch.object(Sport, 'get') as get, \
+                mock.patch.object(Sport, 'get_ts', return_value=self.doc['ts']) as get_ts:
+            self.assertEqual(view.get_response().status_code, 304)
+        get.assert_not_called()
+        get_ts.assert_called_once_with('1', _token=None)
+
+    def test_list_etag(self):
+        with mock.patch.object(Sport, 'all', return_value=Queryset(self.page, Sport)):
+            etag = self.get_view(ListView).get_response().headers['ETag']
+        view = self.get_view(ListView, **{'If-None-Match': etag})
+        view.conditional_query = True
+        ts_page = dict(self.page, data=[{'ref': self.doc['ref'], 'ts': self.doc['ts']}])
+        with mock.patch.object(Sport, 'get_index_ts', return_value=ts_page) as get_index_ts, \
+                mock.patch.object(Sport, 'all', return_value=Queryset(dict(self.page, after=None), Sport)):
+            self.assertEqual(view.get_response().status_code, 304)
+            ts_page['after'] = None
+            response = view.get_response()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        get_index_ts.assert_called_with('all_sports', after=None, before=None, _token=None)
+
+    def test_index_ts_query(self):
+        query = json.loads(to_json(Sport.get_index_ts_query('all_sports', page_size=10)))
+        self.assertEqual(query['collection']['paginate'], {'match': {'index': 'all_sports'}, 'terms': []})
+        self.assertEqual(query['collection']['size'], 10)
+        self.assertEqual(query['map']['expr']['object']['ts'], {'select': 'ts', 'from': {'get': {'var': 'ref'}}})
+
+    def test_index_ts_query_reads_index_values(self):
+        with mock.patch.object(Sport, 'get_indexes', return_value=[SportsByTsIndex]):
+            query = json.loads(to_json(Sport.get_index_ts_query('sports_by_ts')))
+        self.assertEqual(query['map']['lambda'], 'row')
+        self.assertEqual(query['map']['expr']['object'], {'ref': {'select': 1, 'from': {'var': 'row'}},
+                                                          'ts': {'select': 0, 'from': {'var': 'row'}}})
+
+
+class SportsByTsIndex(Index):
+    name = 'sports_by_ts'
+    source = 'Sport'
+    values = [{'field': ['ts'], 'reverse': True}, {'field': ['ref']}]
+
+
+class StreamingTestCase(unittest.TestCase):
+
+    def get_page(self, start, after=None):
+        return {'data': [{'ref': Ref(str(i), Ref('Sport', Ref('collections'))), 'ts': 1,
+                          'data': {'name': f'Sport {i}', 'slug': f'sport-{i}'}} for i in range(start, start + 2)],
+                'after': after}
+
+    def setUp(self) -> None:
+        self.fetch_page = mock.Mock(return_value=Queryset(self.get_page(2), Sport))
+        self.queryset = Queryset(self.get_page(0, after=[Ref('2', Ref('Sport', Ref('collections')))]), Sport,
+                                 fetch_page=self.fetch_page)
+
+    def test_json_chunks(self):
+        response = JSONStreamingResponse(self.queryset)
+        chunks = response.iter_content()
+        self.assertEqual(next(chunks), b'{"success": true, "data": [')
+        next(chunks)
+        self.fetch_page.assert_not_called()
+        body = b''.join(chunks)
+        self.fetch_page.assert_called_once_with(after=self.queryset.after_cursor)
+        self.assertTrue(body.endswith(b']}'))
+
+    def test_lambda_response(self):
+        resp = JSONStreamingResponse([[], [{'name': 'Soccer'}], [{'name': 'Tennis'}]]).response
+        self.assertEqual(json.loads(resp['body']), {'success': True, 'data': [{'name': 'Soccer'}, {'name': 'Tennis'}]})
+        resp = JSONStreamingResponse([[{'name': 'Soccer'}]]).compress('gzip').response
+        self.assertTrue(resp['isBase64Encoded'])
+        self.assertEqual(json.loads(gzip.decompress(base64.b64decode(resp['body'])))['data'], [{'name': 'Soccer'}])
+
+    def test_wsgi_app(self):
+        project = Project()
+        response = JSONStreamingResponse(self.queryset)
+        view = mock.Mock(side_effect=lambda request, context, kwargs: response.compress(
+            request.headers.get('Accept-Encoding')))
+        start_response = mock.Mock()
+        environ = EnvironBuilder('/sport/export/', headers={'Accept-Encoding': 'gzip'}).get_environ()
+        with mock.patch.object(project, 'urls', create=True) as urls:
+            urls.match.return_value = (view, {})
+            chunks = project.wsgi_app(environ, start_response)
+        self.assertIn(('Content-Encoding', 'gzip'), list(start_response.call_args[0][1]))
+        first = next(chunks)
+        self.fetch_page.assert_not_called()
+        body = json.loads(gzip.decompress(first + b''.join(chunks)))
+        self.assertEqual([i['data']['name'] for i in body['data']], ['Sport 0', 'Sport 1', 'Sport 2', 'Sport 3'])
+
+    def test_error_mid_stream(self):
+        self.fetch_page.side_effect = ConnectionError('Fauna is unavailable')
+        chunks = JSONStreamingResponse(self.queryset).compress('gzip').iter_content()
+        next(chunks)
+        with self.assertLogs('pfunk', 'ERROR'):
+            with self.assertRaises(ConnectionError):
+                b''.join(chunks)
+        with self.assertLogs('pfunk', 'ERROR'), self.assertRaises(ConnectionError):
+            JSONStreamingResponse(self.queryset).response
+
+
+class SerializationTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Sport,)
+
+    def setUp(self) -> None:
+        super(SerializationTestCase, self).setUp()
+        self.client.query.return_value = [
+            {'ref': ref('Sport', '10'), 'ts': 1, 'data': {'name': 'Soccer', 'slug': 'soccer'}},
+            {'ref': ref('Sport', '11'), 'ts': 1, 'data': {'name': 'Rugby', 'slug': 'rugby'}},
+        ]
+        self.people = [Person.from_db(person_doc(str(i), sport=ref('Sport', str(10 + i % 2)))) for i in range(4)]
+
+    def test_references_loaded_in_one_query(self):
+        data = json.loads(json.dumps({'people': self.people}, cls=PFunkEncoder))
+        self.assertEqual(self.client.query.call_count, 1)
+        refs = json.loads(to_json(self.client.query.call_args[0][0]))['collection']
+        self.assertEqual(len(refs), 2)
+        self.assertEqual([i['data']['sport']['data']['name'] for i in data['people']],
+                         ['Soccer', 'Rugby', 'Soccer', 'Rugby'])
+
+    def test_reference_depth(self):
+        data = json.loads(json.dumps(self.people, cls=PFunkEncoder, reference_depth=0))
+        self.client.query.assert_not_called()
+        self.assertEqual(data[1]['data']['sport'], {'id': '11', 'collection': 'Sport'})
+        self.assertEqual(data[1]['data']['first_name'], 'First 1')
+
+    @unittest.skipIf(json_utils.orjson is None, 'orjson is not installed')
+    def test_codecs_agree(self):
+        payload = {'people': self.people, 'created': datetime.datetime(2021, 1, 1, 10, 30), 'ref': ref('Sport', '10')}
+        expected = json.loads(StdlibJSONCodec().dumps(payload, reference_depth=0))
+        self.assertEqual(json.loads(OrjsonCodec().dumps(payload, reference_depth=0)), expected)
+        self.assertEqual(expected['created'], '2021-01-01 10:30:00')
+        self.assertEqual(OrjsonCodec().loads('{"a": [1]}'), {'a': [1]})
+
+    def test_default_codec(self):
+        json_utils.set_json_codec(None)
+        self.addCleanup(json_utils.set_json_codec, None)
+        with mock.patch.dict('os.environ', {}, clear=False) as environ:
+            environ.pop('PFUNK_JSON_CODEC', None)
+            self.assertIsInstance(json_utils.get_json_codec(), StdlibJSONCodec)
+
+    def test_body_encoded_once(self):
+        codec = mock.Mock()
+        codec.dumps.return_value = '{}'
+        json_utils.set_json_codec(codec)
+        self.addCleanup(json_utils.set_json_codec, None)
+        response = JSONResponse(self.people, reference_depth=0)
+        self.assertEqual(response.response['body'], response.body)
+        codec.dumps.assert_called_once_with({'success': True, 'data': self.people}, reference_depth=0, token=None)
+
+class Node(Collection):
+    name = StringField()
+    parent = ReferenceField('pfunk.tests.test_response.Node')
+
+
+def node_doc(id, parent):
+    return {'ref': ref('Node', id), 'ts': 1, 'data': {'name': f'Node {id}', 'parent': ref('Node', parent)}}
+
+
+class ReferenceCycleTestCase(MockClientMixin, unittest.TestCase):
+    mock_collections = (Node,)
+
+    def setUp(self) -> None:
+        super(ReferenceCycleTestCase, self).setUp()
+        self.client.query.return_value = [node_doc('2', '1')]
+        self.node = Node.from_db(node_doc('1', '2'))
+
+    def test_cycle_emitted_as_reference(self):
+        data = json.loads(json.dumps(self.node, cls=PFunkEncoder))
+        self.assertEqual(self.client.query.call_count, 1)
+        self.assertEqual(data['data']['parent']['data']['name'], 'Node 2')
+        self.assertEqual(data['data']['parent']['data']['parent'], {'id': '1', 'collection': 'Node'})
+
+    def test_references_loaded_with_token(self):
+        json.dumps([self.node], cls=PFunkEncoder, token='secret')
+        self.client_factory.assert_called_once_with(_token='secret')
+
+    def test_queryset_token(self):
+        qs = Queryset({'data': [node_doc('1', '2')]}, Node, _token='secret')
+        response = JSONStreamingResponse(qs)
+        data = json.loads(''.join(response.get_chunks()))
+        self.assertEqual(data['data'][0]['data']['parent']['data']['name'], 'Node 2')
+        self.client_factory.assert_called_once_with(_token='secret')
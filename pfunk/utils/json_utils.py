@@ -1,11 +1,90 @@
 import inspect
+import json
 
+from envs import env
 from faunadb.objects import Ref
+from valley.utils import import_util
 from valley.utils.json_utils import ValleyEncoder
 
+from pfunk.identity import IdentityMap
+from pfunk.queryset import load_instances
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
 
 class PFunkEncoder(ValleyEncoder):
+    """
+    Encodes Collection instances and refs. Before encoding, the payload is walked one reference level at a time and
+    the lazied instances of each level are loaded together (see `pfunk.queryset.load_instances`), so serializing a
+    list of documents with ReferenceFields sends one query per level instead of one per reference.
+
+    `reference_depth` is the number of reference levels that are expanded into documents. Instances nested deeper
+    are emitted as `{'id': ..., 'collection': ...}` without a query. 0 emits every reference of the payload's
+    documents as a ref. None (the default) expands every level. A document is expanded at one level only, so deeper
+    references back to it (cycles) are emitted as refs.
+
+    References are loaded with `token`, the secret of the request.
+
+    Usage:
+        json.dumps(person, cls=PFunkEncoder, reference_depth=0, token=request.token)
+    """
     show_type = False
+    reference_depth = None
+
+    def __init__(self, *args, **kwargs):
+        self.reference_depth = kwargs.pop('reference_depth', self.reference_depth)
+        self.token = kwargs.pop('token', None)
+        self._references = set()
+        super(PFunkEncoder, self).__init__(*args, **kwargs)
+
+    def encode(self, o):
+        self.resolve(o)
+        return super(PFunkEncoder, self).encode(o)
+
+    def resolve(self, o) -> None:
+        """
+        Loads the lazied instances of the payload that are expanded and remembers the ones emitted as refs.
+        Args:
+            o: Payload
+
+        Returns: None
+        """
+        seen = set()
+        resolved = set()
+        level = [o]
+        depth = 0
+        while level:
+            instances = []
+            stack = list(level)
+            while stack:
+                item = stack.pop()
+                if isinstance(item, dict):
+                    stack.extend(item.values())
+                elif isinstance(item, (list, tuple, set)):
+                    stack.extend(item)
+                elif hasattr(item, 'get_collection_name') and id(item) not in seen:
+                    seen.add(id(item))
+                    key = IdentityMap.get_key(item.ref) if item.ref is not None else None
+                    if key is not None and key in resolved:
+                        # Expanded at a previous level.
+                        self._references.add(id(item))
+                    else:
+                        instances.append(item)
+            if self.reference_depth is not None and depth > self.reference_depth:
+                self._references.update(id(i) for i in instances)
+                return
+            load_instances([i for i in instances if i.ref is not None], _token=self.token)
+            resolved.update(IdentityMap.get_key(i.ref) for i in instances if i.ref is not None)
+            level = [i._data for i in instances if not i._lazied]
+            depth += 1
 
     def default(self, obj):
         if isinstance(obj, Ref):
@@ -15,9 +94,112 @@ class PFunkEncoder(ValleyEncoder):
                 obj_dict['_type'] = '{}.{}'.format(inspect.getmodule(obj).__name__, obj.__class__.__name__)
             return obj_dict
         if hasattr(obj, 'get_collection_name'):
-            if obj._lazied:
-                obj = obj._get(obj.ref.id())
+            if id(obj) in self._references or obj._lazied:
+                return self.default(obj.ref)
         try:
             return super(PFunkEncoder, self).default(obj)
         except AttributeError:
-            return str(obj)
\ No newline at end of file
+            return str(obj)
+
+
+class BaseJSONCodec(object):
+    """
+    Encodes response bodies and decodes request bodies. Refs, collection instances and other objects are converted
+    by `PFunkEncoder.default`, so every codec returns the same data.
+    """
+    name: str = None
+
+    def dumps(self, obj, reference_depth: int = None, token: str = None) -> str:
+        raise NotImplementedError
+
+    def loads(self, s):
+        raise NotImplementedError
+
+    @staticmethod
+    def get_encoder(obj, reference_depth: int = None, token: str = None) -> PFunkEncoder:
+        """
+        Returns a PFunkEncoder that already loaded the lazied instances of `obj`. Its `default` method converts the
+        objects the codec can't encode.
+        """
+        encoder = PFunkEncoder(reference_depth=reference_depth, token=token)
+        encoder.resolve(obj)
+        return encoder
+
+
+class StdlibJSONCodec(BaseJSONCodec):
+    """
+    The `json` module with PFunkEncoder.
+    """
+    name = 'json'
+
+    def dumps(self, obj, reference_depth: int = None, token: str = None) -> str:
+        return json.dumps(obj, cls=PFunkEncoder, reference_depth=reference_depth, token=token)
+
+    def loads(self, s):
+        return json.loads(s)
+
+
+class OrjsonCodec(BaseJSONCodec):
+    """
+    orjson (`pip install pfunk[json]`), selected with `PFUNK_JSON_CODEC=orjson`. Dates and datetimes are passed to
+    `PFunkEncoder.default` so they decode to the same data as with the `json` module, but the bytes differ: orjson
+    emits no whitespace after separators.
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('OrjsonCodec requires orjson. Install it with: pip install pfunk[json]')
+
+    def dumps(self, obj, reference_depth: int = None, token: str = None) -> str:
+        return orjson.dumps(
+            obj, default=self.get_encoder(obj, reference_depth, token).default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        ).decode()
+
+    def loads(self, s):
+        return orjson.loads(s)
+
+
+class UjsonCodec(BaseJSONCodec):
+    """
+    ujson 5 or later (`pip install ujson`).
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError('UjsonCodec requires ujson. Install it with: pip install ujson')
+
+    def dumps(self, obj, reference_depth: int = None, token: str = None) -> str:
+        return ujson.dumps(obj, default=self.get_encoder(obj, reference_depth, token).default)
+
+    def loads(self, s):
+        return ujson.loads(s)
+
+
+JSON_CODECS = {'json': StdlibJSONCodec, 'orjson': OrjsonCodec, 'ujson': UjsonCodec}
+_json_codec = None
+
+
+def get_json_codec() -> BaseJSONCodec:
+    """
+    Returns the codec set by the `PFUNK_JSON_CODEC` env variable: `json`, `orjson`, `ujson` or the import path of a
+    BaseJSONCodec subclass. Defaults to the `json` module; installing orjson or ujson doesn't change the response
+    bodies until it is selected.
+
+    Returns: BaseJSONCodec
+    """
+    global _json_codec
+    if _json_codec is None:
+        name = env('PFUNK_JSON_CODEC', 'json')
+        _json_codec = (JSON_CODECS.get(name) or import_util(name))()
+    return _json_codec
+
+
+def set_json_codec(codec: BaseJSONCodec) -> None:
+    """
+    Replaces the codec returned by `get_json_codec`. None selects it again from the env on the next call.
+    """
+    global _json_codec
+    _json_codec = codec
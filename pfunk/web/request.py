@@ -1,7 +1,7 @@
-import json
-
 from werkzeug.http import parse_cookie
 
+from pfunk.utils.json_utils import get_json_codec
+
 
 class Request(object):
     """ Base Request object for views
@@ -39,7 +39,7 @@ class Request(object):
 
         """
         if self.headers.get('content-type') == 'application/json':
-            return json.loads(self.body)
+            return get_json_codec().loads(self.body)
 
 
 class BaseAPIGatewayRequest(Request):
@@ -1,25 +1,160 @@
-import json
-
-from pfunk.utils.json_utils import PFunkEncoder
+import base64
+import gzip
+import logging
+import zlib
+
+from envs import env
+
+from pfunk.utils.json_utils import get_json_codec
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+logger = logging.getLogger('pfunk')
+
+
+def get_accepted_encodings(accept_encoding: str) -> dict:
+    """
+    Parses an `Accept-Encoding` header.
+    Args:
+        accept_encoding: Header value, ex. `gzip, br;q=0.9, *;q=0`
+
+    Returns: dict of encoding and quality value
+    """
+    encodings = {}
+    for item in (accept_encoding or '').split(','):
+        encoding, _, params = item.strip().partition(';')
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[encoding.strip().lower()] = quality
+    return encodings
+
+
+def get_content_encoding(accept_encoding: str) -> str:
+    """
+    Returns the supported encoding the client prefers, `br` before `gzip` when both have the same quality value.
+    Brotli is only used when the `brotli` package is installed (`pip install pfunk[brotli]`).
+    Args:
+        accept_encoding: `Accept-Encoding` header value
+
+    Returns: str or None
+    """
+    accepted = get_accepted_encodings(accept_encoding)
+    encoding = None
+    quality = 0.0
+    for name in COMPRESSORS:
+        value = accepted.get(name, accepted.get('*', 0.0))
+        if value > quality:
+            encoding, quality = name, value
+    return encoding
+
+
+def compress_chunks(chunks, encoding: str):
+    """
+    Compresses a stream of bytes chunk by chunk. Every chunk is flushed so the client can decode it before the next one
+    is produced.
+    Args:
+        chunks: Iterable of bytes
+        encoding: `br` or `gzip`
+
+    Returns: generator
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+COMPRESSORS = {'gzip': gzip.compress}
+if brotli is not None:
+    COMPRESSORS = {'br': brotli.compress, 'gzip': gzip.compress}
 
 
 class Response(object):
+    """
+    Bodies are compressed when the view passed the request's `Accept-Encoding` header to `compress` and they are at
+    least `PFUNK_COMPRESSION_MIN_SIZE` bytes (1024 by default). Set `PFUNK_COMPRESSION` to False to turn it off.
+    """
     status_code = 200
     content_type: str = 'text/html'
     default_payload: str = ''
+    compression: bool = env('PFUNK_COMPRESSION', True, 'boolean')
+    compression_min_size: int = env('PFUNK_COMPRESSION_MIN_SIZE', 1024, 'integer')
+    streaming: bool = False
 
     def __init__(self, payload=None, headers={}, *args, **kwargs):
         self.raw_payload = payload or self.default_payload
         self.raw_headers = headers
+        self.accept_encoding = None
+        self.content_encoding = None
+        self._content = None
 
     @property
     def body(self):
         return self.raw_payload
 
+    @property
+    def content(self) -> bytes:
+        """ The body as bytes, compressed if `compress` was called with an encoding the client accepts. """
+        if self._content is None:
+            body = self.body
+            content = body if isinstance(body, bytes) else str.encode(body)
+            if self.accept_encoding is not None and len(content) >= self.compression_min_size:
+                self.content_encoding = get_content_encoding(self.accept_encoding)
+                if self.content_encoding:
+                    content = COMPRESSORS[self.content_encoding](content)
+            self._content = content
+        return self._content
+
+    def negotiate_encoding(self) -> str:
+        """
+        Returns the encoding of `content`, None if it is not compressed.
+
+        Returns: str
+        """
+        self.content
+        return self.content_encoding
+
+    def compress(self, accept_encoding: str = None) -> 'Response':
+        """
+        Negotiates the compression of the body.
+        Args:
+            accept_encoding: `Accept-Encoding` header of the request
+
+        Returns: Response
+        """
+        if self.compression:
+            self.accept_encoding = accept_encoding or ''
+            self._content = None
+        return self
+
     @property
     def headers(self):
         headers = {'Content-Type': self.content_type}
         headers.update(self.raw_headers)
+        if self.accept_encoding is not None:
+            headers['Vary'] = ', '.join(filter(None, [headers.get('Vary'), 'Accept-Encoding']))
+            if self.negotiate_encoding():
+                headers['Content-Encoding'] = self.content_encoding
+                if headers.get('ETag', '').startswith('"'):
+                    # The compressed body is not byte-identical to the one the strong ETag was computed for.
+                    headers['ETag'] = f"W/{headers['ETag']}"
 
         return headers
 
@@ -29,11 +164,17 @@ class Response(object):
 
     @property
     def response(self):
-        return {
+        headers = self.headers
+        response = {
             'statusCode': self.status_code,
             'body': self.body,
-            'headers': self.headers
-    }
+            'headers': headers
+        }
+        if self.content_encoding:
+            # API Gateway decodes base64 bodies before sending them to the client.
+            response['body'] = base64.b64encode(self.content).decode()
+            response['isBase64Encoded'] = True
+        return response
 
 
 class NotFoundResponseMixin(object):
@@ -60,6 +201,12 @@ class MethodNotAllowedResponseMixin(object):
     success: bool = False
 
 
+class NotModifiedResponseMixin(object):
+    status_code = 304
+    default_payload = ''
+    success: bool = True
+
+
 class UnauthorizedResponseMixin(object):
     status_code = 401
     default_payload = 'Unauthorized'
@@ -70,19 +217,127 @@ class JSONResponse(Response):
     content_type: str = 'application/json'
     success: bool = True
 
+    def __init__(self, payload=None, headers={}, reference_depth=None, token=None, *args, **kwargs):
+        super(JSONResponse, self).__init__(payload, headers, *args, **kwargs)
+        self.reference_depth = reference_depth
+        self.token = token
+        self._body = None
+
     @property
     def body(self):
-        return json.dumps({
+        # Encoded once: `response` and the WSGI app both read the body.
+        if self._body is None:
+            self._body = self.get_body()
+        return self._body
+
+    def get_body(self) -> str:
+        return get_json_codec().dumps({
             'success': self.success,
             'data': self.raw_payload
-        }, cls=PFunkEncoder)
+        }, reference_depth=self.reference_depth, token=self.token)
 
 
 class GraphQLResponse(JSONResponse):
 
+    def get_body(self) -> str:
+        return get_json_codec().dumps(self.raw_payload, reference_depth=self.reference_depth, token=self.token)
+
+
+class StreamingResponse(Response):
+    """
+    A response whose body is produced while it is sent. `Project.wsgi_app` passes `iter_content` to the WSGI server,
+    so the first chunk goes out before the last one is produced. Lambda responses can't be streamed; their body is
+    joined.
+
+    Streamed bodies are compressed regardless of `PFUNK_COMPRESSION_MIN_SIZE` because their size isn't known up front.
+    """
+    streaming = True
+
+    def __init__(self, payload=None, headers={}, *args, **kwargs):
+        """
+        Args:
+            payload: Iterable of str or bytes chunks
+            headers: Response headers
+        """
+        super(StreamingResponse, self).__init__(payload, headers, *args, **kwargs)
+        self._body = None
+
     @property
-    def body(self):
-        return json.dumps(self.raw_payload, cls=PFunkEncoder)
+    def body(self) -> str:
+        if self._body is None:
+            self._body = ''.join(i.decode() if isinstance(i, bytes) else i for i in self.get_chunks())
+        return self._body
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = b''.join(self.encode_chunks([str.encode(self.body)]))
+        return self._content
+
+    def get_chunks(self):
+        """
+        Returns the chunks of the body. They can only be iterated once.
+
+        Returns: iterable of str or bytes
+        """
+        return iter(self.raw_payload)
+
+    def iter_content(self):
+        """
+        Returns the body as a generator of bytes, compressed if `compress` was called with an encoding the client
+        accepts.
+
+        Returns: generator
+        """
+        return self.encode_chunks(str.encode(i) if isinstance(i, str) else i for i in self.get_chunks())
+
+    def encode_chunks(self, chunks):
+        encoding = self.negotiate_encoding()
+        return compress_chunks(chunks, encoding) if encoding else chunks
+
+    def negotiate_encoding(self) -> str:
+        if self.accept_encoding is not None and self.content_encoding is None:
+            self.content_encoding = get_content_encoding(self.accept_encoding)
+        return self.content_encoding
+
+
+class JSONStreamingResponse(StreamingResponse):
+    """
+    Streams `{"success": true, "data": [...]}` one page at a time. The payload is a Queryset, whose following pages are
+    fetched while the body is sent, or an iterable of lists. Each page is encoded on its own, so the lazied references
+    of a page are loaded together (see `pfunk.utils.json_utils.PFunkEncoder`) and only one page is kept in memory.
+
+    The status is sent before the pages are fetched. If fetching or encoding a page fails, the error is logged and
+    raised from the iterator, so the WSGI server aborts the transfer instead of completing a truncated 200 body.
+    """
+    content_type: str = 'application/json'
+    success: bool = True
+
+    def __init__(self, payload=None, headers={}, reference_depth=None, token=None, *args, **kwargs):
+        super(JSONStreamingResponse, self).__init__(payload, headers, *args, **kwargs)
+        self.reference_depth = reference_depth
+        self.token = token if token is not None else getattr(payload, '_token', None)
+
+    def get_pages(self):
+        if hasattr(self.raw_payload, 'pages'):
+            return self.raw_payload.pages()
+        return self.raw_payload
+
+    def get_chunks(self):
+        codec = get_json_codec()
+        yield f'{{"success": {codec.dumps(self.success)}, "data": ['
+        separator = ''
+        try:
+            for page in self.get_pages():
+                items = list(page)
+                if not items:
+                    continue
+                yield separator + codec.dumps(items, reference_depth=self.reference_depth, token=self.token)[1:-1]
+                separator = ', '
+        except Exception:
+            logger.exception('Streaming response failed after the status was sent.')
+            raise
+        yield ']}'
 
 
 class JSONUnauthorizedResponse(UnauthorizedResponseMixin, JSONResponse):
@@ -93,6 +348,10 @@ class HttpUnauthorizedResponse(UnauthorizedResponseMixin, Response):
     pass
 
 
+class HttpNotModifiedResponse(NotModifiedResponseMixin, Response):
+    pass
+
+
 class JSONNotFoundResponse(NotFoundResponseMixin, JSONResponse):
     pass
 
@@ -1,15 +1,22 @@
+import calendar
+import hashlib
+import re
+from contextlib import nullcontext
+
 from envs import env
+from faunadb._json import to_json
 from faunadb.errors import NotFound as FaunaNotFound, PermissionDenied, BadRequest, ErrorData
 from jwt import InvalidSignatureError
 from valley.exceptions import ValidationException
 from werkzeug.exceptions import NotFound, MethodNotAllowed
-from werkzeug.http import dump_cookie
+from werkzeug.http import dump_cookie, http_date, parse_date
 from werkzeug.routing import Rule
 
+from pfunk.identity import IdentityMap, get_identity_map
 from pfunk.exceptions import TokenValidationFailed, LoginFailed, Unauthorized, DocNotFound, GraphQLError
 from pfunk.web.request import Request, RESTRequest, HTTPRequest
 from pfunk.web.response import (Response, HttpNotFoundResponse, HttpForbiddenResponse, HttpBadRequestResponse,
-                                HttpMethodNotAllowedResponse, HttpUnauthorizedResponse)
+                                HttpMethodNotAllowedResponse, HttpUnauthorizedResponse, HttpNotModifiedResponse)
 
 
 class View(object):
@@ -60,7 +67,9 @@ class View(object):
                 return self.bad_request_class('Wrong content-type')
         self.lambda_context = context
 
-        response = self.process_request()
+        # Documents are fetched once per request. See `pfunk.identity.IdentityMap`.
+        with IdentityMap() if get_identity_map() is None else nullcontext():
+            response = self.process_request()
 
         return response
 
@@ -81,7 +90,7 @@ class View(object):
         try:
             if self.login_required:
                 self.token_check()
-            response = getattr(self, self.request.method.lower())().response
+            response = self.compress(getattr(self, self.request.method.lower())()).response
         except (FaunaNotFound, NotFound, DocNotFound):
 
             response = self.not_found_class().response
@@ -118,7 +127,7 @@ class View(object):
         try:
             if self.login_required:
                 self.token_check()
-            response = getattr(self, self.request.method.lower())()
+            response = self.compress(getattr(self, self.request.method.lower())())
         except (FaunaNotFound, NotFound, DocNotFound):
             response = self.not_found_class()
         except PermissionDenied:
@@ -148,6 +157,31 @@ class View(object):
             return self.process_lambda_request()
         return self.process_wsgi_request()
 
+    def compress(self, response: Response) -> Response:
+        """ Compresses the body of `response` with the encoding the request's
+            `Accept-Encoding` header prefers. See `Response.compress`.
+
+        Args:
+            response (`web.Response`, required): Response of the handler
+
+        Returns:
+            response (`web.Response`, required)
+        """
+        return response.compress(self.get_request_header('Accept-Encoding'))
+
+    def get_request_header(self, name):
+        """ Returns a header of the request. API Gateway HTTP APIs
+            send lowercase header names.
+
+        Args:
+            name (str, required): Header name. ex. `If-None-Match`
+
+        Returns:
+            value (str): Header value or None
+        """
+        headers = self.request.headers or {}
+        return headers.get(name) or headers.get(name.lower())
+
     def get_token(self):
         """ Acquires token from cookies/headers and
             returns the decrypted token
@@ -324,7 +358,7 @@ class QuerysetMixin(object):
         """ Acquires the addutional generic kwargs in a query 
 
             This includes the  keys that are generic 
-            to queries. ['after, 'before', 'page_size']
+            to queries. ['after, 'before', 'page_size', 'fields']
         """
         query_kwargs = self.request.query_params
         kwargs = {
@@ -333,9 +367,119 @@ class QuerysetMixin(object):
         }
         if self.request.query_params.get('page_size'):
             kwargs['page_size'] = query_kwargs.get('page_size')
+        if query_kwargs.get('fields'):
+            kwargs['only'] = self.get_fields(query_kwargs.get('fields'))
         kwargs['_token'] = self.request.token
         return kwargs
 
+    def get_fields(self, fields):
+        """ Parses the comma separated `fields` query parameter
+            into the list of fields passed to the `only` argument
+            of the query.
+
+        Args:
+            fields (str, required):
+                Comma separated field names. ex. `title,slug`
+
+        Returns:
+            fields (list):
+                Field names
+        """
+        fields = [i.strip() for i in fields.split(',') if i.strip()]
+        for i in fields:
+            if i not in self.collection._base_properties:
+                raise ValidationException(f'fields: {i} is not a field of {self.collection.get_class_name()}')
+        return fields
+
+    def get_version(self, payload=None):
+        """ Returns the largest `ts` of the page and its refs and
+            cursors, so removing a document from the page changes the
+            ETag too. See `ConditionalMixin`.
+        """
+        if payload is None:
+            kwargs = self.get_query_kwargs()
+            kwargs.pop('only', None)
+            page = self.collection.get_index_ts(self.collection().all_index_name(), **kwargs)
+        else:
+            page = payload.to_dict()
+        rows = page.get('data', [])
+        if not all(isinstance(i, dict) and i.get('ts') for i in rows):
+            return None
+        return max([i['ts'] for i in rows], default=None), [[i['ref'] for i in rows], page.get('after'),
+                                                            page.get('before')]
+
+
+class ConditionalMixin(object):
+    """ Mixin for answering conditional GET requests (`If-None-Match`
+        and `If-Modified-Since`) with `304 Not Modified`.
+
+        Responses get a strong `ETag`, computed from the `ts` of their
+        documents, and a `Last-Modified` header. The view's
+        `get_version(payload=None)` returns the `(ts, key)` the ETag is
+        computed from, or None. Without `payload` it queries the `ts`
+        without fetching the documents. The ETag does not change when only
+        a document referenced by the response changes.
+
+    Attributes:
+        conditional_query (bool, default=False):
+            If True, conditional requests are first answered with a query
+            that only fetches the `ts` of the documents. The documents are
+            fetched when they changed.
+    """
+    conditional_query: bool = False
+    not_modified_class: HttpNotModifiedResponse = HttpNotModifiedResponse
+
+    def get_response(self):
+        if self.request.method.upper() not in ['GET', 'HEAD']:
+            return super(ConditionalMixin, self).get_response()
+        if self.conditional_query and self.is_conditional():
+            etag, ts = self.get_validators(self.get_version())
+            if self.is_not_modified(etag, ts):
+                return self.not_modified_class(headers=self.get_validator_headers(etag, ts))
+        payload = self.get_query()
+        etag, ts = self.get_validators(self.get_version(payload))
+        if self.is_not_modified(etag, ts):
+            return self.not_modified_class(headers=self.get_validator_headers(etag, ts))
+        return self.make_response(payload, headers=dict(self.get_headers(), **self.get_validator_headers(etag, ts)))
+
+    def get_validators(self, version):
+        """ Returns the ETag (without quotes) and the `ts` of a version. """
+        if version is None:
+            return None, None
+        ts, key = version
+        digest = hashlib.sha1(to_json([self.collection.__name__, key, ts]).encode()).hexdigest()
+        return digest, ts
+
+    @staticmethod
+    def get_validator_headers(etag, ts):
+        headers = {}
+        if etag:
+            headers['ETag'] = f'"{etag}"'
+        if ts:
+            headers['Last-Modified'] = http_date(ts // 1000000)
+        return headers
+
+    def is_conditional(self):
+        return bool(self.get_request_header('If-None-Match') or self.get_request_header('If-Modified-Since'))
+
+    def is_not_modified(self, etag, ts):
+        """ Checks the request's `If-None-Match` header or, if it has
+            none, its `If-Modified-Since` header.
+
+        Returns:
+            not_modified (bool)
+        """
+        if etag is None:
+            return False
+        if_none_match = self.get_request_header('If-None-Match')
+        if if_none_match:
+            # Weak comparison: compressed responses send the ETag as weak.
+            return if_none_match.strip() == '*' or etag in re.findall(r'"([^"]*)"', if_none_match)
+        if_modified_since = parse_date(self.get_request_header('If-Modified-Since'))
+        if not ts or if_modified_since is None:
+            return False
+        return ts // 1000000 <= calendar.timegm(if_modified_since.utctimetuple())
+
 
 class ObjectMixin(object):
     """ Generic GET mixin for a Fauna object. """
@@ -347,6 +491,18 @@ class ObjectMixin(object):
     def get_query_kwargs(self):
         return {'_token': self.request.token}
 
+    def get_version(self, payload=None):
+        """ Returns the `ts` of the document and its ID. See
+            `ConditionalMixin`.
+        """
+        if payload is None:
+            ts = self.collection.get_ts(self.request.kwargs.get('id'), **self.get_query_kwargs())
+        else:
+            ts = payload._ts
+        if ts is None:
+            return None
+        return ts, str(self.request.kwargs.get('id'))
+
 
 class UpdateMixin(object):
     """ Generic PUT mixin for a fauna object """
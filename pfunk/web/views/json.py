@@ -1,7 +1,8 @@
 from pfunk.web.response import JSONResponse, JSONNotFoundResponse, JSONBadRequestResponse, \
-    JSONMethodNotAllowedResponse, JSONUnauthorizedResponse, JSONForbiddenResponse
+    JSONMethodNotAllowedResponse, JSONUnauthorizedResponse, JSONForbiddenResponse, JSONStreamingResponse
 from pfunk.client import q
-from pfunk.web.views.base import ActionMixin, HTTPView, IDMixin, ObjectMixin, QuerysetMixin, UpdateMixin
+from pfunk.web.views.base import ActionMixin, ConditionalMixin, HTTPView, IDMixin, ObjectMixin, QuerysetMixin, \
+    UpdateMixin
 
 
 class JSONView(HTTPView):
@@ -18,11 +19,19 @@ class JSONView(HTTPView):
     method_not_allowed_class = JSONMethodNotAllowedResponse
     unauthorized_class: JSONUnauthorizedResponse = JSONUnauthorizedResponse
     forbidden_class = JSONForbiddenResponse
+    reference_depth: int = None
+    """Number of reference levels expanded into documents in the response. Deeper references are returned as
+    `{id, collection}` without fetching them. None expands every level. See `pfunk.utils.json_utils.PFunkEncoder`."""
 
     def get_response(self):
+        return self.make_response(self.get_query(), headers=self.get_headers())
+
+    def make_response(self, payload, headers):
         return self.response_class(
-            payload=self.get_query(),
-            headers=self.get_headers()
+            payload=payload,
+            headers=headers,
+            reference_depth=self.reference_depth,
+            token=self.request.token
         )
 
 
@@ -74,7 +83,7 @@ class UpdateView(UpdateMixin, IDMixin, JSONView):
         return obj
 
 
-class DetailView(ObjectMixin, IDMixin, JSONView):
+class DetailView(ConditionalMixin, ObjectMixin, IDMixin, JSONView):
     """ Define a view to allow single entity operations """
     action = 'detail'
     restrict_content_type = False
@@ -91,12 +100,22 @@ class DeleteView(ObjectMixin, IDMixin, JSONView):
         return self.collection.delete_from_id(self.request.kwargs.get('id'), _token=self.request.token)
 
 
-class ListView(QuerysetMixin, ActionMixin, JSONView):
+class ListView(ConditionalMixin, QuerysetMixin, ActionMixin, JSONView):
     """ Define a view to allow `All/List` entity operations """
     restrict_content_type = False
     action = 'list'
     login_required = True
 
 
+class ExportView(QuerysetMixin, ActionMixin, JSONView):
+    """ Define a view that streams every document of the collection,
+        fetching the pages while the response is sent
+    """
+    restrict_content_type = False
+    action = 'export'
+    login_required = True
+    response_class = JSONStreamingResponse
+
+
 class GraphQLView(HTTPView):
     pass
\ No newline at end of file